@@ -0,0 +1,443 @@
+"""
+Job queue that feeds the single browser worker in request_server.
+
+The Flask handlers only validate a payload and submit it here, then answer right away with
+the job id. The browser worker pulls jobs one at a time, so only one thread ever touches the driver.
+
+Work that has not started yet is merged per MT5 ticket before it reaches the browser:
+- a modify folds into a queued modify (or queued trade) for the same ticket, keeping the latest TP/SL
+- a delete drops any queued modify for its ticket, and cancels a queued trade outright
+- a close-all drops every queued trade and modify
+- a full-position sync replaces any sync still waiting, since it carries the newer snapshot
+
+A payload may carry the sender's timestamp ("sent_at") and how old it may get ("max_age"). Within the
+same priority, jobs run earliest deadline first; jobs without one go after those that have one.
+"""
+import heapq
+import itertools
+import math
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+# Lower number runs first. Closes jump ahead of new trades, and new trades ahead of TP/SL edits.
+# Health checks and refreshes only run when nothing else is waiting.
+ACTION_PRIORITY = {
+    "delete_all": 0,
+    "delete": 1,
+    "sync": 2,
+    "trade": 2,
+    "modify": 3,
+    "health_check": 8,
+}
+DEFAULT_PRIORITY = 5
+
+# How long finished jobs stay queryable through /api/jobs/<id>
+JOB_RETENTION = 60 * 60  # 1 hour in seconds
+
+# How long a request key keeps pointing at the job it produced, so a retry gets that job back
+IDEMPOTENCY_TTL = 10 * 60  # 10 minutes in seconds
+
+
+def parse_timestamp(value):
+    """A sender timestamp as Unix seconds; milliseconds are accepted too. None if missing or not a usable number."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(value) or value <= 0:
+        return None
+    # Seconds stay below 1e11 until the year 5138
+    return value / 1000 if value > 1e11 else value
+
+
+def parse_max_age(value):
+    """A max age in seconds, or None for no limit."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) and value > 0 else None
+
+
+def signal_deadline(data, received_at):
+    """
+    (sent_at, deadline) for a payload. The deadline is max_age after the sender's timestamp, or after
+    received_at when the payload has none. Either is None when the payload doesn't say.
+    """
+    sent_at = parse_timestamp(data.get("sent_at"))
+    max_age = parse_max_age(data.get("max_age"))
+    deadline = (sent_at or received_at) + max_age if max_age else None
+    return sent_at, deadline
+
+
+class Job:
+    """One unit of browser work and, once it has run, its result."""
+
+    def __init__(self, action, data, priority):
+        self.id = uuid.uuid4().hex[:12]
+        # The id the client was given: this job's own, or its JobGroup's when the action was fanned out
+        self.request_id = self.id
+        self.action = action
+        self.data = data
+        self.priority = priority
+        self.status = "queued"  # queued -> running -> done | failed, or queued -> cancelled
+        self.merged = 0  # how many later requests were folded into this job
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Sender timing, if the payload carried it
+        self.sent_at, self.deadline = signal_deadline(self.data or {}, self.created_at)
+        self.late = False  # run although past its deadline
+        self._done = threading.Event()
+
+    @property
+    def ticket(self):
+        return (self.data or {}).get("ticket")
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Blocks until the job has finished. Returns True if it did within the timeout."""
+        return self._done.wait(timeout)
+
+    def expired(self, now=None):
+        """True once the job is past its deadline."""
+        return self.deadline is not None and (now or time.time()) > self.deadline
+
+    def web_ticket(self):
+        if isinstance(self.result, dict):
+            return self.result.get("trade_id")
+        return None
+
+    def to_dict(self):
+        queued_until = self.started_at or self.finished_at or time.time()
+        info = {
+            "job_id": self.id,
+            "action": self.action,
+            "ticket": self.ticket,
+            "status": self.status,
+            "result": self.result,
+            "web_ticket": self.web_ticket(),
+            "queued_ms": round((queued_until - self.created_at) * 1000, 1),
+        }
+        if self.merged:
+            info["merged"] = self.merged
+        if self.started_at and self.finished_at:
+            info["run_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        # End to end: from the sender's timestamp (or our receipt) to the result, or to now while it is pending
+        until = self.finished_at or time.time()
+        info["age_ms"] = round((until - (self.sent_at or self.created_at)) * 1000, 1)
+        if self.sent_at is not None:
+            info["transit_ms"] = round((self.created_at - self.sent_at) * 1000, 1)
+        if self.deadline is not None:
+            info["deadline_ms"] = round((self.deadline - until) * 1000, 1)  # negative once past it
+            info["late"] = self.late or until > self.deadline
+        return info
+
+
+class JobGroup:
+    """One action fanned out to several accounts, each running as its own Job on its own worker."""
+
+    def __init__(self, action, jobs):
+        self.id = uuid.uuid4().hex[:12]
+        self.action = action
+        self.jobs = jobs  # {account name: Job}
+        self.created_at = time.time()
+        for job in jobs.values():
+            job.request_id = self.id
+
+    @property
+    def finished(self):
+        return all(job.finished for job in self.jobs.values())
+
+    @property
+    def status(self):
+        statuses = [job.status for job in self.jobs.values()]
+        if not self.finished:
+            return "queued" if all(status == "queued" for status in statuses) else "running"
+        if all(status == "failed" for status in statuses):
+            return "failed"
+        if any(status == "failed" for status in statuses):
+            return "partial"
+        return "done"
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        for job in self.jobs.values():
+            remaining = None if deadline is None else max(0, deadline - time.time())
+            if not job.wait(remaining):
+                return False
+        return True
+
+    def to_dict(self):
+        info = {
+            "job_id": self.id,
+            "action": self.action,
+            "status": self.status,
+            "accounts": {name: job.to_dict() for name, job in self.jobs.items()},
+        }
+        if self.finished:
+            # Accounts run in parallel, so the total should track the slowest one rather than the sum
+            slowest = max(self.jobs, key=lambda name: self.jobs[name].finished_at)
+            info["total_ms"] = round((self.jobs[slowest].finished_at - self.created_at) * 1000, 1)
+            info["slowest_account"] = slowest
+        return info
+
+
+class ActionQueue:
+    """Thread-safe priority queue of Jobs, plus a registry so callers can look them up by id."""
+
+    def __init__(self, coalesce=True):
+        self.coalesce = coalesce
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._jobs = {}
+        self._queued_by_ticket = {}  # {str(MT5 ticket): [queued jobs for that ticket]}
+        self.running = None
+        self.last_finished_at = time.time()
+        self._stats = {
+            "submitted": 0,
+            "executed": 0,
+            "modifies_merged": 0,
+            "modifies_dropped": 0,
+            "trades_cancelled": 0,
+            "jobs_cancelled_by_close_all": 0,
+            "syncs_superseded": 0,
+            "trades_expired": 0,
+            "trades_late": 0,
+        }
+
+    def submit(self, action, data=None, priority=None):
+        """
+        Queues a new job and returns it. FIFO order is kept within the same priority.
+
+        With coalescing on, the returned job may be an existing queued job the request was merged into,
+        or a job that is already finished because the request cancelled out against queued work.
+        """
+        if priority is None:
+            priority = ACTION_PRIORITY.get(action, DEFAULT_PRIORITY)
+        data = dict(data or {})
+        with self._cond:
+            self._prune()
+            self._stats["submitted"] += 1
+            if self.coalesce:
+                absorbed = self._coalesce(action, data)
+                if absorbed is not None:
+                    return absorbed
+            job = Job(action, data, priority)
+            self._jobs[job.id] = job
+            if job.ticket not in (None, ""):
+                self._queued_by_ticket.setdefault(str(job.ticket), []).append(job)
+            heapq.heappush(self._heap, ((job.priority, job.deadline or math.inf), next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def _coalesce(self, action, data):
+        # Called with the lock held. Returns the job that absorbed this request, or None to queue it.
+        if action == "delete_all":
+            for jobs in list(self._queued_by_ticket.values()):
+                for job in list(jobs):
+                    if job.action in ("trade", "modify"):
+                        self._cancel(job, "superseded by close-all")
+                        self._stats["jobs_cancelled_by_close_all"] += 1
+            return None
+
+        if action == "sync":
+            for _, _, job in self._heap:
+                if job.action == "sync" and job.status == "queued":
+                    self._cancel(job, "superseded by a newer sync")
+                    self._stats["syncs_superseded"] += 1
+            return None
+
+        queued = self._queued_by_ticket.get(str(data.get("ticket")), [])
+        if action == "modify":
+            for job in queued:
+                if job.action in ("modify", "trade"):
+                    _merge_tpsl(job.data, data)
+                    job.merged += 1
+                    self._stats["modifies_merged"] += 1
+                    return job
+            return None
+
+        if action == "delete":
+            for job in list(queued):
+                if job.action == "modify":
+                    self._cancel(job, "superseded by delete")
+                    self._stats["modifies_dropped"] += 1
+            for job in list(queued):
+                if job.action == "trade":
+                    # The position was never opened in the browser, so there is nothing to close
+                    self._cancel(job, "closed before it was opened")
+                    self._stats["trades_cancelled"] += 1
+                    delete_job = Job(action, data, ACTION_PRIORITY.get(action, DEFAULT_PRIORITY))
+                    self._jobs[delete_job.id] = delete_job
+                    self._cancel(delete_job, "trade was cancelled before it was opened")
+                    return delete_job
+        return None
+
+    def _cancel(self, job, reason):
+        # Called with the lock held. The heap entry is skipped by get() once the status changes.
+        job.status = "cancelled"
+        job.result = {"status": "cancelled", "reason": reason}
+        job.finished_at = time.time()
+        self._unindex(job)
+        job._done.set()
+
+    def _unindex(self, job):
+        jobs = self._queued_by_ticket.get(str(job.ticket))
+        if jobs and job in jobs:
+            jobs.remove(job)
+            if not jobs:
+                del self._queued_by_ticket[str(job.ticket)]
+
+    def get(self, timeout=None):
+        """Waits for the next queued job, marks it running and returns it. Returns None on timeout."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while True:
+                job = self._next_queued()
+                if job is not None:
+                    heapq.heappop(self._heap)
+                    return self._start(job)
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def take_if(self, predicate):
+        """
+        Takes the next queued job as get() would, but only if predicate(job) is true, and never waits.
+        Returns None otherwise. Lets the worker pick up the work right behind a job without reordering it.
+        """
+        with self._cond:
+            job = self._next_queued()
+            if job is None or not predicate(job):
+                return None
+            heapq.heappop(self._heap)
+            return self._start(job)
+
+    def _next_queued(self):
+        # Called with the lock held. Drops cancelled entries off the top and returns the job there, or None.
+        while self._heap and self._heap[0][2].status != "queued":
+            heapq.heappop(self._heap)
+        return self._heap[0][2] if self._heap else None
+
+    def _start(self, job):
+        # Called with the lock held, once the job is off the heap
+        job.status = "running"
+        job.started_at = time.time()
+        self._unindex(job)
+        self.running = job
+        self._stats["executed"] += 1
+        return job
+
+    def finish(self, job, result, failed=False):
+        """Stores the result of a job taken with get() and wakes anyone waiting on it."""
+        with self._cond:
+            job.result = result
+            job.status = "failed" if failed else "done"
+            job.finished_at = time.time()
+            if self.running is job:
+                self.running = None
+            self.last_finished_at = job.finished_at
+        job._done.set()
+
+    def count(self, counter):
+        """Adds one to a counter reported by stats()."""
+        with self._cond:
+            self._stats[counter] += 1
+
+    def get_job(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def pending_count(self):
+        with self._cond:
+            return sum(1 for _, _, job in self._heap if job.status == "queued")
+
+    def stats(self):
+        """Counters for the queue, including how many browser operations coalescing has saved."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = sum(1 for _, _, job in self._heap if job.status == "queued")
+        stats["running"] = self.running.action if self.running else None
+        # A merged or dropped modify saves one browser operation, a cancelled trade saves the trade and its delete
+        stats["operations_saved"] = (
+            stats["modifies_merged"]
+            + stats["modifies_dropped"]
+            + 2 * stats["trades_cancelled"]
+            + stats["jobs_cancelled_by_close_all"]
+            + stats["syncs_superseded"]
+        )
+        return stats
+
+    def _prune(self):
+        # Called with the lock held. Forget finished jobs older than JOB_RETENTION.
+        cutoff = time.time() - JOB_RETENTION
+        stale = [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]
+        for job_id in stale:
+            del self._jobs[job_id]
+
+
+def _merge_tpsl(target, update):
+    """
+    Folds a modify payload into a queued trade or modify payload.
+
+    The sender sends 0.0 for a TP or SL that did not change, so only non-zero values override.
+    """
+    for field in ("take_profit", "stop_loss"):
+        value = update.get(field)
+        if value not in (None, 0, 0.0):
+            target[field] = value
+
+
+class IdempotencyCache:
+    """
+    Remembers which job each request key produced, for IDEMPOTENCY_TTL seconds.
+
+    A repeat of a key gets the original job back: still queued or running, the caller attaches to it;
+    finished, the caller gets its stored result. Nothing is queued twice either way.
+    """
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: (expires_at, job)}, oldest first
+        self.hits = 0
+
+    def get_or_create(self, key, create):
+        """
+        Returns (job, duplicate). create() is only called, under the lock, when the key is new,
+        so two concurrent requests with the same key can never both create a job.
+        """
+        now = time.time()
+        with self._lock:
+            while self._entries:
+                oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+                if expires_at > now:
+                    break
+                del self._entries[oldest_key]
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[1], True
+            job = create()
+            self._entries[key] = (now + self.ttl, job)
+            return job, False
+
+    def lookup(self, key):
+        """The job a key produced, or None if it is new (or has expired). Not counted as a duplicate."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry is not None and entry[0] > time.time() else None
+
+    def stats(self):
+        with self._lock:
+            return {"keys": len(self._entries), "duplicates": self.hits, "ttl_s": self.ttl}
@@ -0,0 +1,187 @@
+"""
+Benchmark: end-to-end latency of each action against the mock web terminal.
+
+Serves Trade_Receiver/mock_terminal on localhost, drives it with headless Chrome through request_server's
+own job runner (the same run_job the browser worker calls) and reports latency percentiles per action
+and open-position count. No broker session is needed, so any change to request_server.py can be
+measured before it goes live.
+
+Each round opens a position (trade), edits its TP and SL (modify) and closes it (delete) while
+--positions other positions are open. delete_all is timed separately against that many positions.
+
+Usage:
+    python bench_actions.py [--positions 0 10 40] [--repeat 10] [--actions trade modify delete delete_all]
+                            [--symbols EURUSD GBPUSD] [--fill 150] [--close 100] [--modify 100] [--panel 0]
+                            [--stages] [--headed]
+"""
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import request_server  # noqa: E402
+from action_queue import ACTION_PRIORITY, Job  # noqa: E402
+from metrics import STAGE_METRIC, job_labels, registry  # noqa: E402
+from mock_terminal.serve import start_server, terminal_url  # noqa: E402
+from trade_store import TradeStore  # noqa: E402
+
+ACTIONS = ("trade", "modify", "delete", "delete_all")
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(q * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def run_action(action, data, position_count):
+    """Runs one action as a job and returns (elapsed ms, result dict)."""
+    job = Job(action, data, ACTION_PRIORITY[action])
+    start = time.perf_counter()
+    with job_labels(action=action, symbol=data.get("symbol", ""), account="bench", positions=position_count):
+        try:
+            result = request_server._normalize_result(request_server.run_job(job))
+        except Exception as e:
+            result = {"error": str(e)}
+    return (time.perf_counter() - start) * 1000, result
+
+
+def load_terminal(driver, url, position_count):
+    driver.get(url)
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "navbar-UserMenuButton")))
+    driver.execute_script("mockTerminal.reset(); mockTerminal.seed(arguments[0]);", position_count)
+    # A new page means nothing cached about the order panel or Favorites holds any more
+    request_server.reset_order_panel()
+    request_server.invalidate_symbol_index()
+
+
+def bench_position_count(driver, url, position_count, args, samples, errors):
+    load_terminal(driver, url, position_count)
+    session = request_server.current_session()
+
+    for round_index in range(args.repeat):
+        mt5_ticket = 500000 + position_count * 1000 + round_index
+        symbol = args.symbols[round_index % len(args.symbols)]
+        trade = {
+            "action": "trade",
+            "symbol": symbol,
+            "ticket": mt5_ticket,
+            "volume": 0.1,
+            "direction": "BUY" if round_index % 2 == 0 else "SELL",
+            "take_profit": 1.2,
+            "stop_loss": 1.0,
+        }
+        steps = [
+            ("trade", trade),
+            ("modify", dict(trade, action="modify", take_profit=round(1.21 + round_index / 10000, 5), stop_loss=1.01)),
+            ("delete", dict(trade, action="delete", symbol="NONE")),
+        ]
+        for action, data in steps:
+            elapsed, result = run_action(action, data, position_count)
+            failed = "error" in result
+            if action == "trade" and not failed and session.trade_map.get(mt5_ticket) != result.get("trade_id"):
+                failed = True
+                result = {"error": f"MT5 ticket {mt5_ticket} mapped to {session.trade_map.get(mt5_ticket)}"}
+            if action in args.actions:
+                samples.setdefault((action, position_count), []).append(elapsed)
+                if failed:
+                    errors.setdefault((action, position_count), []).append(result["error"])
+            if action == "trade" and failed:
+                # Nothing to modify or close this round
+                break
+
+    if "delete_all" in args.actions:
+        for _ in range(args.repeat):
+            driver.execute_script("mockTerminal.reset(); mockTerminal.seed(arguments[0]);", position_count)
+            elapsed, result = run_action("delete_all", {"action": "delete_all", "ticket": 0}, position_count)
+            samples.setdefault(("delete_all", position_count), []).append(elapsed)
+            if result.get("status") not in ("success", "no_trades_to_close"):
+                errors.setdefault(("delete_all", position_count), []).append(result.get("error") or result.get("failed"))
+
+
+def print_latency(samples, errors, actions):
+    print(f"{'action':>10} | {'positions':>9} | {'runs':>4} | {'errors':>6} | "
+          f"{'p50':>9} | {'p90':>9} | {'p99':>9} | {'max':>9}")
+    print("-" * 84)
+    for action in actions:
+        for (name, position_count), values in sorted(samples.items(), key=lambda item: item[0][1]):
+            if name != action:
+                continue
+            failed = len(errors.get((name, position_count), []))
+            print(
+                f"{name:>10} | {position_count:>9} | {len(values):>4} | {failed:>6} | "
+                f"{percentile(values, 0.5):>7.1f}ms | {percentile(values, 0.9):>7.1f}ms | "
+                f"{percentile(values, 0.99):>7.1f}ms | {max(values):>7.1f}ms"
+            )
+    for (name, position_count), messages in sorted(errors.items(), key=lambda item: (item[0][0], item[0][1])):
+        print(f"[{name} @ {position_count} positions] first error: {messages[0]}")
+
+
+def print_stages():
+    print()
+    print(f"{'action':>10} | {'positions':>9} | {'stage':>16} | {'count':>5} | {'p50':>9} | {'p99':>9}")
+    print("-" * 72)
+    for entry in registry.summary().get(STAGE_METRIC, []):
+        print(
+            f"{entry['action']:>10} | {entry['positions']:>9} | {entry['stage']:>16} | {entry['count']:>5} | "
+            f"{entry['p50_ms']:>7.1f}ms | {entry['p99_ms']:>7.1f}ms"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--positions", type=int, nargs="+", default=[0, 10, 40], help="Other open positions")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--actions", nargs="+", choices=ACTIONS, default=list(ACTIONS))
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD"], help="Rotated through, one per round")
+    parser.add_argument("--fill", type=int, default=150, help="Mock order-to-row delay in ms")
+    parser.add_argument("--close", type=int, default=100, help="Mock close delay in ms")
+    parser.add_argument("--modify", type=int, default=100, help="Mock TP/SL save delay in ms")
+    parser.add_argument("--panel", type=int, default=0, help="Mock panel/popup open delay in ms")
+    parser.add_argument("--stages", action="store_true", help="Also print the per-stage breakdown")
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    args = parser.parse_args()
+
+    server, base_url = start_server()
+    url = terminal_url(base_url, fill=args.fill, close=args.close, modify=args.modify, panel=args.panel)
+
+    options = Options()
+    if not args.headed:
+        options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    session = request_server.current_session()
+    session.driver = driver
+    # Keep benchmark tickets out of the real trade map
+    session.trade_map = TradeStore(os.path.join(tempfile.mkdtemp(), "trade_map"))
+
+    samples = {}
+    errors = {}
+    try:
+        driver.get(url)
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "navbar-UserMenuButton")))
+        request_server.ensure_trade_confirmations_off()
+        for position_count in args.positions:
+            print(f"[bench_actions] {position_count} open positions...")
+            bench_position_count(driver, url, position_count, args, samples, errors)
+    finally:
+        driver.quit()
+        server.shutdown()
+
+    print()
+    print_latency(samples, errors, args.actions)
+    if args.stages:
+        print_stages()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Benchmark: standard vs lean browser mode (see browser_mode.py).
+
+For each mode, Chrome is launched --launches times against the mock web terminal and timed from
+launch to the user menu showing. Memory is read once the page is up: the renderer's JS heap and DOM
+node count, and, if psutil is installed, the resident memory of all of Chrome's processes. Action
+latency (trade, modify, delete) is then measured through request_server's job runner, as in
+bench_actions.py. --animate gives the mock's dialogs an open animation, which lean mode cuts to zero.
+
+With --url the launches and memory readings go against that page instead (e.g. the real terminal
+with --profile-dir pointing at a logged-in profile) and no actions are run.
+
+Usage:
+    python bench_browser_mode.py [--modes standard lean] [--launches 3] [--positions 10] [--repeat 10]
+                                 [--animate 150] [--fill 150] [--close 100] [--modify 100] [--panel 0]
+                                 [--url URL] [--profile-dir DIR] [--profile Default]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import request_server  # noqa: E402
+from bench_actions import bench_position_count, percentile  # noqa: E402
+from browser_mode import BROWSER_MODES, apply_mode_options, apply_mode_session  # noqa: E402
+from mock_terminal.serve import start_server, terminal_url  # noqa: E402
+from page_wait import wait_present  # noqa: E402
+from trade_store import TradeStore  # noqa: E402
+
+BENCH_ACTIONS = ("trade", "modify", "delete")
+
+
+def launch(mode, args):
+    """Starts Chrome in the given mode the way initialize_browser does. Returns (driver, temp profile dir or None)."""
+    options = Options()
+    temp_dir = None
+    if args.profile_dir:
+        options.add_argument(f"user-data-dir={args.profile_dir}")
+        options.add_argument(f"profile-directory={args.profile}")
+    else:
+        # A fresh profile per launch, so no run starts with another's cache
+        temp_dir = tempfile.mkdtemp(prefix="bench_browser_mode_")
+        options.add_argument(f"user-data-dir={temp_dir}")
+    if mode == "standard" and args.headless_standard:
+        options.add_argument("--headless=new")
+    apply_mode_options(options, mode)
+    driver = webdriver.Chrome(options=options)
+    apply_mode_session(driver, mode)
+    return driver, temp_dir
+
+
+def chrome_rss_mb(driver):
+    """Resident memory of every process chromedriver started, in MB. None without psutil."""
+    if psutil is None:
+        return None
+    try:
+        children = psutil.Process(driver.service.process.pid).children(recursive=True)
+    except Exception:
+        return None
+    total = 0
+    for child in children:
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / (1024 * 1024)
+
+
+def page_memory(driver):
+    """(JS heap used in MB, DOM nodes) of the current page."""
+    driver.execute_cdp_cmd("Performance.enable", {})
+    metrics = {m["name"]: m["value"] for m in driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]}
+    return metrics.get("JSHeapUsedSize", 0) / (1024 * 1024), int(metrics.get("Nodes", 0))
+
+
+def bench_mode(mode, url, args):
+    result = {"launch": [], "ready": [], "heap": [], "nodes": [], "rss": [], "samples": {}, "errors": {}}
+    for launch_index in range(args.launches):
+        start = time.perf_counter()
+        driver, temp_dir = launch(mode, args)
+        launched = time.perf_counter()
+        try:
+            driver.get(url)
+            wait_present(driver, By.ID, "navbar-UserMenuButton", timeout=20)
+            ready = time.perf_counter()
+            result["launch"].append((launched - start) * 1000)
+            result["ready"].append((ready - start) * 1000)
+
+            # Let the page settle before reading memory
+            time.sleep(args.settle)
+            heap, nodes = page_memory(driver)
+            result["heap"].append(heap)
+            result["nodes"].append(nodes)
+            rss = chrome_rss_mb(driver)
+            if rss is not None:
+                result["rss"].append(rss)
+
+            # Action latency once per mode, on the last launch
+            if not args.url and launch_index == args.launches - 1:
+                session = request_server.current_session()
+                session.driver = driver
+                request_server.ensure_trade_confirmations_off()
+                bench_position_count(driver, url, args.positions, args, result["samples"], result["errors"])
+        finally:
+            driver.quit()
+            if temp_dir:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+    return result
+
+
+def median_text(values, unit, digits=1):
+    if not values:
+        return "-"
+    return f"{percentile(values, 0.5):.{digits}f}{unit}"
+
+
+def print_results(results, args):
+    print(f"{'mode':>9} | {'launch':>9} | {'ready':>9} | {'js heap':>9} | {'nodes':>6} | {'chrome rss':>10}")
+    print("-" * 66)
+    for mode, result in results.items():
+        print(
+            f"{mode:>9} | {median_text(result['launch'], 'ms'):>9} | {median_text(result['ready'], 'ms'):>9} | "
+            f"{median_text(result['heap'], 'MB'):>9} | {median_text(result['nodes'], '', 0):>6} | "
+            f"{median_text(result['rss'], 'MB'):>10}"
+        )
+    if psutil is None:
+        print("(install psutil to measure Chrome's resident memory)")
+    if args.url:
+        return
+
+    print()
+    print(f"{'mode':>9} | {'action':>7} | {'runs':>4} | {'errors':>6} | {'p50':>9} | {'p90':>9} | {'max':>9}")
+    print("-" * 70)
+    for mode, result in results.items():
+        for action in BENCH_ACTIONS:
+            values = result["samples"].get((action, args.positions))
+            if not values:
+                continue
+            failed = len(result["errors"].get((action, args.positions), []))
+            print(
+                f"{mode:>9} | {action:>7} | {len(values):>4} | {failed:>6} | {percentile(values, 0.5):>7.1f}ms | "
+                f"{percentile(values, 0.9):>7.1f}ms | {max(values):>7.1f}ms"
+            )
+    for mode, result in results.items():
+        for (action, _), messages in sorted(result["errors"].items()):
+            print(f"[{mode} {action}] first error: {messages[0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=BROWSER_MODES, default=list(BROWSER_MODES))
+    parser.add_argument("--launches", type=int, default=3, help="Chrome launches per mode")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds to wait after load before reading memory")
+    parser.add_argument("--positions", type=int, default=10, help="Other open positions while actions are timed")
+    parser.add_argument("--repeat", type=int, default=10, help="Trade/modify/delete rounds per mode")
+    parser.add_argument("--symbols", nargs="+", default=["EURUSD"], help="Rotated through, one per round")
+    parser.add_argument("--animate", type=int, default=150, help="Mock open animation in ms")
+    parser.add_argument("--fill", type=int, default=150, help="Mock order-to-row delay in ms")
+    parser.add_argument("--close", type=int, default=100, help="Mock close delay in ms")
+    parser.add_argument("--modify", type=int, default=100, help="Mock TP/SL save delay in ms")
+    parser.add_argument("--panel", type=int, default=0, help="Mock panel/popup open delay in ms")
+    parser.add_argument("--headless-standard", action="store_true",
+                        help="Run standard mode headless too, to separate the other savings from headless itself")
+    parser.add_argument("--url", help="Measure launches and memory against this page instead; no actions are run")
+    parser.add_argument("--profile-dir", help="Chrome User Data Directory to launch with (default: a fresh one per launch)")
+    parser.add_argument("--profile", default="Default")
+    args = parser.parse_args()
+    # bench_position_count reads these
+    args.actions = list(BENCH_ACTIONS)
+
+    server = None
+    if args.url:
+        url = args.url
+    else:
+        server, base_url = start_server()
+        url = terminal_url(base_url, fill=args.fill, close=args.close, modify=args.modify, panel=args.panel,
+                           animate=args.animate)
+        # Keep benchmark tickets out of the real trade map
+        request_server.current_session().trade_map = TradeStore(os.path.join(tempfile.mkdtemp(), "trade_map"))
+
+    results = {}
+    try:
+        for mode in args.modes:
+            print(f"[bench_browser_mode] {mode} mode...")
+            results[mode] = bench_mode(mode, url, args)
+    finally:
+        if server:
+            server.shutdown()
+
+    print()
+    print_results(results, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Benchmark: open-positions lookup time against row count.
+
+Builds a page that mimics the terminal's open-positions table with N rows, then times
+the old per-row XPath walk against the single execute_script snapshot used by request_server.
+
+Usage:
+    python bench_positions_snapshot.py [--rows 5 10 20 40 80] [--repeat 20] [--headed]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+import urllib.parse
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import NoSuchElementException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import request_server  # noqa: E402
+
+ROW_TEMPLATE = """
+<engine-list-element>
+  <div class="top-section-table__symbol">EURUSD</div>
+  <div class="top-section-table__side">Buy</div>
+  <div class="top-section-table__volume">0.10</div>
+  <mtr-security-order-button id="editTakeProfit"><button>1.10{n:03d}</button></mtr-security-order-button>
+  <mtr-security-order-button id="editStopLoss"><button>1.05{n:03d}</button></mtr-security-order-button>
+  <div class="bottom-section-table__position-id">{ticket}</div>
+  <button id="closePositionButton" title="Close position">x</button>
+</engine-list-element>
+"""
+
+
+def build_page(row_count):
+    rows = "".join(ROW_TEMPLATE.format(n=n, ticket=900000 + n) for n in range(row_count))
+    html = (
+        "<html><body>"
+        "<mtr-open-positions-desktop class='open-positions-desktop'>"
+        f"<div class='engine-list--overflow'>{rows}</div>"
+        "</mtr-open-positions-desktop>"
+        "</body></html>"
+    )
+    return "data:text/html;charset=utf-8," + urllib.parse.quote(html)
+
+
+def legacy_get_open_trade_ids(driver):
+    """The pre-snapshot implementation: one find_element round trip per row."""
+    container = driver.find_element(By.XPATH, "//mtr-open-positions-desktop[contains(@class, 'open-positions-desktop')]")
+    overflow_container = container.find_element(By.CLASS_NAME, "engine-list--overflow")
+    ids = []
+    for trade in overflow_container.find_elements(By.TAG_NAME, "engine-list-element"):
+        try:
+            ticket_el = trade.find_element(By.XPATH, ".//div[contains(@class, 'bottom-section-table__position-id')]")
+            ids.append(ticket_el.text.strip())
+        except NoSuchElementException:
+            continue
+    return ids
+
+
+def legacy_find_trade_row(driver, ticket_id):
+    container = driver.find_element(By.XPATH, "//mtr-open-positions-desktop[contains(@class, 'open-positions-desktop')]")
+    overflow_container = container.find_element(By.CLASS_NAME, "engine-list--overflow")
+    for trade in overflow_container.find_elements(By.TAG_NAME, "engine-list-element"):
+        try:
+            trade.find_element(
+                By.XPATH, f".//div[contains(@class, 'bottom-section-table__position-id') and contains(text(), '{ticket_id}')]"
+            )
+            return trade
+        except NoSuchElementException:
+            continue
+    return None
+
+
+def time_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[5, 10, 20, 40, 80])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--headed", action="store_true", help="Show the browser window")
+    args = parser.parse_args()
+
+    options = Options()
+    if not args.headed:
+        options.add_argument("--headless=new")
+    driver = webdriver.Chrome(options=options)
+    request_server.current_session().driver = driver
+
+    print(f"{'rows':>6} | {'legacy ids':>11} | {'snapshot ids':>12} | {'legacy find':>11} | {'snapshot find':>13}")
+    print("-" * 66)
+    try:
+        for row_count in args.rows:
+            driver.get(build_page(row_count))
+            last_ticket = str(900000 + row_count - 1)
+
+            legacy_ids = time_ms(lambda: legacy_get_open_trade_ids(driver), args.repeat)
+            snapshot_ids = time_ms(lambda: [p.ticket for p in request_server.snapshot_positions()], args.repeat)
+            legacy_find = time_ms(lambda: legacy_find_trade_row(driver, last_ticket), args.repeat)
+            snapshot_find = time_ms(lambda: request_server.find_trade_row(last_ticket), args.repeat)
+
+            print(
+                f"{row_count:>6} | {legacy_ids:>9.1f}ms | {snapshot_ids:>10.1f}ms | "
+                f"{legacy_find:>9.1f}ms | {snapshot_find:>11.1f}ms"
+            )
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,425 @@
+"""
+Records MT5 signals and replays them against request_server.
+
+record   Listens where the EA normally posts, appends every request to a JSON-lines file with its
+         arrival time, and forwards it to the real server (or answers 202 itself with no --upstream).
+replay   Sends a recording to a server:
+           --mode original  with the recorded gaps between requests
+           --mode scaled    with the gaps divided by --speed (2 = twice as fast)
+           --mode rate      as fast as --rate requests/second allows, looping the recording up to --count
+         Requests go out on --concurrency threads. A ticket always goes to the same thread, so each
+         ticket's trade, modifies and delete keep their order. Looped copies get their own tickets and
+         sequence numbers, so the server runs each copy instead of answering it as a retry.
+         Every job is then polled through /api/jobs/<id> until it finishes.
+compare  Prints the summaries of several replay runs side by side.
+
+The replay summary covers throughput, HTTP acknowledgement time, queueing delay, run time, error rate
+and ticket-mapping correctness (every opened MT5 ticket got its own web ticket).
+
+Usage:
+    python signal_replay.py record --out signals.jsonl [--listen 5001] [--upstream http://127.0.0.1:5000]
+    python signal_replay.py replay signals.jsonl [--target http://127.0.0.1:5000] [--mode original|scaled|rate]
+                                   [--speed 2] [--rate 20] [--count 500] [--concurrency 4] [--out run.json]
+    python signal_replay.py compare run_a.json run_b.json ...
+"""
+import argparse
+import http.server
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Added to a ticket (and a numeric seq) for each extra pass over the recording in rate mode, so copies never collide
+TICKET_STRIDE = 10 ** 12
+JOB_POLL_INTERVAL = 0.1  # seconds
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of a list of numbers, or None for an empty list."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def http_json(method, url, payload=None, timeout=10):
+    """Returns (HTTP status, decoded JSON body or None). Connection errors are raised."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(url, data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            status, body = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    try:
+        return status, json.loads(body or b"null")
+    except ValueError:
+        return status, None
+
+
+# --- Record --- #
+
+def record(args):
+    start = time.time()
+    lock = threading.Lock()
+    out = open(args.out, "a", encoding="utf-8")
+    upstream = args.upstream.rstrip("/") if args.upstream else None
+
+    class RecordingHandler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                payload = None
+            entry = {"t": round(time.time() - start, 4), "path": self.path, "payload": payload}
+
+            if upstream:
+                try:
+                    status, response = http_json("POST", upstream + self.path, payload)
+                except OSError as e:
+                    status, response = 502, {"error": f"upstream unreachable: {e}"}
+            else:
+                status, response = 202, {"status": "recorded"}
+            entry["status"] = status
+
+            with lock:
+                out.write(json.dumps(entry) + "\n")
+                out.flush()
+            print(f"[record] {entry['t']:>9.3f}s {self.path} {(payload or {}).get('action', '')} -> {status}")
+
+            reply = json.dumps(response).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("0.0.0.0", args.listen), RecordingHandler)
+    print(f"[record] Listening on port {args.listen}, writing to {args.out}"
+          + (f", forwarding to {upstream}" if upstream else ""))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        out.close()
+
+
+# --- Replay --- #
+
+def load_recording(path):
+    entries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def _copy_for_loop(payload, loop):
+    """
+    Copies a payload for pass `loop` over the recording, including inside batches and syncs: every ticket
+    is moved by loop * TICKET_STRIDE and every seq is made unique to the pass. Without a new seq the
+    server's idempotency cache would answer a ticketless copy (delete_all, sync, batch) with the first
+    pass's job.
+    """
+    if not loop or not isinstance(payload, dict):
+        return payload
+    offset = loop * TICKET_STRIDE
+    payload = dict(payload)
+    if isinstance(payload.get("ticket"), int) and payload["ticket"]:
+        payload["ticket"] += offset
+    seq = payload.get("seq")
+    if isinstance(seq, int):
+        payload["seq"] = seq + offset
+    elif seq not in (None, ""):
+        payload["seq"] = f"{seq}-{loop}"
+    for key in ("actions", "positions"):
+        if isinstance(payload.get(key), list):
+            payload[key] = [_copy_for_loop(item, loop) for item in payload[key]]
+    return payload
+
+
+def build_schedule(entries, args):
+    """Returns [(send offset in seconds, path, payload)] for the chosen mode."""
+    if args.mode == "rate":
+        count = args.count or len(entries)
+        schedule = []
+        for index in range(count):
+            loop, position = divmod(index, len(entries))
+            entry = entries[position]
+            schedule.append((index / args.rate, entry["path"], _copy_for_loop(entry["payload"], loop)))
+        return schedule
+
+    speed = args.speed if args.mode == "scaled" else 1.0
+    first = entries[0]["t"] if entries else 0
+    return [((entry["t"] - first) / speed, entry["path"], entry["payload"]) for entry in entries]
+
+
+def _worker_for(payload, concurrency):
+    ticket = payload.get("ticket") if isinstance(payload, dict) else None
+    if ticket in (None, "", 0):
+        return 0
+    return hash(str(ticket)) % concurrency
+
+
+def replay(args):
+    entries = load_recording(args.recording)
+    if not entries:
+        print(f"[replay] {args.recording} is empty")
+        return
+    target = args.target.rstrip("/")
+    schedule = build_schedule(entries, args)
+    print(f"[replay] Sending {len(schedule)} requests to {target} ({args.mode} mode, {args.concurrency} threads)")
+
+    sent = []  # one dict per request
+    sent_lock = threading.Lock()
+    queues = [queue.Queue() for _ in range(args.concurrency)]
+    start = time.time()
+
+    def sender(work):
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            offset, path, payload = item
+            delay = start + offset - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            record = {"path": path, "payload": payload, "sent_at": time.time()}
+            if isinstance(payload, dict) and "sent_at" in payload:
+                # The recorded stamp is long past; the server should age the request from now
+                payload = dict(payload, sent_at=record["sent_at"])
+            try:
+                status, response = http_json("POST", target + path, payload)
+                record["status"] = status
+                record["response"] = response
+            except OSError as e:
+                record["status"] = None
+                record["response"] = {"error": str(e)}
+            record["ack_ms"] = round((time.time() - record["sent_at"]) * 1000, 1)
+            with sent_lock:
+                sent.append(record)
+
+    threads = [threading.Thread(target=sender, args=(work,), daemon=True) for work in queues]
+    for thread in threads:
+        thread.start()
+    for item in schedule:
+        queues[_worker_for(item[2], args.concurrency)].put(item)
+    for work in queues:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+    send_seconds = time.time() - start
+
+    jobs = poll_jobs(target, sent, args.job_timeout)
+    summary = summarize(args, sent, jobs, send_seconds, time.time() - start)
+    print_summaries([summary])
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"[replay] Summary written to {args.out}")
+    if summary["duplicate_acks"]:
+        # Those requests did no browser work of their own, so the run's numbers don't measure what was sent
+        sys.exit(f"[replay] The server answered {summary['duplicate_acks']} requests with an earlier job; restart it "
+                 "or wait out its idempotency TTL before replaying the same recording again")
+
+
+def poll_jobs(target, sent, timeout):
+    """Polls every job id the server handed out until it finishes. Returns {job_id: final job info}."""
+    pending = {
+        record["response"]["job_id"]
+        for record in sent
+        if isinstance(record.get("response"), dict) and record["response"].get("job_id")
+    }
+    jobs = {}
+    deadline = time.time() + timeout
+    while pending and time.time() < deadline:
+        for job_id in list(pending):
+            try:
+                status, info = http_json("GET", f"{target}/api/jobs/{job_id}")
+            except OSError:
+                continue
+            if status == 404:
+                pending.discard(job_id)
+            elif isinstance(info, dict) and info.get("status") not in ("queued", "running"):
+                jobs[job_id] = info
+                pending.discard(job_id)
+        if pending:
+            time.sleep(JOB_POLL_INTERVAL)
+    if pending:
+        print(f"[replay] {len(pending)} jobs still unfinished after {timeout}s")
+    for job_id in pending:
+        jobs[job_id] = {"status": "timeout"}
+    return jobs
+
+
+def _job_accounts(info):
+    """A job's per-account entries: one for a single-account job, one per account for a fanned-out group."""
+    if "accounts" in info:
+        return info["accounts"]
+    return {"default": info}
+
+
+def summarize(args, sent, jobs, send_seconds, total_seconds):
+    acked = [record for record in sent if record["status"] is not None and 200 <= record["status"] < 300]
+    http_errors = len(sent) - len(acked)
+    # Requests the server took for a retry of an earlier one and answered with that job instead of a new one
+    duplicate_acks = sum(1 for record in acked if isinstance(record["response"], dict) and record["response"].get("duplicate"))
+
+    queued_ms, run_ms, failed_jobs, cancelled_jobs = [], [], 0, 0
+    for info in jobs.values():
+        for account in _job_accounts(info).values():
+            if account.get("status") == "cancelled":
+                cancelled_jobs += 1
+                continue
+            if account.get("status") in ("failed", "timeout"):
+                failed_jobs += 1
+            if account.get("queued_ms") is not None:
+                queued_ms.append(account["queued_ms"])
+            if account.get("run_ms") is not None:
+                run_ms.append(account["run_ms"])
+
+    # Ticket mapping: every opened MT5 ticket should end up with a web ticket of its own, per account
+    mapped, unmapped, owners = 0, [], {}
+    for record in acked:
+        payload = record["payload"]
+        if record["path"] != "/api/trades" or payload.get("action") != "trade":
+            continue
+        info = jobs.get((record["response"] or {}).get("job_id"))
+        if info is None:
+            unmapped.append(payload.get("ticket"))
+            continue
+        for account_name, account in _job_accounts(info).items():
+            if account.get("status") == "cancelled":
+                continue  # closed again before it was opened, nothing to map
+            web_ticket = account.get("web_ticket")
+            if not web_ticket:
+                unmapped.append(payload.get("ticket"))
+                continue
+            mapped += 1
+            owners.setdefault((account_name, web_ticket), set()).add(payload.get("ticket"))
+    duplicates = {f"{account}:{web}": sorted(map(str, tickets)) for (account, web), tickets in owners.items() if len(tickets) > 1}
+
+    finished_jobs = len(jobs)
+    return {
+        "label": args.label or os.path.splitext(os.path.basename(args.out or args.recording))[0],
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "requests": len(sent),
+        "send_seconds": round(send_seconds, 2),
+        "total_seconds": round(total_seconds, 2),
+        "requests_per_s": round(len(sent) / send_seconds, 2) if send_seconds else None,
+        "jobs": finished_jobs,
+        "jobs_per_s": round(finished_jobs / total_seconds, 2) if total_seconds else None,
+        "http_errors": http_errors,
+        "http_error_rate": round(http_errors / len(sent), 4) if sent else 0,
+        "duplicate_acks": duplicate_acks,
+        "failed_jobs": failed_jobs,
+        "cancelled_jobs": cancelled_jobs,
+        "job_error_rate": round(failed_jobs / finished_jobs, 4) if finished_jobs else 0,
+        "ack_ms": _percentiles([record["ack_ms"] for record in sent]),
+        "queued_ms": _percentiles(queued_ms),
+        "run_ms": _percentiles(run_ms),
+        "trades_mapped": mapped,
+        "trades_unmapped": len(unmapped),
+        "duplicate_web_tickets": duplicates,
+        "mapping_ok": not unmapped and not duplicates,
+    }
+
+
+def _percentiles(samples):
+    return {f"p{int(q * 100)}": percentile(samples, q) for q in (0.5, 0.9, 0.99)}
+
+
+# --- Compare --- #
+
+SUMMARY_ROWS = [
+    ("mode", "mode"),
+    ("concurrency", "concurrency"),
+    ("requests", "requests"),
+    ("requests/s", "requests_per_s"),
+    ("jobs/s", "jobs_per_s"),
+    ("http error rate", "http_error_rate"),
+    ("job error rate", "job_error_rate"),
+    ("duplicate acks", "duplicate_acks"),
+    ("cancelled jobs", "cancelled_jobs"),
+    ("ack p50 ms", ("ack_ms", "p50")),
+    ("ack p99 ms", ("ack_ms", "p99")),
+    ("queued p50 ms", ("queued_ms", "p50")),
+    ("queued p99 ms", ("queued_ms", "p99")),
+    ("run p50 ms", ("run_ms", "p50")),
+    ("run p99 ms", ("run_ms", "p99")),
+    ("trades mapped", "trades_mapped"),
+    ("trades unmapped", "trades_unmapped"),
+    ("mapping ok", "mapping_ok"),
+]
+
+
+def print_summaries(summaries):
+    width = max([16] + [len(str(summary["label"])) for summary in summaries])
+    print(f"{'':>16} | " + " | ".join(f"{str(summary['label']):>{width}}" for summary in summaries))
+    print("-" * (19 + (width + 3) * len(summaries)))
+    for title, key in SUMMARY_ROWS:
+        values = []
+        for summary in summaries:
+            value = summary.get(key[0], {}).get(key[1]) if isinstance(key, tuple) else summary.get(key)
+            values.append("-" if value is None else str(value))
+        print(f"{title:>16} | " + " | ".join(f"{value:>{width}}" for value in values))
+    for summary in summaries:
+        if summary.get("duplicate_web_tickets"):
+            print(f"[{summary['label']}] web tickets mapped to several MT5 tickets: {summary['duplicate_web_tickets']}")
+
+
+def compare(args):
+    summaries = []
+    for path in args.runs:
+        with open(path, "r", encoding="utf-8") as f:
+            summaries.append(json.load(f))
+    print_summaries(summaries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Record signals while forwarding them")
+    record_parser.add_argument("--out", required=True, help="JSON-lines file to append to")
+    record_parser.add_argument("--listen", type=int, default=5001, help="Port for the EA to post to")
+    record_parser.add_argument("--upstream", help="Server to forward to, e.g. http://127.0.0.1:5000")
+    record_parser.set_defaults(func=record)
+
+    replay_parser = commands.add_parser("replay", help="Replay a recording against a server")
+    replay_parser.add_argument("recording")
+    replay_parser.add_argument("--target", default="http://127.0.0.1:5000")
+    replay_parser.add_argument("--mode", choices=("original", "scaled", "rate"), default="original")
+    replay_parser.add_argument("--speed", type=float, default=1.0, help="Playback speed for scaled mode")
+    replay_parser.add_argument("--rate", type=float, default=10.0, help="Requests per second for rate mode")
+    replay_parser.add_argument("--count", type=int, help="Requests to send in rate mode (default: one pass)")
+    replay_parser.add_argument("--concurrency", type=int, default=1)
+    replay_parser.add_argument("--job-timeout", type=float, default=120.0, help="Seconds to wait for jobs to finish")
+    replay_parser.add_argument("--label", help="Name of this run in comparisons")
+    replay_parser.add_argument("--out", help="Write the run summary here as JSON")
+    replay_parser.set_defaults(func=replay)
+
+    compare_parser = commands.add_parser("compare", help="Compare replay summaries side by side")
+    compare_parser.add_argument("runs", nargs="+")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Chrome launch modes for request_server.
+
+"standard" is the browser as it has always been started: a normal window on the account's profile.
+"lean" trades everything we never look at for speed:
+  - headless, with a fixed desktop-sized window so the terminal keeps its desktop layout
+  - images, fonts, charts and trackers blocked by URL pattern (Network.setBlockedURLs)
+  - a stylesheet injected into every document that plays CSS transitions and animations in zero time
+  - Chrome flags that stop background throttling and the extras a fresh profile starts up
+
+Animations are shortened rather than removed (animation: none) because the terminal may wait for
+animationend/transitionend before it treats a dialog as open, and those events only fire if the
+animation runs. benchmarks/bench_browser_mode.py compares the two modes.
+"""
+import json
+
+from event_log import get_logger
+
+log = get_logger("browser_mode")
+
+BROWSER_MODES = ("standard", "lean")
+
+# Requests matching these are failed before they leave the browser. Tune them for your terminal:
+# anything the order panel, the positions table or the login needs must stay unblocked.
+BLOCKED_URL_PATTERNS = [
+    # Images and fonts
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    # Charting libraries
+    "*charting_library*", "*tradingview*", "*/charts/*",
+    # Analytics and trackers
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar*", "*facebook.net*",
+]
+
+# Zero-length transitions and animations, for every element and pseudo-element
+NO_ANIMATION_CSS = """
+*, *::before, *::after {
+    transition-duration: 0s !important;
+    transition-delay: 0s !important;
+    animation-duration: 0s !important;
+    animation-delay: 0s !important;
+    scroll-behavior: auto !important;
+}
+"""
+
+# Adds NO_ANIMATION_CSS to each new document as early as it can (before the app's own styles load)
+INJECT_CSS_JS = """
+(function () {
+    const css = %s;
+    const add = function () {
+        const style = document.createElement("style");
+        style.setAttribute("data-browser-mode", "lean");
+        style.textContent = css;
+        (document.head || document.documentElement).appendChild(style);
+    };
+    if (document.documentElement) { add(); } else { document.addEventListener("DOMContentLoaded", add); }
+})();
+"""
+
+LEAN_CHROME_FLAGS = [
+    "--headless=new",
+    # Headless defaults to 800x600, which switches the terminal to its compact layout
+    "--window-size=1920,1080",
+    # Keep timers and rendering at full speed although no window is ever in front
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+    # Nothing we need from these
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-notifications",
+    "--disable-features=Translate,MediaRouter,OptimizationHints,CalculateNativeWinOcclusion",
+    "--no-first-run",
+    "--mute-audio",
+    "--disable-dev-shm-usage",
+]
+
+
+def apply_mode_options(options, mode):
+    """Adds the mode's Chrome flags to options for a driver about to be created."""
+    if mode not in BROWSER_MODES:
+        raise ValueError(f"Unknown browser mode {mode!r}, expected one of {BROWSER_MODES}")
+    if mode == "lean":
+        for flag in LEAN_CHROME_FLAGS:
+            options.add_argument(flag)
+
+
+def apply_mode_session(driver, mode):
+    """
+    Sets up the mode on a new driver, before the terminal is loaded. Both settings last for the
+    life of the tab, refreshes included.
+    """
+    if mode != "lean":
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        log.warning("Could not block assets: %s", e)
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INJECT_CSS_JS % json.dumps(NO_ANIMATION_CSS)})
+    except Exception as e:
+        log.warning("Could not inject the no-animation stylesheet: %s", e)
+
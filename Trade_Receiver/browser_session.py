@@ -0,0 +1,161 @@
+"""
+Per-account browser state for request_server.
+
+Each configured web account gets a BrowserSession: its own Chrome driver, trade map, job queue and
+cached page state, driven by its own worker thread. The browser helpers in request_server were written
+against module globals (`driver`, `trade_map`, ...), so those names are SessionBound stand-ins that
+forward to whichever session is bound to the calling thread. A worker binds its session once at
+start, and every helper it calls then acts on that session's browser.
+
+A session may also keep a hot standby, a second BrowserPage on the same account. Binding a page with
+using_session() points the same helpers at it, which is how the standby is built and checked.
+
+A page with order windows (window_pool.py) keeps several terminal windows in its one browser. `windows`
+tracks them, and order_panel is whichever window's panel the driver is on.
+"""
+import contextlib
+import threading
+import time
+
+from action_queue import ActionQueue
+from positions_mirror import PositionsMirror
+from trade_store import TradeStore
+
+_local = threading.local()
+_default_session = None
+
+
+class BrowserPage:
+    """One Chrome browser on the web terminal, and what we have cached about its page."""
+
+    # Everything that belongs to the browser rather than to the account; moved over as a whole on failover
+    PAGE_ATTRIBUTES = ("driver", "profile_dir", "windows", "order_panel", "symbol_index", "resolved_symbols",
+                       "health", "last_refresh_at", "last_refresh")
+
+    def __init__(self, name, profile_dir="", profile="Default", browser_mode="standard", order_windows=0):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.profile = profile
+        self.browser_mode = browser_mode
+        self.order_windows = order_windows  # how many order windows to open next to the positions window
+        self.driver = None
+        self.windows = None  # WindowPool, once the order windows are open
+        # Cached page state, reset whenever the page reloads
+        self.order_panel = {"symbol": None, "open": False, "sl_open": False, "tp_open": False}
+        self.symbol_index = None
+        self.resolved_symbols = {}
+        # Page health, from the last health check and refresh
+        self.health = None
+        self.last_refresh_at = time.time()
+        self.last_refresh = None
+        # {phase: {"status", "duration_ms", ...}} from the last time this browser was started.
+        # Written by the worker and the trade-map loader, read by /api/ready: only touch it under boot_lock
+        self.boot_phases = {}
+        self.boot_lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {self.name}>"
+
+
+class BrowserSession(BrowserPage):
+    """One web account: its browser, its {MT5_ticket: Web_terminal_ticket} map and its job queue."""
+
+    def __init__(self, name, trade_map_path, profile_dir="", profile="Default", volume_multiplier=1.0,
+                 browser_mode="standard", standby_profile_dir="", order_windows=0):
+        super().__init__(name, profile_dir, profile, browser_mode, order_windows)
+        self.volume_multiplier = volume_multiplier
+        self.trade_map = TradeStore(trade_map_path)
+        self.action_queue = ActionQueue()
+        # The positions table as last collected from whichever browser is current; read by /api/positions
+        self.positions = PositionsMirror()
+        # Cold start: set by the worker as it boots the account (see /api/ready)
+        self.boot_started_at = None
+        self.ready_at = None
+        # Hot standby: a second logged-in browser on the same account, kept ready by its own thread.
+        # standby_profile_dir is the Chrome User Data Directory the next standby is built in.
+        self.standby_profile_dir = standby_profile_dir
+        self.standby = None  # BrowserPage, only while it is ready to take over
+        self.retired_driver = None  # the failed browser, for the standby thread to shut down
+        self.standby_lock = threading.Lock()
+        self.standby_wake = threading.Event()
+        self.failovers = 0
+        self.last_failover = None
+
+    def take_over(self, page):
+        """Makes `page` this session's browser. Returns the driver it replaced."""
+        replaced = self.driver
+        for attribute in self.PAGE_ATTRIBUTES:
+            setattr(self, attribute, getattr(page, attribute))
+        return replaced
+
+
+def set_default_session(session):
+    """The session used by threads that have not bound one (e.g. the main thread at startup)."""
+    global _default_session
+    _default_session = session
+
+
+def current_session():
+    session = getattr(_local, "session", None) or _default_session
+    if session is None:
+        raise RuntimeError("No browser session bound to this thread")
+    return session
+
+
+def bind_session(session):
+    """Binds a session to the calling thread for good. Used by each session's worker thread."""
+    _local.session = session
+
+
+@contextlib.contextmanager
+def using_session(session):
+    """Temporarily binds a session to the calling thread."""
+    previous = getattr(_local, "session", None)
+    _local.session = session
+    try:
+        yield session
+    finally:
+        _local.session = previous
+
+
+class SessionBound:
+    """
+    Stands in for a per-session module global. Attribute access, item access, `in` and len()
+    are forwarded to that attribute of the session bound to the current thread.
+    """
+
+    def __init__(self, attribute):
+        object.__setattr__(self, "_attribute", attribute)
+
+    def _target(self):
+        return getattr(current_session(), self._attribute)
+
+    def __getattr__(self, name):
+        return getattr(self._target(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target(), name, value)
+
+    def __getitem__(self, key):
+        return self._target()[key]
+
+    def __setitem__(self, key, value):
+        self._target()[key] = value
+
+    def __delitem__(self, key):
+        del self._target()[key]
+
+    def __contains__(self, key):
+        return key in self._target()
+
+    def __len__(self):
+        return len(self._target())
+
+    def __iter__(self):
+        return iter(self._target())
+
+    def __bool__(self):
+        return self._target() is not None
+
+    def __repr__(self):
+        return f"<SessionBound {self._attribute}: {self._target()!r}>"
@@ -0,0 +1,198 @@
+"""
+Structured logging for request_server that never blocks the thread doing the logging.
+
+A log call only builds a record and puts it on an in-memory queue. A QueueListener thread formats
+each record as one JSON line and writes it out, so a slow terminal or log pipe can only hold up that
+thread, never an order. If the queue is full the record is dropped and counted rather than waited on.
+
+Every line carries the component (the logger name under "copy_machine."), the function that logged
+and the message, plus the context of the thread that logged it:
+  - request_id, job_id, mt5_ticket, web_ticket: set with log_context() / set_log_fields()
+  - stage, action, symbol, account: taken from metrics (stage() and job_labels())
+
+Levels are set per component. Each call site (file and line) may write at most `burst` lines every
+`interval` seconds; the rest are counted and reported on its next line as "suppressed". Errors and
+the audit components (which MT5 ticket was linked to which web ticket) are never rate limited.
+"""
+import atexit
+import contextlib
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+from metrics import current_labels, current_stage
+
+ROOT_LOGGER = "copy_machine"
+LOG_QUEUE_SIZE = 10000  # records waiting to be written before new ones are dropped
+# Components whose every line is kept: they are the record of which positions were linked
+AUDIT_COMPONENTS = {"audit", "trade_store"}
+
+_context = threading.local()
+_handler = None
+_listener = None
+_rate_limit = None
+
+
+def get_logger(component):
+    return logging.getLogger(f"{ROOT_LOGGER}.{component}")
+
+
+@contextlib.contextmanager
+def log_context(**fields):
+    """Fields (request_id, job_id, mt5_ticket, ...) added to every line logged on this thread inside the block."""
+    previous = getattr(_context, "fields", None)
+    _context.fields = dict(previous or {}, **fields)
+    try:
+        yield
+    finally:
+        _context.fields = previous
+
+
+def set_log_fields(**fields):
+    """Adds fields to the innermost log_context for the rest of it, e.g. the web ticket once it is known."""
+    current = getattr(_context, "fields", None)
+    if current is not None:
+        current.update(fields)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the logging thread's context onto the record, before it is handed to the listener thread."""
+
+    def filter(self, record):
+        context = current_labels()
+        stage = current_stage()
+        if stage:
+            context["stage"] = stage
+        context.update(getattr(_context, "fields", None) or {})
+        # log.info(..., extra={"fields": {...}}) for one-off fields
+        context.update(getattr(record, "fields", None) or {})
+        record.context = context
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets at most `burst` records per call site through every `interval` seconds, and counts the rest."""
+
+    def __init__(self, burst=5, interval=10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.suppressed = 0
+        self._exempt = {f"{ROOT_LOGGER}.{component}" for component in AUDIT_COMPONENTS}
+        self._sites = {}  # {(file, line): [window start, lines let through, lines suppressed]}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or record.name in self._exempt:
+            return True
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or record.created - site[0] >= self.interval:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                site = [record.created, 0, 0]
+                self._sites[key] = site
+            if site[1] < self.burst:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Puts records on a bounded queue without ever waiting; what doesn't fit is dropped."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message now (its args may change once we return), but leave the JSON to the listener
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "component": record.name.split(".", 1)[-1],
+            "func": record.funcName,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "context", {}))
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(levels=None, path="", rate_limit=(5, 10.0)):
+    """
+    Routes every "copy_machine.*" logger through the queue. Safe to call more than once; only the first
+    call takes effect.
+
+    levels: {component: level name}; the "" entry is the default for all components
+    path: also append the JSON lines to this file
+    rate_limit: (burst, interval in seconds) per call site
+    """
+    global _handler, _listener, _rate_limit
+    if _listener is not None:
+        return
+    levels = dict(levels or {})
+
+    outputs = [logging.StreamHandler(sys.stdout)]
+    if path:
+        outputs.append(logging.FileHandler(path, encoding="utf-8"))
+    for output in outputs:
+        output.setFormatter(JsonFormatter())
+
+    _handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _rate_limit = RateLimitFilter(*rate_limit)
+    _handler.addFilter(_rate_limit)  # cheapest first: a suppressed record skips the context lookup
+    _handler.addFilter(ContextFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers[:] = [_handler]
+    root.propagate = False
+    root.setLevel(levels.pop("", "INFO"))
+    for component, level in levels.items():
+        get_logger(component).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, *outputs)
+    _listener.start()
+    # Write out whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+
+
+def log_stats():
+    """Queue depth and how many lines were dropped (queue full) or suppressed (rate limit)."""
+    if _handler is None:
+        return {}
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "suppressed": _rate_limit.suppressed,
+    }
@@ -0,0 +1,170 @@
+"""
+In-process latency histograms for request_server.
+
+Browser work is timed by stage (health check, symbol select, panel open, field input, button click,
+new-ticket detection, refresh fallback) and broken down by action, symbol and account. Whole jobs are
+timed too, from the moment the request arrived to the moment the worker finished it, and, when the
+sender stamped it, from the sender's timestamp.
+
+Served as Prometheus text at /metrics and as JSON (with percentiles) at /api/stats.
+"""
+import contextlib
+import threading
+import time
+
+# Upper bounds in seconds. Browser stages range from a few ms to tens of seconds.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_METRIC = "copy_machine_stage_seconds"
+JOB_METRIC = "copy_machine_job_seconds"
+QUEUE_WAIT_METRIC = "copy_machine_queue_wait_seconds"
+SIGNAL_AGE_METRIC = "copy_machine_signal_age_seconds"
+
+HELP = {
+    STAGE_METRIC: "Time spent in one stage of browser work.",
+    JOB_METRIC: "Signal to fill: from request received to the worker finishing the job.",
+    QUEUE_WAIT_METRIC: "Time a job waited in its account's queue before the worker picked it up.",
+    SIGNAL_AGE_METRIC: "Sender to fill: from the sender's timestamp to the worker finishing the job.",
+}
+
+_context = threading.local()
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus expects."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q):
+        """Estimates a quantile by interpolating inside the bucket it falls in."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for index, bound in enumerate(self.buckets):
+            in_bucket = self.counts[index]
+            if seen + in_bucket >= rank and in_bucket:
+                return lower + (bound - lower) * (rank - seen) / in_bucket
+            seen += in_bucket
+            lower = bound
+        # Beyond the last bound; the best we can say is "at least that"
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # {(metric, ((label, value), ...)): Histogram}
+
+    def observe(self, metric, seconds, **labels):
+        key = (metric, tuple(sorted((name, str(value)) for name, value in labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def prometheus_text(self):
+        lines = []
+        with self._lock:
+            items = sorted(self._histograms.items())
+            for metric in sorted({metric for (metric, _), _ in items}):
+                lines.append(f"# HELP {metric} {HELP.get(metric, metric)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for (name, labels), histogram in items:
+                    if name != metric:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_labels(labels, le=bound)} {cumulative}")
+                    lines.append(f"{metric}_sum{_labels(labels)} {histogram.sum:.6f}")
+                    lines.append(f"{metric}_count{_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """{metric: [{labels..., count, mean_ms, p50_ms, p90_ms, p99_ms}]} for the JSON stats endpoint."""
+        out = {}
+        with self._lock:
+            for (metric, labels), histogram in sorted(self._histograms.items()):
+                entry = dict(labels)
+                entry["count"] = histogram.count
+                entry["mean_ms"] = round(histogram.sum / histogram.count * 1000, 1)
+                for q in (0.5, 0.9, 0.99):
+                    entry[f"p{int(q * 100)}_ms"] = round(histogram.quantile(q) * 1000, 1)
+                out.setdefault(metric, []).append(entry)
+        return out
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + [(name, str(value)) for name, value in extra.items()]
+    if not pairs:
+        return ""
+    escaped = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + escaped + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+
+def current_labels():
+    return dict(getattr(_context, "labels", {}))
+
+
+@contextlib.contextmanager
+def job_labels(**labels):
+    """Labels (action, symbol, account) attached to every stage timed on this thread inside the block."""
+    previous = getattr(_context, "labels", {})
+    _context.labels = dict(previous, **labels)
+    try:
+        yield
+    finally:
+        _context.labels = previous
+
+
+@contextlib.contextmanager
+def stage(name):
+    """Times the enclosed block as one stage of the current job."""
+    previous = getattr(_context, "stage", None)
+    _context.stage = name
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _context.stage = previous
+        registry.observe(STAGE_METRIC, time.perf_counter() - start, stage=name, **current_labels())
+
+
+def current_stage():
+    """The stage being timed on this thread, or None."""
+    return getattr(_context, "stage", None)
+
+
+def observe_job(job, **labels):
+    """Records a finished job's end-to-end time, how long it queued and, if stamped, its age since the sender."""
+    if job.finished_at is None:
+        return
+    registry.observe(JOB_METRIC, job.finished_at - job.created_at, status=job.status, **labels)
+    if job.started_at is not None:
+        registry.observe(QUEUE_WAIT_METRIC, job.started_at - job.created_at, **labels)
+    if job.sent_at is not None:
+        # Clock skew between the sender and us can make this negative; count that as no delay
+        registry.observe(SIGNAL_AGE_METRIC, max(0.0, job.finished_at - job.sent_at), status=job.status, **labels)
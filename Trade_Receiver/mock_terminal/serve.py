@@ -0,0 +1,64 @@
+"""
+Serves the mock web terminal on localhost.
+
+The page in this folder reproduces the DOM request_server drives, so the server and the benchmarks
+can run without a live broker session. Point TERMINAL_URL at the printed address to try it by hand.
+Render delays and the seeded position count are query options, listed at the top of terminal.js.
+
+Usage:
+    python serve.py [--port 8765] [--fill 150] [--close 100] [--modify 100] [--panel 0] [--animate 0] [--positions 0]
+"""
+import argparse
+import functools
+import http.server
+import os
+import threading
+import urllib.parse
+
+MOCK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(port=0):
+    """Serves this folder on 127.0.0.1 from a background thread. Returns (server, base URL of the page)."""
+    handler = functools.partial(QuietHandler, directory=MOCK_DIR)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/index.html"
+
+
+def terminal_url(base_url, **options):
+    """Adds query options (e.g. fill=300, positions=20) to the page URL. None values are left out."""
+    options = {name: value for name, value in options.items() if value is not None}
+    if not options:
+        return base_url
+    return base_url + "?" + urllib.parse.urlencode(options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    for name in ("boot", "panel", "animate", "fill", "close", "modify", "positions"):
+        parser.add_argument(f"--{name}", type=int)
+    parser.add_argument("--login", action="store_true", help="Show the login form on first load")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port)
+    url = terminal_url(
+        base_url,
+        boot=args.boot, panel=args.panel, animate=args.animate, fill=args.fill, close=args.close, modify=args.modify,
+        positions=args.positions, login=1 if args.login else None,
+    )
+    print(f"[mock_terminal] Serving {url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
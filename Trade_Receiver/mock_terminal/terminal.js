@@ -0,0 +1,309 @@
+/*
+ * Mock web terminal for request_server.
+ *
+ * Reproduces the parts of the real terminal's DOM that request_server drives (ids, test ids,
+ * formcontrolnames and class names), with made-up prices and tickets. Positions are kept in
+ * sessionStorage, so a refresh keeps them the way the real terminal's server would.
+ *
+ * Query options (all delays in ms):
+ *   boot       time before the terminal appears after a (re)load       default 0
+ *   login      1 = show the login form until the first sign-in          default 0
+ *   panel      order ticket, SL/TP toggles and edit popups opening      default 0
+ *   animate    CSS open animation the ticket, toggles and popups play   default 0
+ *              before they can be used (ends at once if CSS animations
+ *              are cut to zero, as the lean browser mode does)
+ *   fill       order click to the new row appearing in the table        default 150
+ *   close      close click to the row leaving the table                 default 100
+ *   modify     popup save to the new TP/SL showing in the row           default 100
+ *   positions  positions to seed when the session has none yet          default 0
+ *   favorites  comma separated Favorites list       default EURUSD,GBPUSD,USDJPY,XAUUSD
+ *
+ * window.mockTerminal exposes reset(), seed(n) and positions() for benchmarks.
+ */
+(function () {
+    "use strict";
+
+    const params = new URLSearchParams(window.location.search);
+    const option = function (name, fallback) {
+        const value = params.get(name);
+        return value === null || value === "" ? fallback : Number(value);
+    };
+    const config = {
+        boot: option("boot", 0),
+        login: option("login", 0),
+        panel: option("panel", 0),
+        animate: option("animate", 0),
+        fill: option("fill", 150),
+        close: option("close", 100),
+        modify: option("modify", 100),
+        positions: option("positions", 0),
+        favorites: (params.get("favorites") || "EURUSD,GBPUSD,USDJPY,XAUUSD").split(",").filter(Boolean),
+    };
+    // Everything search can find, Favorites or not
+    const ALL_SYMBOLS = config.favorites.concat(
+        ["AUDUSD", "NZDUSD", "USDCAD", "USDCHF", "EURJPY", "GBPJPY", "US30", "NAS100", "XAGUSD", "BTCUSD"]
+            .filter(function (symbol) { return config.favorites.indexOf(symbol) < 0; })
+    );
+
+    const STORAGE_KEY = "mockTerminal";
+    let state = JSON.parse(sessionStorage.getItem(STORAGE_KEY) || "null");
+    if (!state) {
+        state = { nextTicket: 700001, positions: [], loggedIn: false, confirmationsOff: false };
+    }
+    const save = function () { sessionStorage.setItem(STORAGE_KEY, JSON.stringify(state)); };
+
+    const $ = function (selector) { return document.querySelector(selector); };
+    const later = function (ms, fn) { if (ms > 0) { setTimeout(fn, ms); } else { fn(); } };
+    // Runs fn once an open animation has played, the way the terminal only shows a dialog's content
+    // when its animation is done. Whatever CSS applies to the animation element decides how long that is.
+    const afterAnimation = function (fn) {
+        if (!(config.animate > 0)) { fn(); return; }
+        const animation = document.createElement("div");
+        animation.className = "mock-open-animation";
+        animation.style.animationDuration = config.animate + "ms";
+        animation.addEventListener("animationend", function () { animation.remove(); fn(); });
+        document.body.appendChild(animation);
+    };
+    const opening = function (fn) { later(config.panel, function () { afterAnimation(fn); }); };
+    let selectedSymbol = null;
+    let rendered = false;
+
+    // --- Rows --- //
+
+    const symbolRow = function (symbol) {
+        const row = document.createElement("engine-list-element");
+        row.innerHTML = '<div class="symbol-element-desktop__text-symbol"><span></span></div>';
+        row.querySelector("span").textContent = symbol;
+        row.addEventListener("click", function () { selectSymbol(symbol); });
+        return row;
+    };
+
+    const formatPrice = function (value) { return value ? String(value) : "-"; };
+
+    const positionRow = function (position) {
+        const row = document.createElement("engine-list-element");
+        row.dataset.ticket = position.ticket;
+        row.innerHTML =
+            '<div class="top-section-table__symbol"></div>' +
+            '<div class="top-section-table__side"></div>' +
+            '<div class="top-section-table__volume"></div>' +
+            '<mtr-security-order-button id="editTakeProfit"><button></button></mtr-security-order-button>' +
+            '<mtr-security-order-button id="editStopLoss"><button></button></mtr-security-order-button>' +
+            '<div class="bottom-section-table__position-id"></div>' +
+            '<button id="closePositionButton" title="Close position">&times;</button>';
+        row.querySelector(".top-section-table__symbol").textContent = position.symbol;
+        row.querySelector(".top-section-table__side").textContent = position.side;
+        row.querySelector(".top-section-table__volume").textContent = position.volume;
+        row.querySelector("#editTakeProfit button").textContent = formatPrice(position.tp);
+        row.querySelector("#editStopLoss button").textContent = formatPrice(position.sl);
+        row.querySelector(".bottom-section-table__position-id").textContent = position.ticket;
+        row.querySelector("#editTakeProfit button").addEventListener("click", function () { openPopup(position.ticket, "tp"); });
+        row.querySelector("#editStopLoss button").addEventListener("click", function () { openPopup(position.ticket, "sl"); });
+        row.querySelector("#closePositionButton").addEventListener("click", function () { closePosition(position.ticket); });
+        return row;
+    };
+
+    const table = function () { return $("mtr-open-positions-desktop .engine-list--overflow"); };
+    const rowFor = function (ticket) { return table().querySelector('engine-list-element[data-ticket="' + ticket + '"]'); };
+    const findPosition = function (ticket) {
+        return state.positions.find(function (position) { return position.ticket === ticket; });
+    };
+
+    // --- Positions --- //
+
+    const openPosition = function (symbol, side, volume, tp, sl) {
+        const position = {
+            ticket: String(state.nextTicket++),
+            symbol: symbol,
+            side: side,
+            volume: Number(volume).toFixed(2),
+            tp: Number(tp) || 0,
+            sl: Number(sl) || 0,
+        };
+        state.positions.push(position);
+        save();
+        if (rendered) { table().appendChild(positionRow(position)); }
+        return position;
+    };
+
+    const closePosition = function (ticket) {
+        later(config.close, function () {
+            state.positions = state.positions.filter(function (position) { return position.ticket !== ticket; });
+            save();
+            const row = rowFor(ticket);
+            if (row) { row.remove(); }
+        });
+    };
+
+    const openPopup = function (ticket, field) {
+        opening(function () {
+            const existing = $("mtr-security-order-popup");
+            if (existing) { existing.remove(); }
+            const position = findPosition(ticket);
+            if (!position) { return; }
+            const popup = document.createElement("mtr-security-order-popup");
+            popup.innerHTML =
+                '<div>' + (field === "tp" ? "Take Profit" : "Stop Loss") + ' #' + ticket + '</div>' +
+                '<input class="engine-input-spinner__input">' +
+                '<button data-testid="save-button">Save</button>';
+            popup.querySelector("input").value = position[field] || "";
+            popup.querySelector("button").addEventListener("click", function () {
+                const value = Number(popup.querySelector("input").value) || 0;
+                // The popup stays up until the change is confirmed
+                later(config.modify, function () {
+                    popup.remove();
+                    position[field] = value;
+                    save();
+                    const row = rowFor(ticket);
+                    if (row) {
+                        const button = row.querySelector(field === "tp" ? "#editTakeProfit button" : "#editStopLoss button");
+                        button.textContent = formatPrice(value);
+                    }
+                });
+            });
+            document.body.appendChild(popup);
+        });
+    };
+
+    const placeOrder = function (side, volume, tp, sl) {
+        const symbol = selectedSymbol;
+        if (!symbol) { return; }
+        later(config.fill, function () { openPosition(symbol, side, volume, tp, sl); });
+    };
+
+    // --- Market watch and order ticket --- //
+
+    const selectSymbol = function (symbol) {
+        selectedSymbol = symbol;
+        document.querySelectorAll("engine-list-element.selected").forEach(function (row) { row.classList.remove("selected"); });
+        document.querySelectorAll("#cdk-drop-list-0 engine-list-element").forEach(function (row) {
+            if (row.textContent.trim() === symbol) { row.classList.add("selected"); }
+        });
+        $("#order-ticket-symbol").textContent = symbol;
+        $("#symbol-search").value = "";
+        $("#search-results").innerHTML = "";
+    };
+
+    const setTicketOpen = function (open) {
+        $("#order-ticket").hidden = !open;
+        $("#market-watch-list").hidden = open;
+        if (!open) {
+            $('[formcontrolname="slPrice"]').hidden = true;
+            $('[formcontrolname="tpPrice"]').hidden = true;
+        }
+    };
+
+    const ticketValue = function (name) {
+        const field = $('[formcontrolname="' + name + '"]');
+        return field.hidden ? 0 : field.querySelector("input").value;
+    };
+
+    const bindControls = function () {
+        $("#navbar-UserMenuButton").addEventListener("click", function () {
+            $("#user-menu").hidden = !$("#user-menu").hidden;
+        });
+        $("#userMenu-UserSettingsButton").addEventListener("click", function () {
+            $("#user-menu").hidden = true;
+            $("#settings-dialog").hidden = false;
+        });
+        const checkbox = $("#settings-trade-confirmations");
+        checkbox.checked = state.confirmationsOff;
+        checkbox.setAttribute("value", String(state.confirmationsOff));
+        checkbox.addEventListener("change", function () {
+            state.confirmationsOff = checkbox.checked;
+            checkbox.setAttribute("value", String(checkbox.checked));
+            save();
+        });
+        $(".engine-dialog-header__icon-button").addEventListener("click", function () {
+            $("#settings-dialog").hidden = true;
+        });
+
+        $("#symbol-search").addEventListener("input", function () {
+            const text = this.value.trim().toUpperCase();
+            const results = $("#search-results");
+            results.innerHTML = "";
+            if (!text) { return; }
+            ALL_SYMBOLS.filter(function (symbol) { return symbol.indexOf(text) >= 0; }).forEach(function (symbol) {
+                results.appendChild(symbolRow(symbol));
+            });
+        });
+
+        $("#MarketWatch-QuickBuy").addEventListener("click", function () {
+            placeOrder("Buy", $("#Market-Watch-VolumeEditField").value, 0, 0);
+        });
+        $("#MarketWatch-QuickSell").addEventListener("click", function () {
+            placeOrder("Sell", $("#Market-Watch-VolumeEditField").value, 0, 0);
+        });
+        $("#MarketWatch-NewOrder").addEventListener("click", function () {
+            if (!selectedSymbol) { return; }
+            opening(function () { setTicketOpen(true); });
+        });
+        $(".order-ticket__back").addEventListener("click", function () { setTicketOpen(false); });
+        $('[data-testid="sl-toggler"] button').addEventListener("click", function () {
+            opening(function () { $('[formcontrolname="slPrice"]').hidden = false; });
+        });
+        $('[data-testid="tp-toggler"] button').addEventListener("click", function () {
+            opening(function () { $('[formcontrolname="tpPrice"]').hidden = false; });
+        });
+        $('[data-testid="button-buy"]').addEventListener("click", function () {
+            placeOrder("Buy", ticketValue("volume"), ticketValue("tpPrice"), ticketValue("slPrice"));
+        });
+        $('[data-testid="button-sell"]').addEventListener("click", function () {
+            placeOrder("Sell", ticketValue("volume"), ticketValue("tpPrice"), ticketValue("slPrice"));
+        });
+    };
+
+    const render = function () {
+        const favorites = $("#cdk-drop-list-0");
+        config.favorites.forEach(function (symbol) { favorites.appendChild(symbolRow(symbol)); });
+        state.positions.forEach(function (position) { table().appendChild(positionRow(position)); });
+        bindControls();
+        rendered = true;
+        $("#booting").hidden = true;
+        $("#app").hidden = false;
+    };
+
+    const boot = function () {
+        if (config.login && !state.loggedIn) {
+            $("#booting").hidden = true;
+            const form = $("#login");
+            form.hidden = false;
+            form.addEventListener("submit", function (event) {
+                event.preventDefault();
+                state.loggedIn = true;
+                save();
+                form.hidden = true;
+                later(config.boot, render);
+            });
+            return;
+        }
+        render();
+    };
+
+    // --- Benchmark hooks --- //
+
+    const seed = function (count) {
+        for (let i = 0; i < count; i++) {
+            const symbol = config.favorites[i % config.favorites.length];
+            openPosition(symbol, i % 2 ? "Sell" : "Buy", 0.01, 0, 0);
+        }
+        return state.positions.length;
+    };
+
+    window.mockTerminal = {
+        config: config,
+        positions: function () { return state.positions.slice(); },
+        seed: seed,
+        reset: function () {
+            state.positions = [];
+            save();
+            table().innerHTML = "";
+        },
+    };
+
+    if (!sessionStorage.getItem(STORAGE_KEY)) {
+        seed(config.positions);
+    }
+    save();
+    later(config.boot, boot);
+})();
@@ -0,0 +1,123 @@
+"""
+Reads the id of a newly opened position out of the web terminal's own traffic.
+
+Chrome is started with performance logging on (goog:loggingPrefs), which makes chromedriver buffer the
+DevTools Network events: WebSocket frames and XHR/fetch requests and responses. Just before an order
+button is clicked, an OrderTraffic drops whatever was buffered. After the click it is polled, and only
+traffic answering the order the click sent is read: the response to an order request sent since the
+click (matched by its DevTools requestId), or frames received on a WebSocket that an order frame was
+sent on since the click. The first of those that looks like an acknowledgement and names a position id
+the table has not shown before is the new web ticket, usually long before the positions table renders
+the row. Position updates the terminal pushes for other reasons never qualify.
+
+The patterns below describe the terminal's protocol and may need tuning when it changes. If nothing
+matches (or the browser has no performance log) callers fall back to watching the positions table.
+"""
+import base64
+import json
+import re
+
+# XHR/fetch requests (other than GETs) to a matching URL are order requests; their responses are read in full
+ORDER_URL_PATTERN = re.compile(r"order|trade|position|deal", re.IGNORECASE)
+# A sent WebSocket frame matching this is an order request; frames received after it on that socket are read
+ORDER_FRAME_PATTERN = re.compile(r"order|trade|deal", re.IGNORECASE)
+# A frame or response only counts as an order acknowledgement if it matches this
+ORDER_ACK_PATTERN = re.compile(r"order|deal|position", re.IGNORECASE)
+# The position id inside an acknowledgement (first group)
+POSITION_ID_PATTERN = re.compile(r'"(?:positionId|position_id|positionTicket|position|ticket)"\s*:\s*"?(\d+)')
+
+
+def enable_performance_logging(options):
+    """Turns on the network part of Chrome's performance log for a driver about to be created."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    # Page and timeline events are not needed and would only fill the buffer
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+
+def drain(driver):
+    """Discards the buffered events. Returns False if the browser has no performance log."""
+    try:
+        driver.get_log("performance")
+        return True
+    except Exception:
+        return False
+
+
+class OrderTraffic:
+    """Watches the traffic that follows one order click. Create it right before the click."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._order_requests = set()  # request ids of XHR/fetch order requests sent since the click
+        self._awaiting_body = set()  # request ids of order responses still loading
+        self._order_sockets = set()  # request ids of WebSockets an order frame was sent on since the click
+        self.available = drain(driver)
+
+    def poll(self, is_new):
+        """
+        Reads the events buffered since the last poll and returns the first acknowledged position id
+        for which is_new(id) is true, or None.
+        """
+        if not self.available:
+            return None
+        for text in self._read_texts():
+            if not ORDER_ACK_PATTERN.search(text):
+                continue
+            for match in POSITION_ID_PATTERN.finditer(text):
+                if is_new(match.group(1)):
+                    return match.group(1)
+        return None
+
+    def _read_texts(self):
+        try:
+            entries = self.driver.get_log("performance")
+        except Exception:
+            self.available = False
+            return []
+
+        texts = []
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            method = message.get("method")
+            params = message.get("params", {})
+
+            request_id = params.get("requestId")
+
+            if method == "Network.webSocketFrameSent":
+                if ORDER_FRAME_PATTERN.search(_text_frame(params)):
+                    self._order_sockets.add(request_id)
+            elif method == "Network.webSocketFrameReceived":
+                if request_id in self._order_sockets:
+                    texts.append(_text_frame(params))
+            elif method == "Network.requestWillBeSent":
+                request = params.get("request", {})
+                if request.get("method", "GET") != "GET" and ORDER_URL_PATTERN.search(request.get("url", "")):
+                    self._order_requests.add(request_id)
+            elif method == "Network.responseReceived":
+                if request_id in self._order_requests and params.get("type") in ("XHR", "Fetch"):
+                    self._awaiting_body.add(request_id)
+            elif method == "Network.loadingFinished" and params.get("requestId") in self._awaiting_body:
+                self._awaiting_body.discard(params["requestId"])
+                texts.append(self._response_body(params["requestId"]))
+        return texts
+
+    def _response_body(self, request_id):
+        try:
+            body = self.driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+        except Exception:
+            return ""
+        text = body.get("body", "")
+        if body.get("base64Encoded"):
+            text = base64.b64decode(text).decode("utf-8", errors="replace")
+        return text
+
+
+def _text_frame(params):
+    """The payload of a WebSocket frame event, or "" for binary frames."""
+    response = params.get("response", {})
+    if response.get("opcode", 1) != 1:
+        return ""
+    return response.get("payloadData", "")
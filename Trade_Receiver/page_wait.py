@@ -0,0 +1,150 @@
+"""
+In-page waits for request_server.
+
+WebDriverWait asks the browser over HTTP every 0.5 s, so a popup that appears in 40 ms still costs
+up to half a second. These waits hand the condition to the page in one execute_async_script call.
+The page checks it straight away, then again on every DOM mutation (with a short fallback poll for
+changes that are only visual), and answers the moment it holds.
+
+Locators use the same (By, value) pairs as WebDriverWait; By.ID, By.CSS_SELECTOR and By.XPATH are
+supported. Every wait raises selenium's TimeoutException when the condition does not hold in time.
+"""
+from selenium.common.exceptions import JavascriptException
+from selenium.common.exceptions import StaleElementReferenceException
+from selenium.common.exceptions import TimeoutException
+
+# How often the page re-checks on its own, for changes no mutation reports (e.g. a CSS transition ending)
+FALLBACK_POLL_MS = 50
+
+WAIT_JS = """
+const condition = arguments[0], by = arguments[1], value = arguments[2];
+const target = arguments[3], expected = arguments[4], timeoutMs = arguments[5], pollMs = arguments[6];
+const done = arguments[arguments.length - 1];
+
+const find = function () {
+    if (by === "id") { return document.getElementById(value); }
+    if (by === "css selector") { return document.querySelector(value); }
+    if (by === "xpath") {
+        return document.evaluate(value, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    }
+    throw new Error("Unsupported locator: " + by);
+};
+const count = function () {
+    if (by === "css selector") { return document.querySelectorAll(value).length; }
+    if (by === "xpath") {
+        return document.evaluate(value, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null).snapshotLength;
+    }
+    return find() ? 1 : 0;
+};
+const shown = function (el) {
+    if (!el || !el.isConnected || !el.getClientRects().length) { return false; }
+    const style = window.getComputedStyle(el);
+    return style.visibility !== "hidden" && style.display !== "none";
+};
+// Returns the value to resolve with, or undefined while the condition does not hold yet
+const check = function () {
+    let el;
+    switch (condition) {
+        case "present":
+            return find() || undefined;
+        case "visible":
+            el = find();
+            return shown(el) ? el : undefined;
+        case "clickable":
+            el = find();
+            return shown(el) && !el.disabled ? el : undefined;
+        case "invisible":
+            return shown(find()) ? undefined : true;
+        case "stale":
+            return target.isConnected ? undefined : true;
+        case "count_changed": {
+            const n = count();
+            return n !== expected ? n : undefined;
+        }
+        case "count_at_most": {
+            const n = count();
+            return n <= expected ? n : undefined;
+        }
+    }
+    throw new Error("Unknown condition: " + condition);
+};
+
+let observer = null, poll = null, timer = null, finished = false;
+const finish = function (outcome) {
+    if (finished) { return; }
+    finished = true;
+    if (observer) { observer.disconnect(); }
+    clearInterval(poll);
+    clearTimeout(timer);
+    done(outcome);
+};
+const attempt = function () {
+    try {
+        const result = check();
+        if (result !== undefined) { finish({ value: result }); }
+    } catch (e) {
+        finish({ error: String(e) });
+    }
+};
+
+attempt();
+if (!finished) {
+    observer = new MutationObserver(attempt);
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    poll = setInterval(attempt, pollMs);
+    timer = setTimeout(function () { finish({ timeout: true }); }, timeoutMs);
+}
+"""
+
+
+def _wait(driver, condition, by=None, value=None, target=None, expected=None, timeout=2, message=""):
+    # One async script per wait, so `timeout` has to stay under the driver's script timeout (30 s by default)
+    outcome = driver.execute_async_script(
+        WAIT_JS, condition, by, value, target, expected, int(timeout * 1000), FALLBACK_POLL_MS
+    )
+    if outcome.get("timeout"):
+        raise TimeoutException(message or f"Timed out after {timeout}s waiting for {value} to be {condition}")
+    if "error" in outcome:
+        raise JavascriptException(outcome["error"])
+    return outcome["value"]
+
+
+def wait_present(driver, by, value, timeout=2):
+    """Waits for an element to be in the DOM and returns it."""
+    return _wait(driver, "present", by, value, timeout=timeout)
+
+
+def wait_visible(driver, by, value, timeout=2):
+    """Waits for an element to be displayed and returns it."""
+    return _wait(driver, "visible", by, value, timeout=timeout)
+
+
+def wait_clickable(driver, by, value, timeout=2):
+    """Waits for an element to be displayed and enabled and returns it."""
+    return _wait(driver, "clickable", by, value, timeout=timeout)
+
+
+def wait_invisible(driver, by, value, timeout=2):
+    """Waits for an element to be hidden or gone from the DOM."""
+    return _wait(driver, "invisible", by, value, timeout=timeout)
+
+
+def wait_stale(driver, element, timeout=2):
+    """Waits for an element to be removed from the DOM."""
+    try:
+        return _wait(driver, "stale", target=element, timeout=timeout,
+                     message=f"Timed out after {timeout}s waiting for an element to leave the page")
+    except StaleElementReferenceException:
+        # Already gone before the script could even reference it
+        return True
+
+
+def wait_count_changed(driver, by, value, count, timeout=2):
+    """Waits for the number of elements matching a CSS or XPath locator to differ from `count`. Returns the new count."""
+    return _wait(driver, "count_changed", by, value, expected=count, timeout=timeout)
+
+
+def wait_count_at_most(driver, by, value, count, timeout=2):
+    """Waits for at most `count` elements to match a CSS or XPath locator. Returns the new count."""
+    return _wait(driver, "count_at_most", by, value, expected=count, timeout=timeout)
+
@@ -0,0 +1,166 @@
+"""
+A copy of the browser's open-positions table, kept current by the page itself.
+
+MIRROR_SYNC_JS installs a MutationObserver on the positions table the first time it runs on a page.
+From then on, the page turns every change into an event as it happens: a row added, a row removed,
+or a row's TP/SL (or other mirrored cell) changed. The events wait in the page until the worker
+collects them with the same script, which is one cheap call no matter how many rows there are.
+The worker collects when it touches the table anyway and whenever it is idle.
+
+PositionsMirror holds the result in plain dicts, so readers on other threads (the /api/positions
+routes) never need the browser. A full re-read replaces the mirror on a new page, when the page's
+event buffer overflowed, and every resync interval, to catch anything the observer missed.
+"""
+import threading
+import time
+
+# Installs the observer if this page (or table) doesn't have one yet, then hands over the pending events.
+# arguments: field selectors, full re-read wanted, web ticket whose row element to return (or null)
+MIRROR_SYNC_JS = """
+const selectors = arguments[0], full = arguments[1], wantTicket = arguments[2];
+const MAX_EVENTS = 1000;
+const container = document.querySelector("mtr-open-positions-desktop.open-positions-desktop");
+const overflow = container ? container.querySelector(".engine-list--overflow") : null;
+if (!overflow) { return { missing: true }; }
+
+const cell = function (row, selector) {
+    const el = row.querySelector(selector);
+    return el ? el.textContent.trim() : "";
+};
+const readRow = function (row) {
+    const ticket = cell(row, selectors.ticket);
+    if (!ticket) { return null; }
+    return {
+        ticket: ticket,
+        symbol: cell(row, selectors.symbol),
+        side: cell(row, selectors.side),
+        volume: cell(row, selectors.volume),
+        take_profit: cell(row, selectors.take_profit),
+        stop_loss: cell(row, selectors.stop_loss)
+    };
+};
+const readAll = function () {
+    const rows = {};
+    overflow.querySelectorAll("engine-list-element").forEach(function (row) {
+        const data = readRow(row);
+        if (data) { rows[data.ticket] = data; }
+    });
+    return rows;
+};
+const same = function (a, b) {
+    return a.symbol === b.symbol && a.side === b.side && a.volume === b.volume &&
+        a.take_profit === b.take_profit && a.stop_loss === b.stop_loss;
+};
+
+let mirror = window.__copyMachinePositions;
+let reset = !!full;
+if (!mirror || mirror.overflow !== overflow) {
+    if (mirror) { mirror.observer.disconnect(); }
+    mirror = window.__copyMachinePositions = { overflow: overflow, known: readAll(), events: [], lost: false };
+    const push = function (event) {
+        if (mirror.events.length >= MAX_EVENTS) {
+            // Nobody has collected in a while; a full re-read is cheaper than keeping every step
+            mirror.events = [];
+            mirror.lost = true;
+        }
+        if (!mirror.lost) { mirror.events.push(event); }
+    };
+    mirror.observer = new MutationObserver(function () {
+        const now = readAll();
+        Object.keys(mirror.known).forEach(function (ticket) {
+            if (!(ticket in now)) { push({ type: "remove", ticket: ticket }); }
+        });
+        Object.keys(now).forEach(function (ticket) {
+            const before = mirror.known[ticket];
+            if (!before) {
+                push({ type: "add", ticket: ticket, row: now[ticket] });
+            } else if (!same(before, now[ticket])) {
+                push({ type: "update", ticket: ticket, row: now[ticket] });
+            }
+        });
+        mirror.known = now;
+    });
+    mirror.observer.observe(overflow, { subtree: true, childList: true, characterData: true });
+    reset = true;
+}
+
+const result = { events: mirror.events };
+mirror.events = [];
+if (reset || mirror.lost) {
+    mirror.known = readAll();
+    mirror.lost = false;
+    result.reset = true;
+    result.rows = Object.values(mirror.known);
+}
+if (wantTicket !== null && wantTicket !== undefined) {
+    result.row = null;
+    const rows = overflow.querySelectorAll("engine-list-element");
+    for (let i = 0; i < rows.length; i++) {
+        if (cell(rows[i], selectors.ticket) === String(wantTicket)) { result.row = rows[i]; break; }
+    }
+}
+return result;
+"""
+
+
+class PositionsMirror:
+    """Thread-safe {web ticket: row fields} copy of one account's positions table. Cell values are kept as shown."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self.available = False  # False until the table has been read, or while it is not on the page
+        self.synced_at = None  # last full re-read
+        self.updated_at = None  # last time events were collected
+        self._stats = {"events": 0, "resyncs": 0}
+
+    def apply(self, result):
+        """Applies what MIRROR_SYNC_JS returned."""
+        now = time.time()
+        with self._lock:
+            self.updated_at = now
+            if result.get("missing"):
+                self.available = False
+                return
+            self.available = True
+            if result.get("reset"):
+                self._rows = {row["ticket"]: row for row in result.get("rows", [])}
+                self.synced_at = now
+                self._stats["resyncs"] += 1
+                return
+            for event in result.get("events", []):
+                if event["type"] == "remove":
+                    self._rows.pop(event["ticket"], None)
+                else:
+                    self._rows[event["ticket"]] = event["row"]
+            self._stats["events"] += len(result.get("events", []))
+
+    def needs_resync(self, interval):
+        return self.synced_at is None or time.time() - self.synced_at >= interval
+
+    def is_current(self, max_age):
+        """True if the mirror was read from the page in the last max_age seconds."""
+        return self.available and self.updated_at is not None and time.time() - self.updated_at <= max_age
+
+    def tickets(self):
+        with self._lock:
+            return set(self._rows)
+
+    def get(self, ticket):
+        with self._lock:
+            row = self._rows.get(str(ticket))
+            return dict(row) if row else None
+
+    def rows(self):
+        with self._lock:
+            return [dict(row) for row in self._rows.values()]
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                self._stats,
+                positions=len(self._rows),
+                available=self.available,
+                synced_at=self.synced_at,
+                updated_at=self.updated_at,
+            )
@@ -1,5 +1,7 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from selenium import webdriver
+import contextlib
+import json
 import threading
 import time
 from selenium.webdriver.chrome.service import Service
@@ -7,48 +9,336 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException
 from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import StaleElementReferenceException
+from collections import namedtuple
+from action_queue import ACTION_PRIORITY, JOB_RETENTION, IdempotencyCache, JobGroup, parse_max_age, parse_timestamp, signal_deadline
+from metrics import job_labels, observe_job, registry, stage
+from order_capture import OrderTraffic, drain, enable_performance_logging
+from positions_mirror import MIRROR_SYNC_JS
+from page_wait import wait_clickable, wait_count_at_most, wait_count_changed, wait_invisible, wait_present, wait_visible
+from event_log import get_logger, log_context, log_stats, set_log_fields, setup_logging
+from browser_mode import apply_mode_options, apply_mode_session
+from browser_session import BrowserPage, BrowserSession, SessionBound, bind_session, current_session, set_default_session, using_session
+from window_pool import BACKGROUND_WINDOW_FLAGS, WindowPool
+import os
 
 #--- Global Variables ---#
 app = Flask(__name__)
-driver = None
-# Global flag to indicate if a trade action is in progress
-ACTION_IN_PROGRESS = False
 
-# Refresh interval: 20 minutes in seconds.
-REFRESH_INTERVAL = 20 * 60  # 1200 seconds
-trade_map = {}  # Dictionary to store {MT5_ticket: Web_terminal_ticket}
+# Web accounts to copy to. Each one gets its own Chrome profile, browser worker and trade map,
+# and every incoming action is fanned out to all of them in parallel.
+#   profile_dir: Chrome User Data Directory for that account (each account needs its own)
+#   profile: profile directory inside it
+#   volume_multiplier: scales the MT5 volume for that account
+#   browser_mode: optional, overrides BROWSER_MODE for that account
+#   standby_profile_dir: optional, a second User Data Directory logged in to the same web account.
+#       Setting it keeps a hot standby browser ready to take over if the main one fails.
+#   order_windows: optional, overrides ORDER_WINDOWS for that account
+ACCOUNTS = [
+    {"name": "default", "profile_dir": "", "profile": "Default", "volume_multiplier": 1.0},
+]
+TERMINAL_URL = "" # Web terminal address
+CHROMEDRIVER_PATH = "" # Ensure this path is correct
+# "standard" opens a normal Chrome window. "lean" runs headless with images, fonts and charts blocked and
+# CSS animations cut to zero (see browser_mode.py). Log in once in standard mode so the profile has the session.
+BROWSER_MODE = "standard"
+# Extra terminal windows for new trades, each with its own order panel pinned to a symbol (see window_pool.py).
+# Trades for different symbols then fill side by side. 0 keeps everything in the one window.
+ORDER_WINDOWS = 0
+# Signal deadlines. A /api/trades payload may carry "sent_at" (the sender's Unix time in seconds) and
+# "max_age" (seconds). Its deadline is max_age after sent_at, or after we received it if it has no sent_at.
+# Work of the same priority runs earliest deadline first. A new trade past its deadline is either rejected
+# ("reject") or placed anyway and reported late ("flag"). Closes and modifies always run.
+DEFAULT_MAX_AGE = None  # seconds, for payloads without a max_age; None: no deadline
+EXPIRED_TRADE_POLICY = "reject"
+# Lots are rounded to this many decimals after applying an account's volume multiplier
+VOLUME_DECIMALS = 2
+
+# Health-driven refresh. The page is probed every HEALTH_CHECK_INTERVAL seconds whenever the worker is idle,
+# and only refreshed when one of these signals degrades.
+HEALTH_CHECK_INTERVAL = 30  # seconds
+TABLE_STALE_AFTER = 120  # seconds without any positions-table update while positions are open
+MAX_DOM_NODES = 60000  # the terminal leaks nodes over time
+MAX_JS_HEAP_MB = 800  # renderer JS heap
+MAX_COMMAND_LATENCY_MS = 1500  # round trip of the health probe itself
+MIN_REFRESH_GAP = 5 * 60  # soft problems don't trigger another refresh sooner than this
+# How long the pre-action check waits for the user menu. With a standby ready, failing over is cheaper
+# than waiting, so the check gives up sooner.
+OPERATIONAL_TIMEOUT = 5  # seconds
+STANDBY_PROBE_TIMEOUT = 1  # seconds
+
+# Logging. Lines are JSON, written by a background thread so a slow console never delays the worker.
+# Levels are per component: boot, browser, health, standby, symbols, positions, orders, worker, http,
+# trade_store, browser_mode. The "" entry applies to every component not listed.
+LOG_LEVELS = {"": "INFO", "positions": "INFO", "symbols": "INFO"}
+LOG_FILE = ""  # also append the JSON lines to this file
+LOG_RATE_LIMIT = (5, 10.0)  # per call site: at most 5 lines every 10 seconds (errors are never limited)
+
+setup_logging(LOG_LEVELS, LOG_FILE, LOG_RATE_LIMIT)
+log_boot = get_logger("boot")
+log_browser = get_logger("browser")
+log_health = get_logger("health")
+log_standby = get_logger("standby")
+log_symbols = get_logger("symbols")
+log_positions = get_logger("positions")
+log_orders = get_logger("orders")
+log_worker = get_logger("worker")
+log_http = get_logger("http")
+log_audit = get_logger("audit")  # never rate limited
+
+# Durable {MT5_ticket: Web_terminal_ticket} maps are journaled to disk next to this file so links survive a restart.
+# The first account keeps the original "trade_map" name.
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _trade_map_path(account_name, first):
+    return os.path.join(DATA_DIR, "trade_map" if first else f"trade_map_{account_name}")
+
+sessions = {}  # {account name: BrowserSession}, in ACCOUNTS order
+for _index, _account in enumerate(ACCOUNTS):
+    sessions[_account["name"]] = BrowserSession(
+        _account["name"],
+        _trade_map_path(_account["name"], _index == 0),
+        profile_dir=_account.get("profile_dir", ""),
+        profile=_account.get("profile", "Default"),
+        volume_multiplier=_account.get("volume_multiplier", 1.0),
+        browser_mode=_account.get("browser_mode", BROWSER_MODE),
+        standby_profile_dir=_account.get("standby_profile_dir", ""),
+        order_windows=_account.get("order_windows", ORDER_WINDOWS),
+    )
+set_default_session(next(iter(sessions.values())))
+
+# The browser helpers below act on whichever account's session is bound to the calling thread
+driver = SessionBound("driver")
+trade_map = SessionBound("trade_map")  # {MT5_ticket: Web_terminal_ticket} for that account
+order_panel = SessionBound("order_panel")
+resolved_symbols = SessionBound("resolved_symbols")
+
+# Fanned-out actions, so /api/jobs/<id> can report every account's result
+job_groups = {}
+job_groups_lock = threading.Lock()
+
+# {(action, MT5 ticket, client seq): job}, so a sender retry never runs the same request twice
+idempotency = IdempotencyCache()
+
+# "Turn off trade confirmations" is saved in the Chrome profile, so once it has been confirmed the settings
+# menu walk is skipped on later starts. A marker file in the User Data Directory records when it was
+# last confirmed; after SETTINGS_MARKER_TTL the walk runs again anyway, in case the setting was changed.
+SETTINGS_MARKER = "copy_machine_settings.json"
+SETTINGS_MARKER_TTL = 7 * 24 * 60 * 60  # seconds
+BOOT_RETRY_DELAY = 10  # seconds between attempts when a browser fails to start
+
+def _settings_marker_path(page):
+    # Without a User Data Directory Chrome uses a throwaway profile, so nothing carries over
+    return os.path.join(page.profile_dir, SETTINGS_MARKER) if page.profile_dir else None
+
+def settings_confirmed_at(page):
+    """When confirmations were last confirmed off in this page's profile, or None if that is unknown or too old."""
+    path = _settings_marker_path(page)
+    if not path:
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            confirmed_at = json.load(f).get(page.profile, {}).get("confirmations_off_at")
+    except (OSError, ValueError, AttributeError):
+        return None
+    if not confirmed_at or time.time() - confirmed_at > SETTINGS_MARKER_TTL:
+        return None
+    return confirmed_at
+
+def mark_settings_confirmed(page):
+    path = _settings_marker_path(page)
+    if not path:
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            markers = json.load(f)
+    except (OSError, ValueError):
+        markers = {}
+    markers[page.profile] = {"confirmations_off_at": time.time()}
+    try:
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(markers, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        log_boot.warning("Could not save the settings marker: %s", e)
+
+@contextlib.contextmanager
+def boot_phase(name):
+    """
+    Times one startup phase of the bound page and records it in its boot_phases, which /api/ready reports.
+    The body may set entry["status"] = "skipped" (with a "reason"); the entry is published when the phase ends.
+    """
+    page = current_session()
+    entry = {"status": "running", "started_at": time.time()}
+    with page.boot_lock:
+        page.boot_phases[name] = dict(entry)
+    start = time.perf_counter()
+    try:
+        yield entry
+        if entry["status"] == "running":
+            entry["status"] = "done"
+    except Exception as e:
+        entry["status"] = "failed"
+        entry["error"] = str(e)
+        raise
+    finally:
+        entry["duration_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        with page.boot_lock:
+            page.boot_phases[name] = entry
+
+def boot_phases_of(page):
+    """A copy of the page's boot phases that other threads can't change while it is read."""
+    with page.boot_lock:
+        return {name: dict(entry) for name, entry in page.boot_phases.items()}
 
 # Function to start browser and login
 def initialize_browser():
-    global driver   
-    
-    # This code will allow you to use Chrome Profile in the browser
-    chrome_options = Options()
-    chrome_options.add_argument("user-data-dir=") # Input User Data Directory
-    chrome_options.add_argument("profile-directory=Default") # Change to the profile you use
-    service = Service("") # Ensure this path is correct
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.get("")
-    
+    """
+    Starts the bound page's browser in phases: launch, terminal load, login (only if the login form shows),
+    trade confirmations off (skipped if already confirmed in this profile), the Favorites index and
+    the order windows.
+    """
+    session = current_session()
+
+    with boot_phase("browser_launch"):
+        # This code will allow you to use Chrome Profile in the browser
+        chrome_options = Options()
+        chrome_options.add_argument(f"user-data-dir={session.profile_dir}") # Input User Data Directory in ACCOUNTS
+        chrome_options.add_argument(f"profile-directory={session.profile}") # Change to the profile you use
+        enable_performance_logging(chrome_options) # Lets order_capture read new position ids from the terminal's traffic
+        apply_mode_options(chrome_options, session.browser_mode)
+        if session.order_windows:
+            for flag in BACKGROUND_WINDOW_FLAGS:
+                chrome_options.add_argument(flag)
+        service = Service(CHROMEDRIVER_PATH)
+        session.windows = None
+        session.driver = webdriver.Chrome(service=service, options=chrome_options)
+        apply_mode_session(driver, session.browser_mode) # Asset blocking and the no-animation stylesheet, before the first load
+
+    with boot_phase("page_load"):
+        driver.get(TERMINAL_URL)
+        # The app has rendered once either the login form or the user menu is there
+        wait_present(driver, By.CSS_SELECTOR, "input[type='email'], #navbar-UserMenuButton", timeout=20)
+
+    with boot_phase("login") as phase:
+        if driver.find_elements(By.CSS_SELECTOR, "input[type='email']"):
+            perform_login()
+        else:
+            phase["status"] = "skipped"
+            phase["reason"] = "already logged in"
+        wait_present(driver, By.ID, "navbar-UserMenuButton", timeout=10)
+
+    # Make sure menu is open and confirmations turned off
+    with boot_phase("settings") as phase:
+        confirmed_at = settings_confirmed_at(session)
+        if confirmed_at:
+            phase["status"] = "skipped"
+            phase["reason"] = f"confirmed in this profile {(time.time() - confirmed_at) / 3600:.1f}h ago"
+        elif ensure_trade_confirmations_off():
+            mark_settings_confirmed(session)
+        else:
+            phase["status"] = "failed"
+
+    # Index Favorites now, so the first trade doesn't pay for it
+    with boot_phase("symbol_index"):
+        build_symbol_index()
+
+    with boot_phase("order_windows") as phase:
+        if session.order_windows:
+            phase["opened"] = open_order_windows(session.order_windows)
+        else:
+            phase["status"] = "skipped"
+            phase["reason"] = "no order windows configured"
+
     # Otherwise we launch a window and perform credential input
-    #driver = webdriver.Chrome() 
-    #driver.get("")
+    #session.driver = webdriver.Chrome() 
+    #driver.get(TERMINAL_URL)
     #driver.implicitly_wait(10)
     #perform_login() 
-    
-    # Make sure menu is open and confirmations turned off
-    ensure_trade_confirmations_off()
-    
+
+def open_order_windows(count):
+    """
+    Opens `count` more terminal windows in the bound page's browser and keeps them as its order windows.
+    The window it started in stays the positions window and the driver is left on it.
+    Returns how many opened; a window that fails to load is logged and left out.
+    """
+    session = current_session()
+    pool = WindowPool(driver.current_window_handle, session.order_panel)
+    for _ in range(count):
+        try:
+            # Windows rather than tabs, so none of them is a background tab
+            driver.switch_to.new_window("window")
+            handle = driver.current_window_handle
+            apply_mode_session(driver, session.browser_mode)
+            driver.get(TERMINAL_URL)
+            wait_present(driver, By.ID, "navbar-UserMenuButton", timeout=20)
+            pool.add_order_window(handle)
+        except Exception as e:
+            log_boot.warning("%s: order window %d did not open: %s", session.name, len(pool.order_windows) + 1, e)
+            break
+    driver.switch_to.window(pool.positions)
+    session.windows = pool
+    session.order_panel = pool.panel(pool.positions)
+    log_boot.info("%s: %d order windows open", session.name, len(pool.order_windows))
+    return len(pool.order_windows)
+
+def use_window(handle):
+    """Puts the driver, and order_panel, on one of the bound page's windows. Costs nothing if it is already there."""
+    session = current_session()
+    pool = session.windows
+    if pool is None or pool.current == handle:
+        return
+    driver.switch_to.window(handle)
+    pool.current = handle
+    pool.switches += 1
+    session.order_panel = pool.panel(handle)
+
+def use_positions_window():
+    pool = current_session().windows
+    if pool is not None:
+        use_window(pool.positions)
+
+def boot_session(session):
+    """
+    Brings an account up on its worker thread: the trade map is loaded while the browser starts, and
+    the browser is retried until it comes up. Jobs that arrive in the meantime wait in the queue.
+    """
+    session.boot_started_at = time.time()
+    with session.boot_lock:
+        session.boot_phases.clear()
+
+    def load_trade_map():
+        with using_session(session), boot_phase("trade_map") as phase:
+            load_info = session.trade_map.load()
+            phase.update(load_info)
+            log_boot.info("%s: loaded %d trade links in %s ms (replayed %d journal entries)",
+                          session.name, load_info['entries'], load_info['load_ms'], load_info['replayed'])
+    loader = threading.Thread(target=load_trade_map, name=f"trade-map-{session.name}", daemon=True)
+    loader.start()
+
+    while True:
+        try:
+            initialize_browser()
+            break
+        except Exception as e:
+            log_boot.error("%s: browser failed to start (%s); retrying in %ss", session.name, e, BOOT_RETRY_DELAY)
+            quit_driver(session.driver)
+            session.driver = None
+            time.sleep(BOOT_RETRY_DELAY)
+    loader.join()
+
+    session.ready_at = time.time()
+    session.last_refresh_at = session.ready_at
+    log_boot.info("%s: ready in %.1fs (%s mode, %d jobs waiting)", session.name, session.ready_at - session.boot_started_at,
+                  session.browser_mode, session.action_queue.pending_count())
+
 def perform_login():
     try:
-        wait = WebDriverWait(driver, 10)
         # Wait for and locate the login fields
-        username_field = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "input[type='email']")))
-        password_field = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "[data-testid='password-field']")))
+        username_field = wait_present(driver, By.CSS_SELECTOR, "input[type='email']", timeout=10)
+        password_field = wait_present(driver, By.CSS_SELECTOR, "[data-testid='password-field']", timeout=10)
 
         username_field.send_keys("")
         password_field.send_keys("")
@@ -57,86 +347,330 @@ def perform_login():
         login_button.click()
         
         # Wait for the user menu to appear as a sign of successful login
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "navbar-UserMenuButton"))
-        )
-        print("[perform_login] Login successful.")
+        wait_present(driver, By.ID, "navbar-UserMenuButton", timeout=10)
+        log_browser.info("Login successful.")
     except Exception as e:
-        print(f"[perform_login] Error: {e}") 
+        log_browser.error("Login failed: %s", e)
             
 def refresh_browser():
     try:
-        print("[refresh_browser] Refresh started")
+        log_browser.info("Refresh started")
+        invalidate_symbol_index()
+        reset_order_panel()
         driver.refresh()
-        time.sleep(5)
+        # Wait until the app has rendered either the login form or the user menu
+        wait_present(driver, By.CSS_SELECTOR, "input[type='email'], #navbar-UserMenuButton", timeout=15)
         
         # Check if login is required by looking for the login field.
         # If the list is non-empty, login fields are present.
         login_fields = driver.find_elements(By.CSS_SELECTOR, "input[type='email']")
         if login_fields:
-            print("[refresh_browser] Login fields detected; performing login.")
+            log_browser.info("Login fields detected; performing login.")
             perform_login()
         
         # Confirm the browser is operational by waiting for the user menu button.
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "navbar-UserMenuButton"))
-        )
-        print("[refresh_browser] Browser refreshed and operational")
+        wait_present(driver, By.ID, "navbar-UserMenuButton", timeout=10)
+        log_browser.info("Browser refreshed and operational")
+        return True
     except Exception as e:
-        print(f"[refresh_browser] Error refreshing browser: {e}")
+        log_browser.error("Error refreshing browser: %s", e)
+        return False
 
-def is_browser_operational():
+def is_browser_operational(timeout=OPERATIONAL_TIMEOUT):
     try:
-        # Use a short wait to confirm the element is present
-        user_menu_button = WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.ID, "navbar-UserMenuButton"))
-        )
-        return user_menu_button.is_displayed()
+        # Resolves as soon as the user menu is on screen
+        wait_visible(driver, By.ID, "navbar-UserMenuButton", timeout=timeout)
+        return True
     except Exception as e:
-        print(f"[is_browser_operational] Error: {e}")
+        log_browser.warning("User menu not visible: %s", e)
         return False        
 
-# Opens Trade Menu       
-def ensure_trade_menu():
+# Reads every health signal in one call. The first call on a page installs a MutationObserver on the
+# positions table, so later calls can tell how long the table has gone without an update.
+HEALTH_PROBE_JS = """
+const table = document.querySelector("mtr-open-positions-desktop.open-positions-desktop");
+if (table && window.__copyMachineObservedTable !== table) {
+    window.__copyMachineObservedTable = table;
+    window.__copyMachineTableUpdatedAt = Date.now();
+    new MutationObserver(function () { window.__copyMachineTableUpdatedAt = Date.now(); })
+        .observe(table, { subtree: true, childList: true, characterData: true, attributes: true });
+}
+const memory = performance.memory || {};
+return {
+    logged_in: !!document.getElementById("navbar-UserMenuButton"),
+    open_positions: table ? table.querySelectorAll(".bottom-section-table__position-id").length : 0,
+    table_idle_s: table ? (Date.now() - window.__copyMachineTableUpdatedAt) / 1000 : null,
+    dom_nodes: document.getElementsByTagName("*").length,
+    js_heap_mb: memory.usedJSHeapSize ? Math.round(memory.usedJSHeapSize / 1048576) : null
+};
+"""
+
+def check_page_health():
+    """
+    Probes the page once and judges it against the thresholds above.
+    Returns the raw signals plus "reasons" (empty when healthy) and "hard" (the page is unusable).
+    """
+    start = time.perf_counter()
     try:
-        wait = WebDriverWait(driver, 5)
-        
-        # Check if the button is visible
-        new_order_buttons = wait.until(EC.presence_of_all_elements_located((By.ID, "MarketWatch-NewOrder")))
-        
-        if new_order_buttons and new_order_buttons[0].is_displayed():
-            print("[ensure_trade_menu] Trade menu is not open. Reopening...")
-            openTradeMenu() 
-        else:
-            print("[ensure_trade_menu] Trade menu is already open.")
+        health = driver.execute_script(HEALTH_PROBE_JS)
+    except Exception as e:
+        return {"reasons": [f"probe failed: {e}"], "hard": True}
+    health["command_latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    reasons = []
+    if not health["logged_in"]:
+        reasons.append("user menu missing")
+    if health["open_positions"] and health["table_idle_s"] is not None and health["table_idle_s"] > TABLE_STALE_AFTER:
+        reasons.append(f"positions table idle for {health['table_idle_s']:.0f}s")
+    if health["dom_nodes"] > MAX_DOM_NODES:
+        reasons.append(f"{health['dom_nodes']} DOM nodes")
+    if health["js_heap_mb"] and health["js_heap_mb"] > MAX_JS_HEAP_MB:
+        reasons.append(f"JS heap at {health['js_heap_mb']} MB")
+    if health["command_latency_ms"] > MAX_COMMAND_LATENCY_MS:
+        reasons.append(f"WebDriver round trip took {health['command_latency_ms']} ms")
+    health["reasons"] = reasons
+    health["hard"] = not health["logged_in"]
+    return health
+
+def run_health_check():
+    """
+    Runs on the worker as a low-priority job, so it only gets here when no action is waiting ahead of it.
+    Refreshes the page if a signal has degraded and logs what the refresh cost.
+    """
+    session = current_session()
+    # Order traffic is only read around an order; drop what built up since so chromedriver's buffer stays small
+    drain(driver)
+    health = check_page_health()
+    health["checked_at"] = time.time()
+    session.health = health
+    if not health["reasons"]:
+        return {"status": "healthy", "health": health}
+
+    since_refresh = time.time() - session.last_refresh_at
+    if not health["hard"]:
+        if since_refresh < MIN_REFRESH_GAP:
+            log_health.info("%s: degraded (%s) but refreshed %.0fs ago; waiting", session.name, ", ".join(health["reasons"]), since_refresh)
+            return {"status": "degraded", "health": health}
+        if session.action_queue.pending_count():
+            # An action arrived while we were probing; try again in the next idle window
+            log_health.info("%s: degraded but actions are waiting; deferring refresh", session.name)
+            return {"status": "degraded", "health": health}
+
+    if health["hard"] and promote_standby(", ".join(health["reasons"])):
+        return {"status": "failed_over", "health": health, "failover": session.last_failover}
+
+    start = time.time()
+    refreshed = refresh_browser()
+    session.last_refresh_at = time.time()
+    session.last_refresh = {
+        "at": session.last_refresh_at,
+        "reasons": health["reasons"],
+        "duration_ms": round((session.last_refresh_at - start) * 1000, 1),
+        "ok": refreshed,
+    }
+    log_health.warning("%s: refreshed for %s in %s ms (%s)", session.name, ", ".join(health["reasons"]),
+                       session.last_refresh["duration_ms"], "ok" if refreshed else "failed")
+    return {"status": "refreshed" if refreshed else "refresh_failed", "health": health, "refresh": session.last_refresh}
 
+def build_standby(session):
+    """
+    Starts a standby browser for the session's account in session.standby_profile_dir, through the same
+    phases as the main one (initialize_browser). Runs on the session's standby thread.
+    Returns the BrowserPage, or None if it did not come up healthy.
+    """
+    standby = BrowserPage(f"{session.name}-standby", session.standby_profile_dir, session.profile, session.browser_mode,
+                          session.order_windows)
+    start = time.time()
+    with using_session(standby):
+        try:
+            initialize_browser()
+            standby.health = check_page_health()
+        except Exception as e:
+            log_standby.error("%s: %s", session.name, e)
+            standby.health = {"reasons": [str(e)], "hard": True}
+        if standby.health["hard"]:
+            log_standby.warning("%s: standby not usable (%s)", session.name, ", ".join(standby.health["reasons"]))
+            quit_driver(standby.driver)
+            return None
+    standby.last_refresh_at = time.time()
+    log_standby.info("%s: standby ready in %.1fs", session.name, time.time() - start)
+    return standby
+
+def quit_driver(old_driver):
+    if old_driver is None:
+        return
+    try:
+        old_driver.quit()
     except Exception as e:
-        print(f"[ensure_trade_menu] Error: {e}")
-               
+        log_browser.warning("Could not quit the browser: %s", e)
 
-# Helper to expose Trade Menu buttons    
-def openTradeMenu():  
-    click_trade_button()
-    click_sl_toggler()
-    click_tp_toggler()
+def promote_standby(reason):
+    """
+    Fails the current session over to its standby browser, if one is ready. Runs on the worker.
+    The positions table is read once on the new browser to check trade_map against it, and the failed
+    browser is left for the standby thread to shut down and rebuild. Returns True if it switched.
+    """
+    session = current_session()
+    start = time.time()
+    with session.standby_lock:
+        standby = session.standby
+        if standby is None:
+            return False
+        session.standby = None
+        failed_profile_dir = session.profile_dir
+        session.retired_driver = session.take_over(standby)
+        # The failed browser's profile is free once it is shut down; the next standby is built there
+        session.standby_profile_dir = failed_profile_dir
+    session.standby_wake.set()
+
+    # Web tickets are the terminal's position ids, the same in every browser on the account,
+    # so trade_map carries over as is. One snapshot confirms the new browser shows them.
+    try:
+        visible = positions_by_ticket()
+    except PositionsUnavailable as e:
+        log_standby.warning("%s: could not read the new browser's positions table: %s", session.name, e)
+        visible = {}
+    mapped = set(trade_map.values())
+    missing = sorted(mapped - set(visible))
+    session.failovers += 1
+    session.last_failover = {
+        "at": time.time(),
+        "reason": reason,
+        "open_positions": len(visible),
+        "mapped": len(mapped),
+        "mapped_not_shown": missing,
+        "duration_ms": round((time.time() - start) * 1000, 1),
+    }
+    log_standby.warning("%s: failed over to the standby (%s); %d/%d mapped positions shown",
+                        session.name, reason, len(mapped) - len(missing), len(mapped))
+    if missing:
+        log_standby.warning("%s: mapped but not shown: %s (a sync will reconcile them)", session.name, missing)
+    return True
+
+def standby_keeper(session):
+    """
+    Keeps a session's hot standby ready. Builds it, probes it every HEALTH_CHECK_INTERVAL (refreshing or
+    rebuilding it as needed) and, after a failover, shuts the failed browser down and builds the next
+    standby in its profile. Nothing here runs on the worker, so a live signal never waits on it.
+    """
+    while True:
+        with session.standby_lock:
+            retired, session.retired_driver = session.retired_driver, None
+        quit_driver(retired)
+
+        if session.standby is None:
+            standby = build_standby(session)
+            if standby is None:
+                session.standby_wake.wait(HEALTH_CHECK_INTERVAL)
+                session.standby_wake.clear()
+                continue
+            with session.standby_lock:
+                session.standby = standby
+
+        session.standby_wake.wait(HEALTH_CHECK_INTERVAL)
+        session.standby_wake.clear()
+
+        # Take the standby out while it is probed, so the worker never promotes one mid-refresh
+        with session.standby_lock:
+            standby, session.standby = session.standby, None
+        if standby is None:
+            continue  # promoted in the meantime
+        with using_session(standby):
+            drain(driver)
+            standby.health = check_page_health()
+            if standby.health["hard"]:
+                log_standby.warning("%s: standby failed (%s); rebuilding", session.name, ", ".join(standby.health["reasons"]))
+                quit_driver(standby.driver)
+                continue
+            if standby.health["reasons"] and time.time() - standby.last_refresh_at >= MIN_REFRESH_GAP:
+                log_standby.info("%s: refreshing standby (%s)", session.name, ", ".join(standby.health["reasons"]))
+                refresh_browser()
+                standby.last_refresh_at = time.time()
+        with session.standby_lock:
+            session.standby = standby
+
+# order_panel holds what we last knew about the session's order panel. Reset after a refresh or an error
+# so the next trade re-checks.
+#   symbol: symbol last selected in market watch
+#   open: New Order ticket showing (it replaces the Favorites list)
+#   sl_open / tp_open: SL / TP input expanded
+
+# Reads the order panel's visible state in one call
+ORDER_PANEL_STATE_JS = """
+const visible = function (selector) {
+    const el = document.querySelector(selector);
+    return !!el && el.offsetParent !== null;
+};
+const open = !visible("#MarketWatch-NewOrder") && visible('[formcontrolname="volume"]');
+return {
+    open: open,
+    sl_open: open && visible(arguments[0]),
+    tp_open: open && visible(arguments[1])
+};
+"""
+
+def reset_order_panel():
+    order_panel.update({"symbol": None, "open": False, "sl_open": False, "tp_open": False})
+
+def probe_order_panel():
+    """Refreshes order_panel's open/SL/TP flags from the page with one script call."""
+    order_panel.update(driver.execute_script(ORDER_PANEL_STATE_JS, SL_INPUT, TP_INPUT))
+    return order_panel
+
+def ensure_order_panel(symbol, with_tpsl=True):
+    """
+    Gets the order panel into the state needed to place an order on `symbol`, doing only the
+    transitions that are missing. Back-to-back orders on the same symbol need no clicks at all.
+
+    with_tpsl=True: New Order ticket open with SL and TP expanded (for click_trade_tpsl).
+    with_tpsl=False: ticket closed so the market watch Quick Buy/Sell is usable (for click_trade_market).
+    """
+    probe_order_panel()
+
+    if order_panel["symbol"] != symbol:
+        with stage("symbol_select"):
+            # Symbols are picked from the Favorites list, which the order ticket covers
+            if order_panel["open"]:
+                click_back_button()
+                order_panel.update({"open": False, "sl_open": False, "tp_open": False})
+            if not select_symbol(symbol):
+                reset_order_panel()
+                raise Exception(f"Could not select symbol {symbol}")
+            order_panel["symbol"] = symbol
+
+    if not with_tpsl:
+        if order_panel["open"]:
+            click_back_button()
+            order_panel.update({"open": False, "sl_open": False, "tp_open": False})
+        return
+
+    with stage("panel_open"):
+        if not order_panel["open"]:
+            click_trade_button()
+            probe_order_panel()
+        if not order_panel["sl_open"]:
+            click_sl_toggler()
+            order_panel["sl_open"] = True
+        if not order_panel["tp_open"]:
+            click_tp_toggler()
+            order_panel["tp_open"] = True
 
 # Function to make sure we have set Trade Confirmations off
 def ensure_trade_confirmations_off():
     try:
-        wait = WebDriverWait(driver, 2)
         actions = ActionChains(driver)
 
         # Step 1: Hover over or click the user menu button
-        user_menu_button = wait.until(EC.presence_of_element_located((By.ID, "navbar-UserMenuButton")))
+        user_menu_button = wait_present(driver, By.ID, "navbar-UserMenuButton")
         actions.move_to_element(user_menu_button).perform()  # Hover to trigger menu
         user_menu_button.click()  # Click to be extra sure
 
         # Step 2: Click "User settings"
-        settings_button = wait.until(EC.element_to_be_clickable((By.ID, "userMenu-UserSettingsButton")))
+        settings_button = wait_clickable(driver, By.ID, "userMenu-UserSettingsButton")
         settings_button.click()
 
         # Step 3: Ensure "Turn off trade confirmations" is checked
-        trade_confirm_label = wait.until(EC.presence_of_element_located((By.XPATH, "//label[contains(text(), 'Turn off trade confirmations')]")))
+        trade_confirm_label = wait_present(driver, By.XPATH, "//label[contains(text(), 'Turn off trade confirmations')]")
 
         # Find the input checkbox by the 'for' attribute that corresponds to the label's 'id'
         checkbox = driver.find_element(By.XPATH, f"//input[@type='checkbox' and @id='{trade_confirm_label.get_attribute('for')}']")
@@ -145,33 +679,26 @@ def ensure_trade_confirmations_off():
         checkbox_value = checkbox.get_attribute("value")
         if checkbox_value.lower() != "true":
             actions.move_to_element(checkbox).click().perform()
-            print("[ensure_trade_confirmations_off] Trade confirmations disabled.")
+            log_browser.info("Trade confirmations disabled.")
         else:
-            print("[ensure_trade_confirmations_off] Trade confirmations were already disabled.")
+            log_browser.info("Trade confirmations were already disabled.")
 
         # Step 4: Click close button
-        close_button = wait.until(EC.element_to_be_clickable((By.XPATH, "//button[contains(@class, 'engine-dialog-header__icon-button')]")))
+        close_button = wait_clickable(driver, By.XPATH, "//button[contains(@class, 'engine-dialog-header__icon-button')]")
         close_button.click()
+        return True
 
     except TimeoutException:
-        print("[ensure_trade_confirmations_off] Failed to locate an element in the settings menu.")
+        log_browser.error("Failed to locate an element in the settings menu.")
+        return False
 
-def click_trade_market(data):
+def click_trade_market(data, before_ids=None, wait=True):
     try:        
-        # Locate the volume form control
-        volume_input = WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.ID, "Market-Watch-VolumeEditField"))
-        )
-
-        # Clear any existing value in the input field
-        volume_input.click()
-        volume_input.clear()
-        for i in range(5):
-            volume_input.send_keys(Keys.BACKSPACE)
-        
         # Input the volume value
-        volume_value = str(data['volume'])
-        volume_input.send_keys(volume_value)
+        with stage("field_input"):
+            volume_set = set_input_values({MARKET_VOLUME_INPUT: data['volume']}, timeout=10)
+        if not volume_set:
+            return {"error": "Failed to input volume"}
         
         # Retrieve and validate trade data
         direction = data.get('direction', '').upper()
@@ -183,37 +710,46 @@ def click_trade_market(data):
         elif direction == "SELL":
             button_selector = "MarketWatch-QuickSell"
         else:
-            print(f"[click_trade_market] Invalid trade direction: {direction}")
+            log_orders.error("Invalid trade direction: %s", direction)
             return {"error": "Invalid trade direction"}
+
+        # Take the snapshot of existing trade IDs, unless the caller already knows them
+        if wait and before_ids is None:
+            before_ids = open_ticket_ids()
         
-        button = WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, button_selector))
-        )
-        ActionChains(driver).move_to_element(button).click().perform()
-        print(f"[click_trade_market] Successfully clicked the {direction} button.")
-        
-        # Just wait for table to refresh
-        time.sleep(1)
-       
+        with stage("button_click"):
+            button = wait_clickable(driver, By.ID, button_selector, timeout=10)
+            traffic = OrderTraffic(driver) if wait else None
+            ActionChains(driver).move_to_element(button).click().perform()
+        log_orders.info("Clicked the %s button.", direction)
+        if not wait:
+            # The caller collects the new position itself (see run_trade_pipeline)
+            return {"status": "placed", "action": direction}
+        before_ids = set(before_ids)
+
+        new_trade_id = capture_new_trade_id(before_ids, traffic)
+        set_log_fields(web_ticket=new_trade_id)
 
         # Map the MT5 ticket to the new browser trade ID
         trade_map[mt5_ticket] = new_trade_id
+        log_audit.info("Mapped MT5 ticket %s to browser trade ID %s", mt5_ticket, new_trade_id)
         return {"status": "success", "action": direction, "trade_id": new_trade_id}
         
     except Exception as e:
-        print(f"[click_trade_market] Error: {e}")
+        log_orders.error("Error: %s", e)
         return {"error": str(e)}
         
        
 
-def click_trade_tpsl(data):
+def click_trade_tpsl(data, before_ids=None, wait=True):
     try:       
         direction = data.get("direction", "").upper()  # Ensure uppercase ("BUY" or "SELL")
         mt5_ticket = data['ticket']
         
-        # Take the snapshot of existing trade IDs
-        before_ids = set(get_open_trade_ids())
-        #print(f"[click_trade_tpsl] before_ids: {before_ids}")
+        # Take the snapshot of existing trade IDs, unless the caller already knows them
+        if wait and before_ids is None:
+            before_ids = open_ticket_ids()
+        #log_orders.debug("before_ids: %s", before_ids)
 
         # Identify the correct button based on trade direction
         if direction == "BUY":
@@ -221,280 +757,566 @@ def click_trade_tpsl(data):
         elif direction == "SELL":
             button_selector = '[data-testid="button-sell"]'
         else:
-            print(f"[click_trade_tpsl] Invalid trade direction: {direction}")
+            log_orders.error("Invalid trade direction: %s", direction)
             return {"error": "Invalid trade direction"}  
 
         # Wait for the button to be clickable and click it
-        button = WebDriverWait(driver, 2).until(
-            EC.element_to_be_clickable((By.CSS_SELECTOR, button_selector))
-        )
-        ActionChains(driver).move_to_element(button).click().perform()
-        print(f"[click_trade_tpsl]Successfully clicked {direction} button.")
+        with stage("button_click"):
+            button = wait_clickable(driver, By.CSS_SELECTOR, button_selector)
+            traffic = OrderTraffic(driver) if wait else None
+            ActionChains(driver).move_to_element(button).click().perform()
+        log_orders.info("Clicked the %s button.", direction)
         
-        click_back_button()
+        # The order ticket is left open, so another order on this symbol can reuse it
+        if not wait:
+            return {"status": "placed", "action": direction}
         
-        # Now look for the new trade via set-difference
-        time.sleep(2)
-        new_trade_id = None
-        # First pass
-        after_ids = set(get_open_trade_ids())
-        diff = after_ids - before_ids
-        #print(f"[click_trade_tpsl] after_ids: {after_ids}, diff: {diff}")
-        # Filter out any already-mapped
-        candidates = [tid for tid in diff if tid not in trade_map.values()]
-        if candidates:
-            new_trade_id = candidates[0]
-        else:
-            # Retry once after a quick refresh
-            print("[click_trade_tpsl] No new trade detected—refreshing and retrying...")
-            refresh_browser()
-            time.sleep(2)
-            after_ids = set(get_open_trade_ids())
-            diff = after_ids - before_ids
-            #print(f"[click_trade_tpsl] after refresh, after_ids: {after_ids}, diff: {diff}")
-            candidates = [tid for tid in diff if tid not in trade_map.values()]
-            if candidates:
-                new_trade_id = candidates[0]
-       
-        if not new_trade_id:
-            raise Exception("Failed to detect new trade ticket.")
+        new_trade_id = capture_new_trade_id(set(before_ids), traffic)
+        set_log_fields(web_ticket=new_trade_id)
 
         # Map the MT5 ticket to the new browser trade ID
         trade_map[mt5_ticket] = new_trade_id
-        print(f"[click_trade_tpsl] Mapped MT5 ticket {mt5_ticket} to browser trade ID {new_trade_id}")             
+        log_audit.info("Mapped MT5 ticket %s to browser trade ID %s", mt5_ticket, new_trade_id)             
 
-        # Ensure the trade menu remains open for subsequent trades
         return {"status": "success", "action": direction, "trade_id": new_trade_id}
 
     except Exception as e:
         return {"error": str(e)}
 
 
+# MT5 symbol names that do not match the web terminal's names once suffixes are stripped,
+# e.g. {"US30.cash": "US30", "GOLD": "XAUUSD"}
+SYMBOL_ALIASES = {}
+
+# Search box in the market watch panel, used when a symbol is not in Favorites
+SYMBOL_SEARCH_INPUT = "input[placeholder*='Search' i]"
+
+# Reads the symbol text of every Favorites row in one call, in row order
+FAVORITE_SYMBOLS_JS = """
+const container = document.getElementById("cdk-drop-list-0");
+if (!container) { return []; }
+return Array.from(container.querySelectorAll("engine-list-element")).map(function (row) {
+    const span = row.querySelector("div[class*='symbol-element-desktop__text-symbol'] span");
+    return span ? span.textContent.trim() : "";
+});
+"""
+
+# Returns the row at a Favorites position, but only if it still shows the expected symbol
+FAVORITE_ROW_JS = """
+const container = document.getElementById("cdk-drop-list-0");
+if (!container) { return null; }
+const row = container.querySelectorAll("engine-list-element")[arguments[0]];
+if (!row) { return null; }
+const span = row.querySelector("div[class*='symbol-element-desktop__text-symbol'] span");
+return span && span.textContent.trim() === arguments[1] ? row : null;
+"""
+
+# A symbol row outside Favorites, i.e. in the search results
+SEARCH_RESULT_ROW_XPATH = (
+    "//engine-list-element[not(ancestor::*[@id='cdk-drop-list-0'])]"
+    "[.//div[contains(@class, 'symbol-element-desktop__text-symbol')]//span[normalize-space()='{symbol}']]"
+)
+
+# Each session caches symbol_index ({web symbol: row position in Favorites}, rebuilt lazily after a refresh)
+# and resolved_symbols ({MT5 symbol: web symbol}).
+
+
+def invalidate_symbol_index():
+    """Forget the cached Favorites positions. Called whenever the page is reloaded."""
+    current_session().symbol_index = None
+    resolved_symbols.clear()
+
+
+def build_symbol_index():
+    """Reads every Favorites row with one script call and caches {web symbol: row position}."""
+    names = driver.execute_script(FAVORITE_SYMBOLS_JS) or []
+    symbol_index = {name: position for position, name in enumerate(names) if name}
+    current_session().symbol_index = symbol_index
+    log_symbols.info("Indexed %d favorite symbols", len(symbol_index))
+    return symbol_index
+
+
+def _base_symbol(name):
+    """
+    Reduces a symbol to its bare instrument name so broker suffixes don't matter:
+    'EURUSD.r' -> 'EURUSD', 'EURUSDm' -> 'EURUSD', 'XAUUSD+' -> 'XAUUSD'.
+    """
+    name = name.split(".")[0]
+    if any(ch.isupper() for ch in name):
+        name = name.rstrip("abcdefghijklmnopqrstuvwxyz")
+    return "".join(ch for ch in name if ch.isalnum()).upper()
+
+
+def resolve_web_symbol(symbol, available):
+    """Maps an MT5 symbol onto one of the web terminal's names in `available`, or None."""
+    if symbol in SYMBOL_ALIASES:
+        return SYMBOL_ALIASES[symbol]
+    if symbol in available:
+        return symbol
+    base = _base_symbol(symbol)
+    for name in available:
+        if _base_symbol(name) == base:
+            return name
+    return None
+
+
 def select_symbol(symbol):
     """
-    Locate the symbol container using the ID 'cdk-drop-list-0', then look for an engine-list-element 
-    whose embedded <span> text matches the given symbol. Click that element to select the symbol.
+    Select the given MT5 symbol in the web terminal.
+
+    Favorites (the 'cdk-drop-list-0' list) are indexed once with a single script call, so a lookup
+    is one call to fetch the row plus the click. If the index is out of date it is rebuilt once.
+    If the symbol is not in Favorites, falls back to the terminal's search box.
     
     Parameters:
-        symbol (str): The symbol to select (e.g., "EURUSD").
+        symbol (str): The MT5 symbol to select (e.g., "EURUSD" or "EURUSD.r").
     
     Returns:
         bool: True if the symbol is found and clicked, False otherwise.
     """
     try:
-        # Locate the container with the specific id.
-        container = driver.find_element(By.ID, "cdk-drop-list-0")
-
-        # Get all engine-list-element objects inside this container.
-        symbol_elements = container.find_elements(By.TAG_NAME, "engine-list-element")
-
-        for element in symbol_elements:
-            try:
-                # Locate the element with the symbol text.
-                # Adjust this XPath if needed based on the structure.
-                span_elem = element.find_element(By.XPATH, ".//div[contains(@class, 'symbol-element-desktop__text-symbol')]//span")
-                element_symbol = span_elem.text.strip()
-                #print(f"Found symbol in element: {element_symbol}")
-                if element_symbol == symbol:
-                    # Click the element using ActionChains to simulate a natural click.
-                    ActionChains(driver).move_to_element(element).click().perform()
-                    print(f"[select_symbol] Selected symbol: {symbol}")
-                    return True
-            except Exception as inner_e:
-                # If a particular engine-list-element doesn't contain the expected element, skip it.
-                print(f"Skipping an element due to: {inner_e}")
+        for attempt in range(2):
+            symbol_index = current_session().symbol_index
+            if symbol_index is None or attempt == 1:
+                symbol_index = build_symbol_index()
+            web_symbol = resolved_symbols.get(symbol) or resolve_web_symbol(symbol, symbol_index)
+            if web_symbol is None or web_symbol not in symbol_index:
+                continue
+            row = driver.execute_script(FAVORITE_ROW_JS, symbol_index[web_symbol], web_symbol)
+            if row is None:
+                # Favorites were reordered or edited since the index was built
                 continue
+            resolved_symbols[symbol] = web_symbol
+            # Click the element using ActionChains to simulate a natural click.
+            ActionChains(driver).move_to_element(row).click().perform()
+            log_symbols.debug("Selected symbol: %s", web_symbol)
+            return True
+
+        log_symbols.info("Symbol '%s' not found in Favorites; searching for it.", symbol)
+        return search_symbol(SYMBOL_ALIASES.get(symbol) or _base_symbol(symbol))
 
-        print(f"[select_symbol] Symbol '{symbol}' not found in the list.")
+    except Exception as e:
+        log_symbols.error("Error: %s", e)
         return False
 
+
+def search_symbol(web_symbol):
+    """Types the symbol into the market watch search box and clicks the matching result."""
+    try:
+        search_input = wait_clickable(driver, By.CSS_SELECTOR, SYMBOL_SEARCH_INPUT)
+        search_input.click()
+        search_input.clear()
+        search_input.send_keys(web_symbol)
+
+        row = wait_present(driver, By.XPATH, SEARCH_RESULT_ROW_XPATH.format(symbol=web_symbol), timeout=3)
+        ActionChains(driver).move_to_element(row).click().perform()
+        log_symbols.info("Selected symbol from search: %s", web_symbol)
+        return True
+    except TimeoutException:
+        log_symbols.warning("Symbol '%s' not found by search.", web_symbol)
+        return False
     except Exception as e:
-        print(f"[select_symbol] Error: {e}")
+        log_symbols.error("Error: %s", e)
         return False
 
 def click_back_button():
     try:
         # Wait for the back button (one containing an engine-icon with name "delete") to be clickable.
-        back_button = WebDriverWait(driver, 2).until(
-            EC.element_to_be_clickable((By.XPATH, "//button[.//engine-icon[@name='delete']]"))
-        )
+        back_button = wait_clickable(driver, By.XPATH, "//button[.//engine-icon[@name='delete']]")
         # Click the back button.
         back_button.click()
     except Exception as e:
-        print(f"[click_back_button] Error: {e}")
+        log_orders.error("Error: %s", e)
 
 # Opens Trade Menu
 def click_trade_button():
     try:
-        trade_button = WebDriverWait(driver,2).until(EC.presence_of_element_located((By.ID, "MarketWatch-NewOrder")))
+        trade_button = wait_present(driver, By.ID, "MarketWatch-NewOrder")
         ActionChains(driver).move_to_element(trade_button).perform()  # Hover to trigger menu
         trade_button.click()  # Click to be extra sure
     except Exception as e:
-        print(f"[click_trade_button] Error: {e}")
+        log_orders.error("Error: %s", e)
 
 # Opens SL Input    
 def click_sl_toggler():
     try:
-        sl_button = WebDriverWait(driver,2).until(EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="sl-toggler"] button')))
+        sl_button = wait_present(driver, By.CSS_SELECTOR, '[data-testid="sl-toggler"] button')
         ActionChains(driver).move_to_element(sl_button).perform()  # Hover to trigger menu
         sl_button.click()  # Click to be extra sure
     except Exception as e:
-        print(f"[click_sl_toggler] Error: {e}")
+        log_orders.error("Error: %s", e)
 
 # Opens TP Input
 def click_tp_toggler():
     try:
-        tp_button = WebDriverWait(driver,2).until(EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="tp-toggler"] button')))
+        tp_button = wait_present(driver, By.CSS_SELECTOR, '[data-testid="tp-toggler"] button')
         ActionChains(driver).move_to_element(tp_button).perform()  # Hover to trigger menu
         tp_button.click()  # Click to be extra sure
     except Exception as e:
-        print(f"[click_tp_toggler] Error: {e}")
-
-# Inputs the volume for the trade        
-def input_volume(volume):
-    # Locate the volume form control
-    volume_parent = WebDriverWait(driver,2).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, '[formcontrolname="volume"]'))
-    )
-    # Find the input field inside the form control
-    volume_input = volume_parent.find_element(By.CSS_SELECTOR, 'input.engine-input-spinner__input')
-
-    # Clear any existing value in the input field
-    volume_input.click()
-    volume_input.clear() # clear does not seem to work, so run a backspace queue
+        log_orders.error("Error: %s", e)
+
+# Order form inputs, by the formcontrolname of their spinner
+VOLUME_INPUT = '[formcontrolname="volume"] input.engine-input-spinner__input'
+SL_INPUT = '[formcontrolname="slPrice"] input.engine-input-spinner__input'
+TP_INPUT = '[formcontrolname="tpPrice"] input.engine-input-spinner__input'
+# Volume field next to the market watch Quick Buy/Sell buttons
+MARKET_VOLUME_INPUT = '#Market-Watch-VolumeEditField'
+# Price input of the edit TP/SL popup on an open position
+POPUP_INPUT = 'mtr-security-order-popup input.engine-input-spinner__input'
+
+# Sets every input in one call the way a user edit would: through the native value setter
+# (so the framework's value tracking sees the change) followed by input/change/blur events.
+# Returns the value each input holds afterwards, or null for inputs that are not on the page.
+SET_INPUT_VALUES_JS = """
+const setter = Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, "value").set;
+const accepted = {};
+for (const [selector, value] of Object.entries(arguments[0])) {
+    let input = document.querySelector(selector);
+    if (input && input.tagName !== "INPUT") { input = input.querySelector("input"); }
+    if (!input) { accepted[selector] = null; continue; }
+    input.focus();
+    setter.call(input, value);
+    input.dispatchEvent(new Event("input", { bubbles: true }));
+    input.dispatchEvent(new Event("change", { bubbles: true }));
+    input.dispatchEvent(new Event("blur"));
+    accepted[selector] = input.value;
+}
+return accepted;
+"""
+
+
+def _value_accepted(wanted, shown):
+    """Compares numerically where possible, so '0.10' is accepted for 0.1."""
+    if shown is None:
+        return False
+    try:
+        return abs(float(shown.replace(",", "")) - float(wanted)) < 1e-9
+    except ValueError:
+        return shown.strip() == str(wanted)
+
+
+def type_into_input(selector, value, timeout=2):
+    """Keystroke fallback: click, clear, backspace the field empty and type the value."""
+    field = wait_present(driver, By.CSS_SELECTOR, selector, timeout=timeout)
+    if field.tag_name.lower() != "input":
+        field = field.find_element(By.TAG_NAME, "input")
+    field.click()
+    field.clear() # clear does not seem to work, so run a backspace queue
     for _ in range(10):
-        volume_input.send_keys(Keys.BACKSPACE)
+        field.send_keys(Keys.BACKSPACE)
+    field.send_keys(str(value))
 
-    # Input the volume value
-    volume_input.send_keys(str(volume))
-    
 
-# Inputs the SL for the trade
-def input_sl(sl_value):
-    # Locate the SL form control
-    sl_parent = WebDriverWait(driver,2).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, '[formcontrolname="slPrice"]'))
-    )
-    # Find the input field inside the form control
-    sl_input = sl_parent.find_element(By.CSS_SELECTOR, 'input.engine-input-spinner__input')
-
-    # Clear any existing value in the input field
-    sl_input.click()
-    sl_input.clear() # clear does not seem to work, so run a backspace queue
-    for _ in range(10):
-        sl_input.send_keys(Keys.BACKSPACE)
+def set_input_values(values, timeout=2):
+    """
+    Fills several inputs at once. values: {css selector: value}.
 
-    # Input the SL value
-    sl_input.send_keys(str(sl_value))
-    
+    All fields are set with one script call and the values the form accepted are read back.
+    Only the fields that did not take the value are typed with keystrokes.
+    Returns True if every field ended up set.
+    """
+    values = {selector: str(value) for selector, value in values.items()}
+    accepted = driver.execute_script(SET_INPUT_VALUES_JS, values) or {}
+    rejected = [selector for selector, value in values.items() if not _value_accepted(value, accepted.get(selector))]
 
-# Inputs the TP for the trade   
-def input_tp(tp_value):
-    # Locate the TP form control
-    tp_parent = WebDriverWait(driver,10).until(
-        EC.presence_of_element_located((By.CSS_SELECTOR, '[formcontrolname="tpPrice"]'))
-    )
-    # Find the input field inside the form control
-    tp_input = tp_parent.find_element(By.CSS_SELECTOR, 'input.engine-input-spinner__input')
+    for selector in rejected:
+        log_orders.info("'%s' did not accept %s; typing it instead", selector, values[selector])
+        try:
+            type_into_input(selector, values[selector], timeout)
+        except Exception as e:
+            log_orders.error("Could not type into '%s': %s", selector, e)
+            return False
+    return True
 
-    # Clear any existing value in the input field
-    tp_input.click()
-    tp_input.clear() # clear does not seem to work, so run a backspace queue
-    for _ in range(10):
-        tp_input.send_keys(Keys.BACKSPACE)
 
-    # Input the TP value
-    tp_input.send_keys(str(tp_value))
+# Inputs volume, SL and TP for a new order in one call
+def input_order_values(volume, stop_loss, take_profit):
+    if not set_input_values({VOLUME_INPUT: volume, SL_INPUT: stop_loss, TP_INPUT: take_profit}):
+        raise Exception("Failed to fill the order form.")
         
         
-def get_open_trade_ids():
+# Selectors for the cells of an open-positions row, relative to its engine-list-element.
+# They are handed to the snapshot script so the whole table is read in one pass.
+# Only "ticket", "take_profit" and "stop_loss" come from the real terminal. "symbol", "side" and "volume"
+# are unverified guesses (mock_terminal was built to match them), so a cell they miss reads as "" and
+# plan_sync refuses to act on a row whose symbol or side it can't read.
+POSITION_FIELD_SELECTORS = {
+    "ticket": ".bottom-section-table__position-id",
+    "symbol": "[class*='__symbol']",
+    "side": "[class*='__side'], [class*='__type']",
+    "volume": "[class*='__volume']",
+    "take_profit": "#editTakeProfit",
+    "stop_loss": "#editStopLoss",
+}
+
+# Ticket cells of the open positions table, counted to notice rows appearing or leaving
+POSITION_TICKET_CELLS = "mtr-open-positions-desktop.open-positions-desktop .engine-list--overflow .bottom-section-table__position-id"
+
+# Reads every row of the open positions table in a single execute_script call.
+# Returns one plain object per row, including the row element itself so callers can click it
+# without looking it up again, or null if the table is not on the page.
+POSITIONS_SNAPSHOT_JS = """
+const selectors = arguments[0];
+const container = document.querySelector("mtr-open-positions-desktop.open-positions-desktop");
+if (!container) { return null; }
+const overflow = container.querySelector(".engine-list--overflow");
+if (!overflow) { return null; }
+const cell = function (row, selector) {
+    const el = row.querySelector(selector);
+    return el ? el.textContent.trim() : "";
+};
+const rows = [];
+overflow.querySelectorAll("engine-list-element").forEach(function (row, index) {
+    const ticket = cell(row, selectors.ticket);
+    if (!ticket) { return; }
+    rows.push({
+        ticket: ticket,
+        symbol: cell(row, selectors.symbol),
+        side: cell(row, selectors.side),
+        volume: cell(row, selectors.volume),
+        take_profit: cell(row, selectors.take_profit),
+        stop_loss: cell(row, selectors.stop_loss),
+        index: index,
+        row: row
+    });
+});
+return rows;
+"""
+
+# One row of the open positions table, as read by snapshot_positions()
+Position = namedtuple(
+    "Position",
+    ["ticket", "symbol", "side", "volume", "take_profit", "stop_loss", "index", "row"],
+)
+
+
+def _parse_number(text):
+    """Turns a table cell such as '1,234.50' into a float. Empty or '-' cells return None."""
+    cleaned = "".join(ch for ch in str(text) if ch.isdigit() or ch in ".-")
+    if cleaned in ("", "-", ".", "-."):
+        return None
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def _parse_side(text):
+    text = str(text).upper()
+    if "BUY" in text:
+        return "BUY"
+    if "SELL" in text:
+        return "SELL"
+    return text
+
+
+class PositionsUnavailable(Exception):
     """
-    Returns a list of ticket IDs currently shown in the open‐positions table.
-    
-    If there is no open positions container, returns [] immediately.
-    If trade_map is nonempty, waits until the table has strictly more rows
-    than the number of entries in trade_map (i.e. a new trade).
+    The open-positions table could not be read: it is not on the page, or the script failed.
+    Unlike an empty table, this says nothing about which positions are open.
     """
-    try:
-        # Temporarily disable implicit wait so find_elements() returns instantly if nothing is there.
-        original_timeout = driver.timeouts.implicit_wait
-        driver.implicitly_wait(0)
-        
-        # 1) Look for the open‐positions container; if none, just return empty:
-        containers = driver.find_elements(
-            By.XPATH,
-            "//mtr-open-positions-desktop[contains(@class, 'open-positions-desktop')]"
-        )
-        if not containers:
-            return []
-        container = containers[0]
-
-        # 2) Find the overflow container
-        overflow = container.find_elements(By.CLASS_NAME, "engine-list--overflow")
-        if not overflow:
-            return []
-        overflow_container = overflow[0]
-
-        # 4) Collect whatever rows do exist right now
-        trade_elements = overflow_container.find_elements(By.TAG_NAME, "engine-list-element")
-        print(f"[get_open_trade_ids] Found {len(trade_elements)} trade entries")
-
-        ids = []
-        for trade in trade_elements:
-            try:
-                ticket_el = trade.find_element(
-                    By.XPATH,
-                    ".//div[contains(@class, 'bottom-section-table__position-id')]"
-                )
-                ids.append(ticket_el.text.strip())
-            except NoSuchElementException:
-                # skip rows without a ticket element
-                continue
-        return ids
 
+
+def snapshot_positions():
+    """
+    Reads the whole open-positions table with one WebDriver round trip.
+
+    Returns a list of Position records in table order ([] for an empty table).
+    Raises PositionsUnavailable if the table is not on the page or the script fails.
+    """
+    try:
+        raw_rows = driver.execute_script(POSITIONS_SNAPSHOT_JS, POSITION_FIELD_SELECTORS)
     except Exception as e:
-        print(f"[get_open_trade_ids] Unexpected error in get_open_trade_ids(): {e}")
-        return [] 
-    finally:
-        # Restore whatever implicit-wait you had before
-        driver.implicitly_wait(original_timeout)        
+        log_positions.error("Error: %s", e)
+        raise PositionsUnavailable(f"Could not read the positions table: {e}") from e
+    if raw_rows is None:
+        raise PositionsUnavailable("The positions table is not on the page")
+
+    return [Position(index=raw.get("index"), row=raw.get("row"), **_position_fields(raw)) for raw in raw_rows]
+
+def _position_fields(raw):
+    """Parsed cells of one row, as read by POSITIONS_SNAPSHOT_JS or MIRROR_SYNC_JS."""
+    return {
+        "ticket": str(raw["ticket"]).strip(),
+        "symbol": raw.get("symbol", ""),
+        "side": _parse_side(raw.get("side", "")),
+        "volume": _parse_number(raw.get("volume", "")),
+        "take_profit": _parse_number(raw.get("take_profit", "")),
+        "stop_loss": _parse_number(raw.get("stop_loss", "")),
+    }
 
-def find_trade_row(ticket_id):
+# The positions mirror (positions_mirror.py) is collected from the page whenever the worker has been idle
+# this long, and fully re-read every MIRROR_RESYNC_INTERVAL to catch anything its observer missed.
+MIRROR_DRAIN_INTERVAL = 1.0  # seconds
+MIRROR_RESYNC_INTERVAL = 60  # seconds
+# /api/positions flags a mirror as stale once it hasn't been read from the page for this long,
+# e.g. while a long job keeps the worker away from the table
+MIRROR_STALE_AFTER = 10  # seconds
+
+def drain_positions_mirror(ticket=None, full=False):
     """
-    Locates the trade row (engine-list-element) that contains the given ticket_id.
-    Returns the trade row element if found, otherwise None.
+    Collects the positions table's pending changes into the session's mirror, with one script call
+    that also installs the page's observer if it isn't there yet. If `ticket` is given, returns that
+    web ticket's row element (None if it isn't open), found in the same call; since None then means
+    the position is closed, a table that couldn't be read raises PositionsUnavailable instead.
     """
+    mirror = current_session().positions
+    full = full or mirror.needs_resync(MIRROR_RESYNC_INTERVAL)
     try:
-        # Locate the open positions container
-        container = driver.find_element(By.XPATH, "//mtr-open-positions-desktop[contains(@class, 'open-positions-desktop')]")
-        overflow_container = container.find_element(By.CLASS_NAME, "engine-list--overflow")
-        trade_elements = overflow_container.find_elements(By.TAG_NAME, "engine-list-element")
-        for trade in trade_elements:
-            try:
-                ticket_element = trade.find_element(
-                    By.XPATH, f".//div[contains(@class, 'bottom-section-table__position-id') and contains(text(), '{ticket_id}')]"
-                )
-                if ticket_element:
-                    return trade
-            except NoSuchElementException:
-                continue
-        return None
+        result = driver.execute_script(MIRROR_SYNC_JS, POSITION_FIELD_SELECTORS, full, ticket) or {}
     except Exception as e:
-        print(f"[find_trade_row] Error: {e}")
+        log_positions.warning("Could not collect table changes: %s", e)
+        if ticket is not None:
+            raise PositionsUnavailable(f"Could not read the positions table: {e}") from e
         return None
-        
-def get_trade_row(ticket_id):
-    """Return a fresh WebElement for the given ticket_id row."""
-    row_xpath = (
-        f"//engine-list-element[.//div[contains(@class,'bottom-section-table__position-id') "
-        f"and normalize-space(text())='{ticket_id}']]"
-    )
-    return driver.find_element(By.XPATH, row_xpath)
+    mirror.apply(result)
+    if ticket is not None and (result.get("missing") or "row" not in result):
+        raise PositionsUnavailable("The positions table is not on the page")
+    return result.get("row")
+
+def open_ticket_ids():
+    """The web tickets open right now, from the positions mirror. Falls back to reading the table."""
+    drain_positions_mirror()
+    mirror = current_session().positions
+    if mirror.available:
+        return mirror.tickets()
+    return set(get_open_trade_ids())
+
+
+def positions_by_ticket(snapshot=None):
+    """Returns {ticket_id: Position} for the given snapshot, taking a fresh one if none is passed."""
+    if snapshot is None:
+        snapshot = snapshot_positions()
+    return {position.ticket: position for position in snapshot}
+
+
+def get_open_trade_ids():
+    """
+    Returns a list of ticket IDs currently shown in the open‐positions table.
+
+    Raises PositionsUnavailable if the table can't be read.
+    """
+    ids = [position.ticket for position in snapshot_positions()]
+    log_positions.debug("Found %d trade entries", len(ids))
+    return ids
+
+# How often the terminal's traffic is read while waiting for an order acknowledgement
+TRAFFIC_POLL_INTERVAL = 0.02  # seconds
+
+# How long a batch waits for a position it just opened to show in the table before moving on
+NEW_ROW_TIMEOUT = 3  # seconds
+
+def positions_including(ticket_id, timeout=NEW_ROW_TIMEOUT):
+    """
+    A {ticket_id: Position} snapshot that includes a position just opened. Its ticket may have come from
+    the order acknowledgement before the row rendered, so this waits up to `timeout` for the row.
+    Returns the last snapshot without it after that, or None if the table can't be read.
+    """
+    deadline = time.time() + timeout
+    while True:
+        try:
+            rows = positions_by_ticket()
+        except PositionsUnavailable:
+            rows = None
+        remaining = deadline - time.time()
+        if (rows is not None and ticket_id in rows) or remaining <= 0:
+            return rows
+        if rows is None:
+            time.sleep(min(TRAFFIC_POLL_INTERVAL, remaining))
+            continue
+        try:
+            wait_count_changed(driver, By.CSS_SELECTOR, POSITION_TICKET_CELLS, len(rows), timeout=remaining)
+        except TimeoutException:
+            pass
+
+def detect_new_trade_id(before_ids, row_count, traffic=None, timeout=2):
+    """
+    Waits for a position that is neither in before_ids nor already mapped, and returns its ticket ID (or None).
+
+    Two sources race: the order acknowledgement in the terminal's own traffic (when `traffic` is given),
+    which usually arrives first, and the positions table. Between reads of the traffic the page watches
+    the table's row count (starting from row_count) and answers as soon as it moves.
+    """
+    def is_new(ticket_id):
+        return ticket_id not in before_ids and not trade_map.has_web_ticket(ticket_id)
+
+    watch_traffic = traffic is not None and traffic.available
+    deadline = time.time() + timeout
+    while True:
+        if watch_traffic:
+            ticket_id = traffic.poll(is_new)
+            if ticket_id:
+                log_orders.info("%s read from the order acknowledgement", ticket_id)
+                return ticket_id
+            watch_traffic = traffic.available
+
+        remaining = deadline - time.time()
+        try:
+            wait = min(TRAFFIC_POLL_INTERVAL, remaining) if watch_traffic else remaining
+            new_count = wait_count_changed(driver, By.CSS_SELECTOR, POSITION_TICKET_CELLS, row_count,
+                                           timeout=max(0.01, wait))
+        except TimeoutException:
+            new_count = None
+        if new_count is not None:
+            try:
+                after_ids = get_open_trade_ids()
+            except PositionsUnavailable:
+                # Mid re-render; look again when the count next moves
+                after_ids = []
+            candidates = [tid for tid in after_ids if is_new(tid)]
+            if candidates:
+                log_orders.info("%s found in the positions table", candidates[0])
+                return candidates[0]
+            # The row count moved for some other reason (e.g. a close); keep waiting from where it is now
+            row_count = len(after_ids)
+        if time.time() >= deadline:
+            return None
+
+def capture_new_trade_id(before_ids, traffic=None):
+    """
+    Finds the web ticket of the order that was just placed. Falls back to a refresh and one more look
+    at the table if it never shows up. Raises if the ticket still can't be found.
+    """
+    with stage("ticket_detect"):
+        new_trade_id = detect_new_trade_id(before_ids, len(before_ids), traffic)
+    if new_trade_id is None:
+        # Retry once after a quick refresh
+        log_orders.warning("No new trade detected—refreshing and retrying...")
+        with stage("refresh_fallback"):
+            refresh_browser()
+            # The reloaded table starts empty and fills in as the positions arrive
+            new_trade_id = detect_new_trade_id(before_ids, 0)
+    if new_trade_id is None:
+        raise Exception("Failed to detect new trade ticket.")
+    return new_trade_id
+
+def find_trade_row(ticket_id, rows=None):
+    """
+    Locates the trade row (engine-list-element) that contains the given ticket_id.
+    Returns the trade row element if found, otherwise None. Raises PositionsUnavailable if the
+    table couldn't be read, so None always means the position is not open.
+
+    rows: an existing {ticket_id: Position} snapshot to search first. A ticket missing from it is looked
+    up again in a fresh read, since the snapshot may be older than the position.
+    """
+    ticket_id = str(ticket_id).strip()
+    if rows is not None and ticket_id in rows:
+        return rows[ticket_id].row
+    position = positions_by_ticket().get(ticket_id)
+    return position.row if position else None
+
+def get_trade_row(ticket_id, rows=None):
+    """Return the WebElement for the given ticket_id row, fresh unless a snapshot is passed in."""
+    trade_row = find_trade_row(ticket_id, rows)
+    if trade_row is None:
+        raise NoSuchElementException(f"No open position row for ticket {ticket_id}")
+    return trade_row
        
 
-def handle_modify(data):
+def handle_modify(data, rows=None):
     # Identify new values for TP and SL
     ticket_id = trade_map.get(data['ticket'])
+    set_log_fields(web_ticket=ticket_id)
     new_tp = data['take_profit'] if data['take_profit'] != 0.0 else None
     new_sl = data['stop_loss'] if data['stop_loss'] != 0.0 else None
 
@@ -503,30 +1325,28 @@ def handle_modify(data):
 
     try:
         # Locate the trade row for the given ticket ID
-        trade_row = get_trade_row(ticket_id)
+        trade_row = get_trade_row(ticket_id, rows)
         if not trade_row:
             return f"Error: Could not find trade row for ticket ID {ticket_id}"
 
         # --- Modify TP if needed ---
         if new_tp is not None:
-            edit_tp_button = trade_row.find_element(By.XPATH, ".//mtr-security-order-button[@id='editTakeProfit']//button")
-            edit_tp_button.click()
-
-            WebDriverWait(driver, 3).until(EC.visibility_of_element_located((By.XPATH, "//mtr-security-order-popup")))
-            tp_input = driver.find_element(By.XPATH, "//mtr-security-order-popup//input[contains(@class, 'engine-input-spinner__input')]")
-            tp_input.click()
-            tp_input.clear()
-            for _ in range(10):
-                tp_input.send_keys(Keys.BACKSPACE)
-            tp_input.send_keys(str(new_tp))
-
-            save_button = driver.find_element(By.XPATH, "//mtr-security-order-popup//button[contains(@data-testid, 'save-button')]")
-            save_button.click()
-            print(f"Updated TP for trade {ticket_id} to {new_tp}")
+            with stage("panel_open"):
+                edit_tp_button = trade_row.find_element(By.XPATH, ".//mtr-security-order-button[@id='editTakeProfit']//button")
+                edit_tp_button.click()
+
+                wait_visible(driver, By.CSS_SELECTOR, "mtr-security-order-popup", timeout=3)
+            with stage("field_input"):
+                tp_set = set_input_values({POPUP_INPUT: new_tp})
+            if not tp_set:
+                return f"Error: Could not input TP for trade {ticket_id}"
+
+            with stage("button_click"):
+                save_button = driver.find_element(By.XPATH, "//mtr-security-order-popup//button[contains(@data-testid, 'save-button')]")
+                save_button.click()
+            log_orders.info("Updated TP for trade %s to %s", ticket_id, new_tp)
             
-            WebDriverWait(driver, 3).until(
-                EC.invisibility_of_element_located((By.XPATH, "//mtr-security-order-popup"))
-            )                             
+            wait_invisible(driver, By.CSS_SELECTOR, "mtr-security-order-popup", timeout=3)                             
             
             trade_row = get_trade_row(ticket_id)
             if not trade_row:
@@ -534,120 +1354,188 @@ def handle_modify(data):
 
         # --- Modify SL if needed ---
         if new_sl is not None:
-            edit_sl_button = trade_row.find_element(By.XPATH, ".//mtr-security-order-button[@id='editStopLoss']//button")
-            edit_sl_button.click()
+            with stage("panel_open"):
+                edit_sl_button = trade_row.find_element(By.XPATH, ".//mtr-security-order-button[@id='editStopLoss']//button")
+                edit_sl_button.click()
 
-            WebDriverWait(driver, 3).until(EC.visibility_of_element_located((By.XPATH, "//mtr-security-order-popup")))
-            sl_input = driver.find_element(By.XPATH, "//mtr-security-order-popup//input[contains(@class, 'engine-input-spinner__input')]")
-            sl_input.click()
-            sl_input.clear()
-            for _ in range(10):
-                sl_input.send_keys(Keys.BACKSPACE)
-            sl_input.send_keys(str(new_sl))
+                wait_visible(driver, By.CSS_SELECTOR, "mtr-security-order-popup", timeout=3)
+            with stage("field_input"):
+                sl_set = set_input_values({POPUP_INPUT: new_sl})
+            if not sl_set:
+                return f"Error: Could not input SL for trade {ticket_id}"
 
-            save_button = driver.find_element(By.XPATH, "//mtr-security-order-popup//button[contains(@data-testid, 'save-button')]")
-            save_button.click()
-            print(f"Updated SL for trade {ticket_id} to {new_sl}")
+            with stage("button_click"):
+                save_button = driver.find_element(By.XPATH, "//mtr-security-order-popup//button[contains(@data-testid, 'save-button')]")
+                save_button.click()
+            log_orders.info("Updated SL for trade %s to %s", ticket_id, new_sl)
 
         return f"Successfully updated TP and/or SL for trade {ticket_id}."
 
+    except PositionsUnavailable as e:
+        log_orders.error("Could not read the positions table to modify %s: %s", ticket_id, e)
+        return f"Error: Could not read the positions table to modify {ticket_id}"
     except NoSuchElementException:
-        print(f"Error: Could not find an element for ticket ID {ticket_id}")
+        log_orders.error("Could not find an element for ticket ID %s", ticket_id)
         return f"Error: Could not find trade row for ticket ID {ticket_id}"
     except TimeoutException:
-        print(f"Error: Timeout while modifying trade {ticket_id}")
+        log_orders.error("Timeout while modifying trade %s", ticket_id)
         return f"Error: Timeout while modifying trade {ticket_id}"
 
  
+# Clicks the close button on one open-positions row
+def close_position_row(trade_row):
+    with stage("button_click"):
+        close_button = trade_row.find_element(By.XPATH, ".//button[@id='closePositionButton' and @title='Close position']")
+        close_button.click()
+
 # Function to close trade
-def handle_delete(data):
+def handle_delete(data, rows=None):
     mt5_ticket = data['ticket']
     if mt5_ticket in trade_map:
         ticket_id = trade_map.get(data['ticket'])        
+        set_log_fields(web_ticket=ticket_id)
         if not ticket_id:
             return {"error": f"Ticket ID {data['ticket']} not found in trade map."}
         
         try:
-            # Locate the open positions container
-            container = driver.find_element(By.XPATH, "//mtr-open-positions-desktop[contains(@class, 'open-positions-desktop')]")
-            
-            # Find the overflow container that holds the trades
-            overflow_container = container.find_element(By.CLASS_NAME, "engine-list--overflow")
-
-            # Get all trade elements
-            trade_elements = overflow_container.find_elements(By.TAG_NAME, "engine-list-element")
-            
-            # Find the correct trade row by searching for the ticket ID inside the trade elements
-            trade_row = None
-            for trade in trade_elements:
-                try:
-                    ticket_element = trade.find_element(By.XPATH, ".//*[contains(@class, 'bottom-section-table__position-id') and contains(text(), '{}')]".format(ticket_id))
-                    if ticket_element:
-                        trade_row = trade
-                        break
-                except NoSuchElementException:
-                    continue  # If ticket element is not found in this trade, skip and try next one
+            # A batch passes its own snapshot; otherwise the row comes with the mirror's update, in one call
+            if rows is not None:
+                trade_row = find_trade_row(ticket_id, rows)
+            else:
+                trade_row = drain_positions_mirror(ticket=ticket_id)
             
             if not trade_row:
                 return remove_from_map(data)
                 
-            close_button = trade_row.find_element(By.XPATH, ".//button[@id='closePositionButton' and @title='Close position']")
-            close_button.click()
+            close_position_row(trade_row)
             
             del trade_map[mt5_ticket]
             return f"Successfully closed: {ticket_id}."
 
+        except PositionsUnavailable as e:
+            # Nothing is known about the position, so it stays mapped
+            log_orders.error("Could not read the positions table to close %s: %s", ticket_id, e)
+            return f"Error: Could not read the positions table to close {ticket_id}"
         except NoSuchElementException:
-            print(f"Error: Could not find trade row for ticket ID {ticket_id}")
+            log_orders.error("Could not find trade row for ticket ID %s", ticket_id)
             return f"Error: Could not find trade row for ticket ID {ticket_id}"        
             return {"success": f"Trade {mt5_ticket} removed"}
     else:
         return {"error": "Trade ticket not found"}
         
         
+# CSS selector of the terminal's own "close all positions" control, if it has one. When set, close-all
+# clicks it instead of every row's close button; rows it leaves open are still retried one by one.
+BULK_CLOSE_BUTTON = ""
+CLOSE_ALL_TIMEOUT = 5  # seconds for the table to empty after the close clicks
+CLOSE_ALL_RETRY_TIMEOUT = 3  # seconds for retried rows to leave
+
+# Clicks the close button of every open-positions row whose ticket is in arguments[0], in one pass.
+# Returns the tickets it clicked and the ones whose row had no close button.
+CLOSE_ROWS_JS = """
+const wanted = new Set(arguments[0]), ticketSelector = arguments[1];
+const result = { clicked: [], missing: [] };
+const overflow = document.querySelector("mtr-open-positions-desktop.open-positions-desktop .engine-list--overflow");
+if (!overflow) { return result; }
+overflow.querySelectorAll("engine-list-element").forEach(function (row) {
+    const cell = row.querySelector(ticketSelector);
+    const ticket = cell ? cell.textContent.trim() : "";
+    if (!wanted.has(ticket)) { return; }
+    const button = row.querySelector("button#closePositionButton[title='Close position']");
+    if (button) {
+        button.click();
+        result.clicked.push(ticket);
+    } else {
+        result.missing.push(ticket);
+    }
+});
+return result;
+"""
+
+def _wait_rows_at_most(count, timeout):
+    """Waits for the positions table to be down to `count` rows. Timing out is not an error here."""
+    try:
+        wait_count_at_most(driver, By.CSS_SELECTOR, POSITION_TICKET_CELLS, max(count, 0), timeout=timeout)
+    except TimeoutException:
+        pass
+
 def close_all_trades(data):
     """
-    Attempts to close every open trade in the browser table.
-    Returns a dict summarizing successes and failures.
+    Closes every open trade in the browser table.
+
+    Every close is fired at once: one script clicks all the rows' close buttons (or BULK_CLOSE_BUTTON is
+    clicked), the page waits for the rows to leave, and one snapshot tells which are still open. Only those
+    are retried, with a native click each, then one last snapshot settles the result. Closed positions
+    are dropped from trade_map.
+    Returns a dict summarizing successes and failures, with per-ticket results and the total time.
     """
-    tickets = get_open_trade_ids()
+    start = time.time()
+    positions = snapshot_positions()
+    tickets = [position.ticket for position in positions]
     results = {
         "status": None,
         "closed": [],
-        "failed": {}
+        "failed": {},
+        "tickets": {ticket: {"attempts": 0} for ticket in tickets},
     }
 
-    for ticket in tickets:
-        try:
-            # Re-find the row for this ticket
-            row_xpath = (
-                f"//engine-list-element[.//div[contains(@class,'bottom-section-table__position-id') "
-                f"and normalize-space(text())='{ticket}']]"
-            )
-            trade_row = WebDriverWait(driver, 3).until(
-                EC.presence_of_element_located((By.XPATH, row_xpath))
-            )
-
-            # Click its close button
-            close_btn = trade_row.find_element(
-                By.XPATH,
-                ".//button[@id='closePositionButton' and @title='Close position']"
-            )
-            close_btn.click()
-
-            # Wait until that row disappears
-            WebDriverWait(driver, 3).until(
-                EC.staleness_of(trade_row)
-            )
-
-            results["closed"].append(ticket)
-
-        except (TimeoutException, NoSuchElementException) as e:
-            results["failed"][ticket] = f"Element issue: {e}"
-        except StaleElementReferenceException as e:
-            results["failed"][ticket] = f"Stale reference: {e}"
-        except Exception as e:
-            results["failed"][ticket] = f"Unknown error: {e}"
+    if tickets:
+        # First pass: every close in one go
+        with stage("button_click"):
+            clicked = []
+            if BULK_CLOSE_BUTTON:
+                try:
+                    wait_clickable(driver, By.CSS_SELECTOR, BULK_CLOSE_BUTTON, timeout=1).click()
+                    clicked = list(tickets)
+                except Exception as e:
+                    log_orders.warning("Bulk close unavailable, closing row by row: %s", e)
+            if not clicked:
+                try:
+                    fired = driver.execute_script(CLOSE_ROWS_JS, tickets, POSITION_FIELD_SELECTORS["ticket"]) or {}
+                    clicked = fired.get("clicked", [])
+                except Exception as e:
+                    log_orders.error("Close script failed: %s", e)
+        for ticket in clicked:
+            results["tickets"][ticket]["attempts"] += 1
+
+        with stage("close_verify"):
+            _wait_rows_at_most(len(tickets) - len(clicked), CLOSE_ALL_TIMEOUT)
+            table = snapshot_positions()
+            remaining = [position for position in table if position.ticket in results["tickets"]]
+
+        # Second pass: only the rows that are still there, clicked natively in case the page ignored the script
+        if remaining:
+            log_orders.warning("%d of %d positions still open, retrying them", len(remaining), len(tickets))
+            retried = 0
+            for position in remaining:
+                results["tickets"][position.ticket]["attempts"] += 1
+                try:
+                    close_position_row(position.row)
+                    retried += 1
+                except (NoSuchElementException, StaleElementReferenceException):
+                    # The row went away on its own between the snapshot and the click
+                    pass
+                except Exception as e:
+                    results["tickets"][position.ticket]["error"] = f"Unknown error: {e}"
+            with stage("close_verify"):
+                _wait_rows_at_most(len(table) - retried, CLOSE_ALL_RETRY_TIMEOUT)
+                remaining = [position for position in snapshot_positions() if position.ticket in results["tickets"]]
+
+        still_open = {position.ticket for position in remaining}
+        for ticket in tickets:
+            entry = results["tickets"][ticket]
+            if ticket in still_open:
+                entry["status"] = "failed"
+                entry.setdefault("error", "Still open after the close was retried")
+                results["failed"][ticket] = entry["error"]
+            else:
+                entry["status"] = "closed"
+                entry.pop("error", None)
+                results["closed"].append(ticket)
+                mt5_ticket = trade_map.mt5_ticket_for(ticket)
+                if mt5_ticket is not None:
+                    del trade_map[mt5_ticket]
+                    entry["mt5_ticket"] = mt5_ticket
 
     # Determine overall status
     if not tickets:
@@ -659,6 +1547,8 @@ def close_all_trades(data):
     else:
         results["status"] = "failure"
 
+    results["elapsed_ms"] = round((time.time() - start) * 1000, 1)
+    log_orders.info("%d closed, %d failed in %sms", len(results["closed"]), len(results["failed"]), results["elapsed_ms"])
     return results
         
 def remove_from_map(data):
@@ -673,88 +1563,829 @@ def remove_from_map(data):
             return f"Trade removed from map: {ticket_id}."
 
         except NoSuchElementException:
-            print(f"Error: Could not find trade row for ticket ID {ticket_id}")
+            log_orders.error("Could not find trade row for ticket ID %s", ticket_id)
             return f"Error: Could not find trade row for ticket ID {ticket_id}"        
     else:
         return {"error": "Trade ticket not found"}
 
 
-def periodic_refresh():
-    """Periodically refresh the browser every 20 minutes, waiting until no action is in progress."""
+# Tolerance when comparing MT5 prices against the values shown in the positions table
+PRICE_TOLERANCE = 1e-6
+
+def _price_needs_update(wanted, shown):
+    """True if the row should be edited to show `wanted`. A wanted value of 0.0 means MT5 has none set."""
+    if not wanted:
+        return False
+    return shown is None or abs(float(wanted) - shown) > PRICE_TOLERANCE
+
+def plan_sync(mt5_positions, web_rows):
+    """
+    Diffs the full MT5 position list against one snapshot of the browser table and trade_map.
+
+    mt5_positions: {str(MT5 ticket): position payload}
+    web_rows: {web ticket: Position}, as returned by positions_by_ticket()
+
+    Returns a dict of the minimum work needed: positions to open, TP/SL edits, rows to close,
+    and stale links to drop from trade_map. A linked row whose symbol or side can't be read, or doesn't
+    match the MT5 position, is neither modified nor opened again: it is listed under "skipped" with why.
+    """
+    plan = {"open": [], "modify": [], "close": [], "unmap": [], "unchanged": [], "skipped": {}}
+
+    # Linked positions that MT5 no longer has
+    for mt5_ticket, web_ticket in trade_map.items():
+        if mt5_ticket in mt5_positions:
+            continue
+        if web_ticket in web_rows:
+            plan["close"].append((mt5_ticket, web_ticket))
+        else:
+            plan["unmap"].append(mt5_ticket)
+
+    for mt5_ticket, position in mt5_positions.items():
+        web_ticket = trade_map.get(mt5_ticket)
+        row = web_rows.get(web_ticket) if web_ticket else None
+        if row is None:
+            # Never copied, or the browser position is gone (e.g. its TP/SL hit first); open it again
+            if web_ticket:
+                plan["unmap"].append(mt5_ticket)
+            plan["open"].append(position)
+            continue
+
+        mismatch = _row_mismatch(position, row)
+        if mismatch:
+            plan["skipped"][mt5_ticket] = mismatch
+            continue
+
+        update_tp = _price_needs_update(position["take_profit"], row.take_profit)
+        update_sl = _price_needs_update(position["stop_loss"], row.stop_loss)
+        if update_tp or update_sl:
+            # handle_modify treats 0.0 as "leave unchanged", so only send the values that differ
+            modify = dict(position)
+            modify["take_profit"] = position["take_profit"] if update_tp else 0.0
+            modify["stop_loss"] = position["stop_loss"] if update_sl else 0.0
+            plan["modify"].append(modify)
+        else:
+            plan["unchanged"].append(mt5_ticket)
+
+    return plan
+
+def _row_mismatch(position, row):
+    """Why a linked table row can't be taken for this MT5 position, or None if symbol and side agree."""
+    if not _base_symbol(row.symbol) or row.side not in ("BUY", "SELL"):
+        return f"row {row.ticket}: symbol or side unreadable ({row.symbol!r}, {row.side!r})"
+    if _base_symbol(row.symbol) != _base_symbol(position["symbol"]) or row.side != str(position["direction"]).upper():
+        return f"row {row.ticket} is {row.side} {row.symbol}, MT5 has {position['direction']} {position['symbol']}"
+    return None
+
+def sync_positions(data):
+    """
+    Brings the browser in line with the full MT5 position list in one pass.
+    Closes run first, then TP/SL edits, then opens. Returns per-ticket results.
+    """
+    start = time.time()
+    mt5_positions = {str(position["ticket"]): position for position in data["positions"]}
+    try:
+        web_rows = positions_by_ticket()
+    except PositionsUnavailable as e:
+        # Reconciling against an unread table would unmap and reopen every position
+        log_orders.error("Sync aborted: %s", e)
+        return {"status": "failure", "error": f"Could not read the positions table, sync aborted: {e}"}
+    plan = plan_sync(mt5_positions, web_rows)
+
+    results = {
+        "status": None,
+        "opened": {},
+        "modified": [],
+        "closed": [],
+        "unmapped": [],
+        "unchanged": plan["unchanged"],
+        "skipped": plan["skipped"],
+        "failed": {},
+    }
+
+    for mt5_ticket in plan["unmap"]:
+        trade_map.pop(mt5_ticket)
+        results["unmapped"].append(mt5_ticket)
+
+    for mt5_ticket, web_ticket in plan["close"]:
+        try:
+            close_position_row(web_rows[web_ticket].row)
+            trade_map.pop(mt5_ticket)
+            results["closed"].append(mt5_ticket)
+        except Exception as e:
+            results["failed"][mt5_ticket] = f"close: {e}"
+
+    for modify in plan["modify"]:
+        mt5_ticket = str(modify["ticket"])
+        try:
+            result = _normalize_result(handle_modify(modify))
+            if "error" in result:
+                results["failed"][mt5_ticket] = f"modify: {result['error']}"
+            else:
+                results["modified"].append(mt5_ticket)
+        except Exception as e:
+            results["failed"][mt5_ticket] = f"modify: {e}"
+
+    for position in plan["open"]:
+        mt5_ticket = str(position["ticket"])
+        try:
+            result = _normalize_result(handle_trade(dict(position, action="trade")))
+            if "error" in result:
+                results["failed"][mt5_ticket] = f"open: {result['error']}"
+            else:
+                results["opened"][mt5_ticket] = result.get("trade_id")
+        except Exception as e:
+            results["failed"][mt5_ticket] = f"open: {e}"
+
+    work_done = len(results["opened"]) + len(results["modified"]) + len(results["closed"])
+    if results["failed"] or results["skipped"]:
+        results["status"] = "partial_success" if work_done else "failure"
+    else:
+        results["status"] = "success" if work_done else "in_sync"
+    results["elapsed_ms"] = round((time.time() - start) * 1000, 1)
+    log_orders.info("opened %d, modified %d, closed %d, skipped %d, failed %d in %s ms", len(results["opened"]),
+                    len(results["modified"]), len(results["closed"]), len(results["skipped"]), len(results["failed"]),
+                    results["elapsed_ms"])
+    return results
+
+def health_scheduler():
+    """Queues a health check for each account every HEALTH_CHECK_INTERVAL, unless one is still waiting to run."""
+    pending = {}
     while True:
-        time.sleep(REFRESH_INTERVAL)
-        # Ensure we are not in the middle of a trade action.
-        while ACTION_IN_PROGRESS:
-            print("Action in progress. Waiting for safe refresh...")
-            time.sleep(5)  # Check every 5 seconds until safe to refresh
-        refresh_browser()        
-
-# Function to open new trade    
-def handle_trade(data):
+        time.sleep(HEALTH_CHECK_INTERVAL)
+        for name, session in sessions.items():
+            job = pending.get(name)
+            if job is None or job.finished:
+                pending[name] = session.action_queue.submit("health_check")
+
+# Function to open new trade
+def handle_trade(data, before_ids=None, wait=True):
+    """
+    Opens a new position. before_ids passes in the ticket IDs already open, so no extra table read is needed.
+    The order panel is only set up as far as it isn't already (see ensure_order_panel).
+    wait=False returns {"status": "placed"} as soon as the order is clicked, without waiting for the position.
+    """
     volume = data['volume']
     stop_loss = data['stop_loss']
     take_profit = data['take_profit']
     symbol = data['symbol']
-    if(stop_loss == 0.0 and take_profit == 0.0):
-        return click_trade_market(data)
+    if data['ticket'] in trade_map:
+        # Already open in the browser (e.g. a retry that outlived the idempotency cache); don't open it twice
+        log_orders.warning("MT5 ticket %s is already mapped to %s; skipping", data['ticket'], trade_map[data['ticket']])
+        return {"status": "success", "action": data.get("direction", "").upper(), "trade_id": trade_map[data['ticket']], "duplicate": True}
+    try:
+        if(stop_loss == 0.0 and take_profit == 0.0):
+            ensure_order_panel(symbol, with_tpsl=False)
+            result = click_trade_market(data, before_ids, wait)
+        else:
+            ensure_order_panel(symbol)
+            with stage("field_input"):
+                input_order_values(volume, stop_loss, take_profit)
+            result = click_trade_tpsl(data, before_ids, wait)
+    except Exception:
+        reset_order_panel()
+        raise
+    if "error" in result:
+        # We no longer know what the panel looks like
+        reset_order_panel()
+    return result
+
+def order_batch(actions):
+    """
+    Orders a batch so each symbol's work runs together, letting select_symbol run once per symbol.
+
+    Returns [(original_index, payload)]. The order is stable: symbols keep the order they first
+    appear in, every ticket's actions keep their relative order, and a delete_all stays a barrier
+    that nothing is moved across. Deletes carry symbol "NONE", so they are grouped under the symbol
+    learned from an earlier action on the same ticket.
+    """
+    ordered = []
+    segment = []
+    ticket_symbols = {}
+
+    def flush():
+        groups = {}
+        for index, payload in segment:
+            ticket = str(payload.get("ticket"))
+            symbol = payload.get("symbol")
+            if symbol and symbol != "NONE":
+                ticket_symbols.setdefault(ticket, symbol)
+            key = ticket_symbols.get(ticket, symbol)
+            groups.setdefault(key, []).append((index, payload))
+        for group in groups.values():
+            ordered.extend(group)
+        segment.clear()
+
+    for index, payload in enumerate(actions):
+        if payload["action"] == "delete_all":
+            flush()
+            ordered.append((index, payload))
+        else:
+            segment.append((index, payload))
+    flush()
+    return ordered
+
+def run_batch(data):
+    """
+    Executes an ordered list of trade actions in one browser pass.
+    The browser health check has already run once for the whole job. The positions table is read once
+    up front and kept current as trades open and close. Since work is grouped by symbol,
+    ensure_order_panel only has to switch symbols once per group.
+    """
+    start = time.time()
+    rows = positions_by_ticket()
+    known_ids = set(rows)
+    results = [None] * len(data["actions"])
+
+    for index, payload in order_batch(data["actions"]):
+        action = payload["action"]
+        action_start = time.time()
+        try:
+            with job_labels(action=action, symbol=payload.get("symbol", "")), log_context(mt5_ticket=payload.get("ticket")):
+                if action == "trade":
+                    result = handle_trade(payload, before_ids=known_ids)
+                elif action == "modify":
+                    try:
+                        result = handle_modify(payload, rows)
+                    except StaleElementReferenceException:
+                        rows = positions_by_ticket()
+                        result = handle_modify(payload, rows)
+                elif action == "delete":
+                    try:
+                        result = handle_delete(payload, rows)
+                    except StaleElementReferenceException:
+                        rows = positions_by_ticket()
+                        result = handle_delete(payload, rows)
+                elif action == "delete_all":
+                    result = close_all_trades(payload)
+                else:
+                    result = {"error": f"Invalid action: {action}"}
+            result = _normalize_result(result)
+        except Exception as e:
+            result = {"error": str(e)}
+
+        # Keep the snapshot and the known ticket IDs in step with what this batch opened and closed,
+        # so a later modify or delete of a ticket opened here finds its row
+        if action == "trade" and result.get("trade_id"):
+            rows = positions_including(result["trade_id"])
+            known_ids.add(result["trade_id"])
+            if rows is not None:
+                known_ids.update(rows)
+        elif action in ("delete", "delete_all") and "error" not in result:
+            try:
+                rows = positions_by_ticket()
+                known_ids = set(rows)
+            except PositionsUnavailable:
+                # Later actions read the table themselves
+                rows = None
+
+        results[index] = {
+            "index": index,
+            "action": action,
+            "ticket": payload.get("ticket"),
+            "result": result,
+            "elapsed_ms": round((time.time() - action_start) * 1000, 1),
+        }
+
+    failed = sum(1 for entry in results if "error" in entry["result"])
+    if not failed:
+        status = "success"
+    elif failed < len(results):
+        status = "partial_success"
     else:
-        select_symbol(symbol)
-        openTradeMenu()
-        input_volume(volume)
-        input_sl(stop_loss)
-        input_tp(take_profit)
-        return click_trade_tpsl(data)   
+        status = "failure"
+    return {"status": status, "results": results, "elapsed_ms": round((time.time() - start) * 1000, 1)}
+
+def _normalize_result(result):
+    """Handlers return either a message string or a dict. Jobs always store a dict."""
+    if isinstance(result, dict):
+        return result
+    message = str(result)
+    if message.startswith("Error"):
+        return {"error": message}
+    return {"status": "success", "message": message}
+
+def ensure_operational():
+    """Quick check to make sure the browser didn't crash before an action runs on it."""
+    session = current_session()
+    with stage("health_check"):
+        operational = is_browser_operational(STANDBY_PROBE_TIMEOUT if session.standby else OPERATIONAL_TIMEOUT)
+    if not operational:
+        # Switch to the warm standby if there is one; refreshing is the fallback
+        with stage("failover"):
+            failed_over = promote_standby("user menu not visible")
+        if not failed_over:
+            with stage("refresh_fallback"):
+                refresh_browser()
+
+def run_job(job):
+    """Performs one queued job against the browser. Only ever called from browser_worker."""
+    if job.action == "health_check":
+        return run_health_check()
+
+    ensure_operational()
+    data = job.data
+    if job.action == "trade":
+        return handle_trade(data)
+    elif job.action == "modify":
+        return handle_modify(data)
+    elif job.action == "delete":
+        return handle_delete(data)
+    elif job.action == "delete_all":
+        return close_all_trades(data)
+    elif job.action == "sync":
+        return sync_positions(data)
+    elif job.action == "batch":
+        return run_batch(data)
+    return {"error": f"Invalid action: {job.action}"}
+
+def _order_matches(row, base_symbol, direction):
+    """True if a positions-mirror row could be the position a `direction` order on `base_symbol` opened."""
+    if _base_symbol(row.get("symbol", "")) != base_symbol:
+        return False
+    side = _parse_side(row.get("side", ""))
+    return side not in ("BUY", "SELL") or side == direction
+
+def collect_new_trade_ids(orders, before_ids, timeout=2):
+    """
+    Waits in the positions window for the positions of orders clicked in the order windows.
+
+    orders: {key: (base symbol, direction)}, at most one per symbol. Each row that is neither in
+    before_ids nor already mapped goes to the order waiting on its symbol and side. The page answers
+    as soon as the row count moves, and the mirror says which rows are new.
+    Returns {key: web ticket} for the orders found within the timeout.
+    """
+    mirror = current_session().positions
+    found = {}
+    deadline = time.time() + timeout
+    while True:
+        drain_positions_mirror()
+        for ticket in mirror.tickets() - before_ids - set(found.values()):
+            if trade_map.has_web_ticket(ticket):
+                continue
+            row = mirror.get(ticket)
+            for key, (base_symbol, direction) in orders.items():
+                if key not in found and row and _order_matches(row, base_symbol, direction):
+                    found[key] = ticket
+                    log_orders.info("%s found in the positions table", ticket)
+                    break
+        remaining = deadline - time.time()
+        if len(found) == len(orders) or remaining <= 0:
+            return found
+        try:
+            wait_count_changed(driver, By.CSS_SELECTOR, POSITION_TICKET_CELLS, len(mirror.tickets()), timeout=remaining)
+        except TimeoutException:
+            pass
+
+def place_in_order_window(data, window):
+    """
+    Clicks a new trade in one of the order windows and returns without waiting for the position
+    ({"status": "placed"}, or handle_trade's error or duplicate result).
+    """
+    use_window(window.handle)
+    current_session().windows.used(window)
+    # Health checks only look at the positions window, so each order window gets the quick look here
+    with stage("health_check"):
+        operational = is_browser_operational(STANDBY_PROBE_TIMEOUT)
+    if not operational:
+        with stage("refresh_fallback"):
+            refresh_browser()
+    return handle_trade(data, wait=False)
+
+def run_trade_pipeline(session, first):
+    """
+    Runs the trade `first` together with the trades queued right behind it, as long as each is for a
+    symbol not already in flight and an order window is free. Every order is clicked in its own
+    window first, then their positions are collected together in the positions window, so the fills
+    overlap. A job that is anything else ends the run and waits its turn, so nothing is reordered.
+    Finishes every job it took.
+    """
+    try:
+        with job_labels(**_labels(session, first)):
+            ensure_operational()
+        # A failover brings the standby's windows along
+        pool = session.windows
+        use_positions_window()
+        before_ids = set(open_ticket_ids())
+    except Exception as e:
+        log_worker.exception("%s: job %s (%s) failed: %s", session.name, first.id, first.action, e)
+        finish_job(session, first, {"error": str(e)})
+        return
+
+    in_flight = []  # [(job, window, (base symbol, direction))], clicked and waiting for their position
+    job = first
+    while job is not None:
+        symbol = job.data.get("symbol")
+        window = pool.window_for(symbol, {window.handle for _, window, _ in in_flight}) if pool else None
+        with job_labels(**_labels(session, job)), log_context(request_id=job.request_id, job_id=job.id, mt5_ticket=job.ticket):
+            try:
+                if window is None:
+                    # No order windows on this browser (e.g. none opened on the standby); the usual way
+                    use_positions_window()
+                    result = handle_trade(job.data, before_ids)
+                else:
+                    result = place_in_order_window(job.data, window)
+            except Exception as e:
+                log_worker.exception("%s: job %s (%s) failed: %s", session.name, job.id, job.action, e)
+                result = {"error": str(e)}
+        if result.get("status") == "placed":
+            web_symbol = resolved_symbols.get(symbol) or SYMBOL_ALIASES.get(symbol) or symbol
+            in_flight.append((job, window, (_base_symbol(web_symbol), result["action"])))
+        else:
+            finish_job(session, job, result)
+        if window is None or len(in_flight) >= len(pool.order_windows):
+            break
+        busy_symbols = {queued.data.get("symbol") for queued, _, _ in in_flight}
+        # An expired trade ends the run too; the worker deals with it on its own
+        job = session.action_queue.take_if(
+            lambda queued: queued.action == "trade" and queued.data.get("symbol") not in busy_symbols
+            and not queued.expired())
+
+    if not in_flight:
+        return
+    orders = {job.id: order for job, _, order in in_flight}
+    error = "Failed to detect new trade ticket."
+    with job_labels(action="trade", account=session.name):
+        try:
+            use_positions_window()
+            with stage("ticket_detect"):
+                found = collect_new_trade_ids(orders, before_ids)
+            if len(found) < len(orders):
+                log_orders.warning("%d of %d new trades not detected—refreshing and retrying...",
+                                   len(orders) - len(found), len(orders))
+                with stage("refresh_fallback"):
+                    refresh_browser()
+                    found.update(collect_new_trade_ids({key: order for key, order in orders.items() if key not in found}, before_ids))
+        except Exception as e:
+            log_orders.exception("Collecting new positions failed: %s", e)
+            found, error = {}, str(e)
+
+    for job, window, (_, direction) in in_flight:
+        web_ticket = found.get(job.id)
+        with job_labels(**_labels(session, job)), log_context(request_id=job.request_id, job_id=job.id, mt5_ticket=job.ticket, web_ticket=web_ticket):
+            if web_ticket is None:
+                log_orders.error("No position found for the order placed in window %d", window.number)
+                result = {"error": error}
+            else:
+                trade_map[job.ticket] = web_ticket
+                log_audit.info("Mapped MT5 ticket %s to browser trade ID %s", job.ticket, web_ticket)
+                result = {"status": "success", "action": direction, "trade_id": web_ticket, "window": window.number}
+        finish_job(session, job, result)
+
+def reject_if_expired(session, job):
+    """
+    Deadline check for a job the worker has just taken. A new trade past its deadline is finished here as
+    expired and True is returned, or, with EXPIRED_TRADE_POLICY "flag", marked late and left to run.
+    Anything but a new trade always runs.
+    """
+    if job.action != "trade" or not job.expired():
+        return False
+    late_ms = round((time.time() - job.deadline) * 1000, 1)
+    with log_context(request_id=job.request_id, job_id=job.id, mt5_ticket=job.ticket):
+        if EXPIRED_TRADE_POLICY == "flag":
+            job.late = True
+            session.action_queue.count("trades_late")
+            log_orders.warning("%s: trade is %s ms past its deadline; placing it anyway", session.name, late_ms)
+            return False
+        session.action_queue.count("trades_expired")
+        log_orders.warning("%s: trade is %s ms past its deadline; not placing it", session.name, late_ms)
+    finish_job(session, job, {"error": "Signal expired before it could be placed", "expired": True, "late_ms": late_ms})
+    return True
+
+def _labels(session, job):
+    return {"action": job.action, "symbol": job.data.get("symbol", ""), "account": session.name}
+
+def finish_job(session, job, result):
+    """Stores a job's result and records its timing."""
+    result = _normalize_result(result)
+    session.action_queue.finish(job, result, failed="error" in result)
+    observe_job(job, **_labels(session, job))
+
+def browser_worker(session):
+    """
+    The only thread that drives a session's browser. Boots it, then takes jobs off its action_queue
+    one at a time. With order windows, trades for different symbols queued back to back run together
+    (see run_trade_pipeline).
+    """
+    bind_session(session)
+    boot_session(session)
+    while True:
+        job = session.action_queue.get(timeout=MIRROR_DRAIN_INTERVAL)
+        if job is None:
+            # Idle: keep the positions mirror current for /api/positions
+            try:
+                use_positions_window()
+                drain_positions_mirror()
+            except Exception as e:
+                log_worker.warning("%s: idle mirror collection failed: %s", session.name, e)
+            continue
+        if reject_if_expired(session, job):
+            continue
+        if job.action == "trade" and session.windows is not None and session.windows.order_windows:
+            run_trade_pipeline(session, job)
+            continue
+        with job_labels(**_labels(session, job)), log_context(request_id=job.request_id, job_id=job.id, mt5_ticket=job.ticket):
+            try:
+                # Everything but new trades runs in the window that owns the positions table
+                use_positions_window()
+                result = run_job(job)
+            except Exception as e:
+                log_worker.exception("%s: job %s (%s) failed: %s", session.name, job.id, job.action, e)
+                result = {"error": str(e)}
+            finish_job(session, job, result)
+
+def _scale_volume(volume, multiplier):
+    if multiplier == 1.0:
+        return volume
+    return round(float(volume) * multiplier, VOLUME_DECIMALS)
+
+def payload_for_session(session, action, data):
+    """Copies a payload for one account, with volumes scaled by that account's multiplier."""
+    if action == "batch":
+        return {"actions": [payload_for_session(session, payload["action"], payload) for payload in data["actions"]]}
+    if action == "sync":
+        return dict(data, positions=[
+            dict(position, volume=_scale_volume(position["volume"], session.volume_multiplier))
+            for position in data["positions"]
+        ])
+    payload = dict(data)
+    if "volume" in payload:
+        payload["volume"] = _scale_volume(payload["volume"], session.volume_multiplier)
+    return payload
+
+def dispatch(action, data, priority=None):
+    """
+    Queues an action on every account's worker; they run in parallel.
+    With one account this returns its Job, otherwise a JobGroup covering all of them.
+    """
+    jobs = {
+        name: session.action_queue.submit(action, payload_for_session(session, action, data), priority)
+        for name, session in sessions.items()
+    }
+    if len(jobs) == 1:
+        return next(iter(jobs.values()))
+
+    group = JobGroup(action, jobs)
+    with job_groups_lock:
+        cutoff = time.time() - JOB_RETENTION
+        for group_id in [gid for gid, g in job_groups.items() if g.created_at < cutoff]:
+            del job_groups[group_id]
+        job_groups[group.id] = group
+    return group
+
+def request_key(action, data):
+    """
+    The idempotency key of a request: action, MT5 ticket and the client's sequence number (the "seq"
+    field or an Idempotency-Key header). A trade needs no sequence number, since a ticket is only
+    ever opened once. Other requests without one are not deduplicated.
+    """
+    seq = data.get("seq")
+    if seq in (None, ""):
+        seq = request.headers.get("Idempotency-Key")
+    if seq in (None, ""):
+        if action != "trade":
+            return None
+        return (action, str(data.get("ticket", "")), None)
+    return (action, str(data.get("ticket", "")), str(seq))
+
+def dispatch_once(action, data, priority=None):
+    """
+    dispatch(), unless this request was already received: then the original job is returned instead.
+    Returns (job, duplicate).
+    """
+    key = request_key(action, data)
+    if key is None:
+        return dispatch(action, data, priority), False
+    job, duplicate = idempotency.get_or_create(key, lambda: dispatch(action, data, priority))
+    if duplicate:
+        log_http.info("Repeat of %s; answering with job %s (%s)", key, job.id, job.status)
+    return job, duplicate
+
+def accepted(job, duplicate, **fields):
+    """The response to a queued request. A repeat of a finished request gets the stored result straight away."""
+    if duplicate and job.finished:
+        return jsonify(dict(job.to_dict(), duplicate=True)), 200
+    body = {"status": job.status, "job_id": job.id}
+    body.update(fields)
+    if duplicate:
+        body["duplicate"] = True
+    return jsonify(body), 202
+
+def find_job(job_id):
+    """Looks a job id up across the fan-out groups and every account's queue."""
+    with job_groups_lock:
+        group = job_groups.get(job_id)
+    if group is not None:
+        return group
+    for session in sessions.values():
+        job = session.action_queue.get_job(job_id)
+        if job is not None:
+            return job
+    return None
+
+REQUIRED_TRADE_FIELDS = ["action", "symbol", "ticket", "volume", "direction", "take_profit", "stop_loss"]
+VALID_ACTIONS = ("trade", "modify", "delete", "delete_all")
+
+def validate_trade_payload(data):
+    """Returns an error message for a malformed /api/trades payload, or None if it is usable."""
+    missing_fields = [field for field in REQUIRED_TRADE_FIELDS if field not in data]
+    if missing_fields:
+        return f"Missing fields: {', '.join(missing_fields)}"
+    if data['action'] not in VALID_ACTIONS:
+        return "Invalid action"
+    if data.get("sent_at") is not None and parse_timestamp(data["sent_at"]) is None:
+        return "sent_at must be a Unix timestamp"
+    if data.get("max_age") is not None and parse_max_age(data["max_age"]) is None:
+        return "max_age must be a positive number of seconds"
+    return None
 
 # Function that holds logic for the server POST requests
 @app.route('/api/trades', methods=['POST'])
 def handle_trades():
-    global ACTION_IN_PROGRESS
     try: 
-        ACTION_IN_PROGRESS = True
-        # Quick check to make sure browser didn't crash
-        if not is_browser_operational():
-            refresh_browser()
-        
         # Attempt to get the JSON data from the request
-        data = request.get_json()
+        data = request.get_json(silent=True)
 
         # If data is missing or invalid, respond with a more specific error
-        if not data:
-            return jsonify({"error": "No JSON data received, or invalid format"}), 400
+        if not data or not isinstance(data, dict):
+            return jsonify({"error": "No JSON object received, or invalid format"}), 400
         
-        # Example: Check if all required fields are present
-        required_fields = ["action", "symbol", "ticket", "volume", "direction", "take_profit", "stop_loss"]
-        missing_fields = [field for field in required_fields if field not in data]
-
-        if missing_fields:
-            return jsonify({"error": f"Missing fields: {', '.join(missing_fields)}"}), 400
+        # Check all required fields are present and the action is one we know
+        error = validate_trade_payload(data)
+        if error:
+            return jsonify({"error": error}), 400
         
-        # Process the data (just print it for now)
-        print(f"Received trade data: {data}")
+        log_http.debug("Received trade data: %s", data, extra={"fields": {"mt5_ticket": data.get("ticket")}})
         action = data['action']
-        
-        if action == "trade":
-            return handle_trade(data)
-        elif action == "modify":
-            return handle_modify(data)
-        elif action == "delete":
-            return handle_delete(data)
-        elif action == "delete_all":
-            return close_all_trades(data)
-        else:
-            return jsonify({"error": "Invalid action"}), 400
+
+        if data.get("max_age") is None and DEFAULT_MAX_AGE:
+            data["max_age"] = DEFAULT_MAX_AGE
+        received_at = time.time()
+        sent_at, deadline = signal_deadline(data, received_at)
+        timing = {}
+        if sent_at is not None:
+            timing["transit_ms"] = round((received_at - sent_at) * 1000, 1)
+        if deadline is not None:
+            timing["deadline_ms"] = round((deadline - received_at) * 1000, 1)
+            if (action == "trade" and deadline < received_at and EXPIRED_TRADE_POLICY == "reject"
+                    and idempotency.lookup(request_key(action, data)) is None):
+                # Too old already; no point queuing it. A retry of an accepted request still gets its job below.
+                log_http.warning("Trade for MT5 ticket %s arrived %s ms past its deadline; rejected",
+                                 data['ticket'], -timing["deadline_ms"])
+                for session in sessions.values():
+                    session.action_queue.count("trades_expired")
+                return jsonify(dict(timing, error="Signal expired before it could be placed", expired=True)), 422
+
+        # Hand the work to the browser worker and answer straight away.
+        # The job may be an earlier queued one this request was merged into, or the one a retried request already created.
+        job, duplicate = dispatch_once(action, data)
+        return accepted(job, duplicate, action=action, ticket=data['ticket'], **timing)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-        
-    finally:
-            ACTION_IN_PROGRESS = False
-        
+
+# Accepts an ordered list of /api/trades payloads and runs them as one browser job
+@app.route('/api/trades/batch', methods=['POST'])
+def handle_trades_batch():
+    data = request.get_json(silent=True)
+    actions = data.get("actions") if isinstance(data, dict) else None
+    if not isinstance(actions, list) or not actions:
+        return jsonify({"error": "Expected JSON with a non-empty 'actions' list"}), 400
+
+    for index, payload in enumerate(actions):
+        error = validate_trade_payload(payload) if isinstance(payload, dict) else "Not a JSON object"
+        if error:
+            return jsonify({"error": f"Action {index}: {error}"}), 400
+
+    log_http.info("Received batch of %d actions", len(actions))
+    # The batch runs at the priority of its most urgent action
+    priority = min(ACTION_PRIORITY[payload["action"]] for payload in actions)
+    seq = data.get("seq") if isinstance(data, dict) else None
+    job, duplicate = dispatch_once("batch", {"actions": actions, "seq": seq}, priority=priority)
+    return accepted(job, duplicate, action="batch", count=len(actions))
+
+# Accepts the full list of open MT5 positions and reconciles the browser against it in one job
+@app.route('/api/sync', methods=['POST'])
+def handle_sync():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("positions"), list):
+        return jsonify({"error": "Expected JSON with a 'positions' list"}), 400
+
+    required_fields = ["ticket", "symbol", "volume", "direction", "take_profit", "stop_loss"]
+    for index, position in enumerate(data["positions"]):
+        if not isinstance(position, dict):
+            return jsonify({"error": f"Position {index}: Not a JSON object"}), 400
+        missing_fields = [field for field in required_fields if field not in position]
+        if missing_fields:
+            return jsonify({"error": f"Position {index} missing fields: {', '.join(missing_fields)}"}), 400
+
+    log_http.info("Received sync of %d positions", len(data["positions"]))
+    job, duplicate = dispatch_once("sync", data)
+    return accepted(job, duplicate, action="sync")
+
+# Reports the state of a queued action, including the web ticket once it has been placed
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = find_job(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+    return jsonify(job.to_dict())
+
+def _mirror_position(session, row):
+    position = _position_fields(row)
+    position["web_ticket"] = position.pop("ticket")
+    position["mt5_ticket"] = session.trade_map.mt5_ticket_for(position["web_ticket"])
+    return position
+
+def _mirror_state(session):
+    mirror = session.positions
+    return {
+        "available": mirror.available,
+        "stale": not mirror.is_current(MIRROR_STALE_AFTER),
+        "age_s": round(time.time() - mirror.updated_at, 3) if mirror.updated_at else None,
+        "synced_at": mirror.synced_at,
+    }
+
+# Open positions per account, served from the positions mirror without touching the browser
+@app.route('/api/positions', methods=['GET'])
+def get_positions():
+    accounts = {}
+    for name, session in sessions.items():
+        accounts[name] = dict(_mirror_state(session), positions=[
+            _mirror_position(session, row) for row in session.positions.rows()
+        ])
+    return jsonify({"accounts": accounts})
+
+# One MT5 ticket's position in every account, from the trade map and the positions mirror
+@app.route('/api/positions/<mt5_ticket>', methods=['GET'])
+def get_position(mt5_ticket):
+    accounts = {}
+    for name, session in sessions.items():
+        web_ticket = session.trade_map.get(mt5_ticket)
+        if web_ticket is None:
+            continue
+        row = session.positions.get(web_ticket)
+        accounts[name] = dict(_mirror_state(session), web_ticket=web_ticket, open=row is not None,
+                              position=_mirror_position(session, row) if row else None)
+    if not accounts:
+        return jsonify({"error": f"MT5 ticket {mt5_ticket} is not mapped in any account"}), 404
+    return jsonify({"mt5_ticket": mt5_ticket, "accounts": accounts})
+
+# Queue counters per account, including how many browser operations coalescing saved
+@app.route('/api/queue/stats', methods=['GET'])
+def get_queue_stats():
+    return jsonify({name: session.action_queue.stats() for name, session in sessions.items()})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus scrape endpoint: per-stage and per-job latency histograms
+    return Response(registry.prometheus_text(), mimetype="text/plain; version=0.0.4")
+
+@app.route('/api/ready', methods=['GET'])
+def get_ready():
+    """Startup progress of every account. 200 once all of them can take work, 503 until then."""
+    accounts = {}
+    for name, session in sessions.items():
+        accounts[name] = {
+            "ready": session.ready_at is not None,
+            "boot_ms": round(((session.ready_at or time.time()) - session.boot_started_at) * 1000, 1)
+                       if session.boot_started_at else None,
+            "phases": boot_phases_of(session),
+            "waiting_jobs": session.action_queue.pending_count(),
+        }
+    ready = all(account["ready"] for account in accounts.values())
+    return jsonify({"ready": ready, "accounts": accounts}), 200 if ready else 503
+
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    accounts = {}
+    for name, session in sessions.items():
+        accounts[name] = {
+            "browser_mode": session.browser_mode,
+            "queue": session.action_queue.stats(),
+            "positions_mirror": session.positions.stats(),
+            "windows": session.windows.stats() if session.windows else None,
+            "health": session.health,
+            "last_refresh": session.last_refresh,
+            "standby": {
+                "enabled": bool(session.standby_profile_dir),
+                "ready": session.standby is not None,
+                "failovers": session.failovers,
+                "last_failover": session.last_failover,
+            },
+        }
+    return jsonify({"latency": registry.summary(), "accounts": accounts, "idempotency": idempotency.stats(),
+                    "logging": log_stats()})
         
  
 
 # Launchs the server and initialzes browser
 if __name__ == '__main__':
-    initialize_browser()
-    refresh_thread = threading.Thread(target=periodic_refresh, daemon=True)
-    refresh_thread.start()
-    app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
+    # Every account boots on its own worker thread while Flask starts accepting requests;
+    # anything that arrives before an account is ready waits in its queue. See /api/ready.
+    for session in sessions.values():
+        worker_thread = threading.Thread(target=browser_worker, args=(session,), name=f"browser-{session.name}", daemon=True)
+        worker_thread.start()
+        if session.standby_profile_dir:
+            threading.Thread(target=standby_keeper, args=(session,), name=f"standby-{session.name}", daemon=True).start()
+    health_thread = threading.Thread(target=health_scheduler, daemon=True)
+    health_thread.start()
+    app.run(host="0.0.0.0", port=5000)
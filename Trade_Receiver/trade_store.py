@@ -0,0 +1,264 @@
+"""
+Durable {MT5_ticket: Web_terminal_ticket} map.
+
+Every change is appended to a JSON-lines journal before it is applied in memory, so a restart
+picks up every link that existed when the server stopped. A reverse index gives O(1) lookups
+from the web ticket back to the MT5 ticket.
+
+Files, for a base path of ".../trade_map":
+    trade_map.snapshot.json  full map as of journal sequence number "seq"
+    trade_map.journal        changes after the last rotation, one JSON object per line
+    trade_map.journal.old    the rotated journal while a compaction is being written
+
+On boot the snapshot is loaded and only journal entries newer than its sequence number are replayed.
+Once the journal grows past compact_after entries it is rotated and a new snapshot is written on
+a background thread, so the hot path only ever pays for one appended line.
+"""
+import json
+import os
+import threading
+import time
+
+from event_log import get_logger
+
+log = get_logger("trade_store")
+
+
+class TradeStore:
+    """Dict-like, thread-safe MT5-to-web ticket map backed by an append-only journal."""
+
+    def __init__(self, path, compact_after=500, fsync=True):
+        self.path = path
+        self.compact_after = compact_after
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self._forward = {}  # {MT5 ticket: web ticket}
+        self._reverse = {}  # {web ticket: MT5 ticket}
+        self._seq = 0
+        self._journal = None
+        self._journal_entries = 0
+        self._compacting = False
+
+    @property
+    def snapshot_path(self):
+        return self.path + ".snapshot.json"
+
+    @property
+    def journal_path(self):
+        return self.path + ".journal"
+
+    @property
+    def old_journal_path(self):
+        return self.path + ".journal.old"
+
+    # --- Boot --- #
+
+    def load(self):
+        """
+        Rebuilds the map from disk and opens the journal for appending.
+        Returns a dict describing what was loaded and how long it took.
+        """
+        start = time.perf_counter()
+        with self._lock:
+            self._forward.clear()
+            self._reverse.clear()
+            snapshot_seq = 0
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                    snapshot = json.load(f)
+                snapshot_seq = snapshot.get("seq", 0)
+                for mt5_ticket, web_ticket in snapshot.get("entries", []):
+                    self._apply_set(mt5_ticket, web_ticket)
+            self._seq = snapshot_seq
+
+            replayed = 0
+            for journal_path in (self.old_journal_path, self.journal_path):
+                _truncate_partial_line(journal_path)
+                replayed += self._replay(journal_path, snapshot_seq)
+
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal_entries = replayed
+
+        info = {
+            "entries": len(self._forward),
+            "snapshot_seq": snapshot_seq,
+            "replayed": replayed,
+            "load_ms": round((time.perf_counter() - start) * 1000, 2),
+        }
+        if replayed >= self.compact_after:
+            self.compact_async()
+        return info
+
+    def _replay(self, journal_path, after_seq):
+        if not os.path.exists(journal_path):
+            return 0
+        replayed = 0
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Not a complete entry; a partial last line was already cut off by load()
+                    continue
+                if entry["seq"] <= after_seq:
+                    continue
+                if entry["op"] == "set":
+                    self._apply_set(entry["mt5"], entry["web"])
+                elif entry["op"] == "del":
+                    self._apply_del(entry["mt5"])
+                self._seq = max(self._seq, entry["seq"])
+                replayed += 1
+        return replayed
+
+    # --- Map interface --- #
+
+    def __setitem__(self, mt5_ticket, web_ticket):
+        mt5_ticket = _key(mt5_ticket)
+        with self._lock:
+            self._append({"op": "set", "mt5": mt5_ticket, "web": web_ticket})
+            self._apply_set(mt5_ticket, web_ticket)
+            self._maybe_compact()
+
+    def __delitem__(self, mt5_ticket):
+        mt5_ticket = _key(mt5_ticket)
+        with self._lock:
+            if mt5_ticket not in self._forward:
+                raise KeyError(mt5_ticket)
+            self._append({"op": "del", "mt5": mt5_ticket})
+            self._apply_del(mt5_ticket)
+            self._maybe_compact()
+
+    def __getitem__(self, mt5_ticket):
+        return self._forward[_key(mt5_ticket)]
+
+    def __contains__(self, mt5_ticket):
+        return _key(mt5_ticket) in self._forward
+
+    def __len__(self):
+        return len(self._forward)
+
+    def get(self, mt5_ticket, default=None):
+        return self._forward.get(_key(mt5_ticket), default)
+
+    def pop(self, mt5_ticket, default=None):
+        with self._lock:
+            if mt5_ticket not in self:
+                return default
+            web_ticket = self[mt5_ticket]
+            del self[mt5_ticket]
+            return web_ticket
+
+    def items(self):
+        with self._lock:
+            return list(self._forward.items())
+
+    def values(self):
+        with self._lock:
+            return list(self._forward.values())
+
+    def has_web_ticket(self, web_ticket):
+        """O(1) check whether a web ticket is already linked to an MT5 ticket."""
+        return web_ticket in self._reverse
+
+    def mt5_ticket_for(self, web_ticket):
+        """Reverse lookup: the MT5 ticket linked to a web ticket, or None."""
+        return self._reverse.get(web_ticket)
+
+    # --- Journal --- #
+
+    def _apply_set(self, mt5_ticket, web_ticket):
+        previous = self._forward.get(mt5_ticket)
+        if previous is not None:
+            self._reverse.pop(previous, None)
+        self._forward[mt5_ticket] = web_ticket
+        self._reverse[web_ticket] = mt5_ticket
+
+    def _apply_del(self, mt5_ticket):
+        web_ticket = self._forward.pop(mt5_ticket, None)
+        if web_ticket is not None:
+            self._reverse.pop(web_ticket, None)
+
+    def _append(self, entry):
+        # Called with the lock held
+        if self._journal is None:
+            # load() has not been called; keep the change in memory only
+            return
+        self._seq += 1
+        entry["seq"] = self._seq
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._journal_entries += 1
+
+    def _maybe_compact(self):
+        # Called with the lock held, after the change is applied so the snapshot includes it
+        if self._journal_entries >= self.compact_after:
+            self.compact_async()
+
+    def compact_async(self):
+        """Rotates the journal and writes a fresh snapshot on a background thread."""
+        with self._lock:
+            if self._compacting or self._journal is None:
+                return
+            self._compacting = True
+            entries = list(self._forward.items())
+            seq = self._seq
+            self._journal.close()
+            if os.path.exists(self.old_journal_path):
+                # A previous compaction did not finish; keep its entries together in the old journal
+                with open(self.journal_path, "r", encoding="utf-8") as src, \
+                        open(self.old_journal_path, "a", encoding="utf-8") as dst:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.old_journal_path)
+            self._journal = open(self.journal_path, "a", encoding="utf-8")
+            self._journal_entries = 0
+
+        threading.Thread(target=self._write_snapshot, args=(entries, seq), daemon=True).start()
+
+    def _write_snapshot(self, entries, seq):
+        try:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"seq": seq, "entries": entries}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Everything in the old journal is now covered by the snapshot
+            if os.path.exists(self.old_journal_path):
+                os.remove(self.old_journal_path)
+        except Exception as e:
+            log.error("Compaction failed: %s", e)
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    def close(self):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+
+
+def _truncate_partial_line(journal_path):
+    """
+    Cuts a journal back to its last complete line. A crash mid-write can leave a partial last line;
+    appending after it would glue the next entry onto it and lose both.
+    """
+    if not os.path.exists(journal_path):
+        return
+    with open(journal_path, "rb+") as f:
+        data = f.read()
+        if not data or data.endswith(b"\n"):
+            return
+        keep = data.rfind(b"\n") + 1
+        f.truncate(keep)
+    log.warning("Dropped a partial last line (%d bytes) from %s", len(data) - keep, journal_path)
+
+
+def _key(mt5_ticket):
+    # The EA sends tickets as JSON numbers, but they may also arrive as strings; store one form
+    return str(mt5_ticket)
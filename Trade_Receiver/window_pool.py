@@ -0,0 +1,92 @@
+"""
+Several terminal windows inside one browser, so trades on different symbols don't wait on each other's fills.
+
+A WebDriver session drives one window at a time, but the terminal in a window keeps working while the
+driver is busy in another. The pool splits the work accordingly:
+  - the window the browser started in owns the positions table. The positions mirror, modifies,
+    closes, syncs and health checks all run there.
+  - each order window has its own order panel and stays pinned to the symbol it last traded, so a
+    symbol that keeps trading never pays for symbol selection again
+  - when trades for different symbols are queued back to back, the worker clicks each one in its own
+    order window and only then waits for the new positions. The fills overlap instead of running one
+    after the other, and each new row is matched to its order by symbol and side.
+
+Switching windows is one WebDriver call. Every piece of work on a ticket still runs on the account's
+single worker, in queue order, so a modify or close never overtakes the trade it belongs to.
+"""
+import time
+
+# Chrome throttles timers and rendering in windows that aren't in front; the order windows must keep up
+BACKGROUND_WINDOW_FLAGS = [
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+]
+
+
+def new_order_panel():
+    """What we know about a freshly loaded order panel: nothing (see request_server.ensure_order_panel)."""
+    return {"symbol": None, "open": False, "sl_open": False, "tp_open": False}
+
+
+class OrderWindow:
+    """One order window: its WebDriver handle and its own order panel state."""
+
+    def __init__(self, handle, number):
+        self.handle = handle
+        self.number = number  # 1-based, for logs and results
+        self.order_panel = new_order_panel()
+        self.last_used = 0.0
+        self.orders = 0
+
+    @property
+    def symbol(self):
+        """The symbol the window's panel is on, or None if that isn't known."""
+        return self.order_panel["symbol"]
+
+
+class WindowPool:
+    """The windows of one browser: the positions window, the order windows and which one the driver is on."""
+
+    def __init__(self, positions_handle, positions_panel):
+        self.positions = positions_handle
+        self.current = positions_handle
+        self.order_windows = []
+        self._panels = {positions_handle: positions_panel}
+        self.switches = 0
+
+    def add_order_window(self, handle):
+        window = OrderWindow(handle, len(self.order_windows) + 1)
+        self.order_windows.append(window)
+        self._panels[handle] = window.order_panel
+        return window
+
+    def panel(self, handle):
+        """The order panel state of the window with this handle."""
+        return self._panels[handle]
+
+    def window_for(self, symbol, busy=()):
+        """
+        The order window to place a `symbol` trade in: the one already on that symbol, otherwise the one
+        used longest ago. Windows whose handle is in `busy` are skipped. None if every window is busy.
+        """
+        free = [window for window in self.order_windows if window.handle not in busy]
+        if not free:
+            return None
+        for window in free:
+            if window.symbol == symbol:
+                return window
+        return min(free, key=lambda window: window.last_used)
+
+    def used(self, window):
+        window.last_used = time.time()
+        window.orders += 1
+
+    def stats(self):
+        return {
+            "order_windows": [
+                {"window": window.number, "symbol": window.symbol, "orders": window.orders}
+                for window in self.order_windows
+            ],
+            "switches": self.switches,
+        }